@@ -95,6 +95,45 @@ def load_css():
     """, unsafe_allow_html=True)
 
 
+def _rating_delta(row, sign):
+    return f'''
+    INSERT OR IGNORE INTO book_ratings (book_id) VALUES ({row}.book_id);
+    UPDATE book_ratings SET
+        rating_sum = rating_sum {sign} {row}.rating,
+        rating_count = rating_count {sign} 1,
+        stars_1 = stars_1 {sign} ({row}.rating = 1),
+        stars_2 = stars_2 {sign} ({row}.rating = 2),
+        stars_3 = stars_3 {sign} ({row}.rating = 3),
+        stars_4 = stars_4 {sign} ({row}.rating = 4),
+        stars_5 = stars_5 {sign} ({row}.rating = 5)
+    WHERE book_id = {row}.book_id;
+    '''
+
+
+RATING_TRIGGERS = {
+    'reviews_rating_insert': f"AFTER INSERT ON reviews BEGIN {_rating_delta('NEW', '+')} END",
+    'reviews_rating_delete': f"AFTER DELETE ON reviews BEGIN {_rating_delta('OLD', '-')} END",
+    'reviews_rating_update': (
+        "AFTER UPDATE OF rating, book_id ON reviews "
+        f"BEGIN {_rating_delta('OLD', '-')} {_rating_delta('NEW', '+')} END"
+    ),
+}
+
+
+def reconcile_ratings(conn):
+    """book_ratings ni reviews jadvalidan qaytadan hisoblash (farq bo'lsa tuzatadi)"""
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM book_ratings')
+    cursor.execute('''
+    INSERT INTO book_ratings
+    SELECT book_id, SUM(rating), COUNT(*),
+           SUM(rating = 1), SUM(rating = 2), SUM(rating = 3), SUM(rating = 4), SUM(rating = 5)
+    FROM reviews
+    GROUP BY book_id
+    ''')
+    conn.commit()
+
+
 # Ma'lumotlar bazasini boshlash
 def init_database():
     conn = sqlite3.connect('kutubxona.db', check_same_thread=False)
@@ -198,6 +237,32 @@ def init_database():
     )
     ''')
 
+    # Baholar yig'indisi: har sahifada reviews bo'yicha GROUP BY qilmaslik uchun
+    # triggerlar bilan o'sha tranzaksiyada yangilanadi
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'book_ratings'")
+    ratings_missing = cursor.fetchone() is None
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS book_ratings (
+        book_id INTEGER PRIMARY KEY,
+        rating_sum INTEGER NOT NULL DEFAULT 0,
+        rating_count INTEGER NOT NULL DEFAULT 0,
+        stars_1 INTEGER NOT NULL DEFAULT 0,
+        stars_2 INTEGER NOT NULL DEFAULT 0,
+        stars_3 INTEGER NOT NULL DEFAULT 0,
+        stars_4 INTEGER NOT NULL DEFAULT 0,
+        stars_5 INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (book_id) REFERENCES books (id)
+    )
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS book_ratings_avg
+    ON book_ratings ((rating_sum * 1.0 / rating_count), book_id)
+    ''')
+    for trigger, body in RATING_TRIGGERS.items():
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {trigger} {body}')
+    if ratings_missing:
+        reconcile_ratings(conn)
+
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS notifications (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -321,10 +386,12 @@ def get_books_with_authors(conn, search_query="", category_filter=""):
     query = '''
     SELECT b.*, a.first_name, a.last_name, 
            COUNT(bc.id) as total_copies,
-           COUNT(CASE WHEN bc.status = 'available' THEN 1 END) as available_copies
+           COUNT(CASE WHEN bc.status = 'available' THEN 1 END) as available_copies,
+           br.rating_sum * 1.0 / br.rating_count as rating_avg
     FROM books b
     JOIN authors a ON b.author_id = a.id
     LEFT JOIN book_copies bc ON b.id = bc.book_id
+    LEFT JOIN book_ratings br ON br.book_id = b.id
     WHERE 1=1
     '''
     params = []
@@ -381,6 +448,16 @@ def get_book_reviews(conn, book_id):
     return cursor.fetchall()
 
 
+def get_book_rating(conn, book_id):
+    """(o'rtacha baho, sharhlar soni, [1..5 yulduzlar soni]) yoki None"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM book_ratings WHERE book_id = ? AND rating_count > 0', (book_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return row[1] / row[2], row[2], list(row[3:8])
+
+
 def get_statistics(conn):
     cursor = conn.cursor()
 
@@ -623,6 +700,7 @@ def show_books_page(conn):
                 < p > < strong > Sahifalar:</strong> {book[6] or 'Nomalum'}</p>
                 < p > < strong > Til:</strong> {book[7]}</p>
                     <p><strong>Mavjud:</strong> {book[11]} / {book[10]} ta nusxa</p>
+                    <p><strong>Baho:</strong> {f"{book[12]:.1f} ⭐" if book[12] else "—"}</p>
                 </div>
                 """, unsafe_allow_html=True)
 
@@ -677,6 +755,12 @@ def show_book_detail(conn, book_id):
 
     # Sharhlar
     st.markdown("### ⭐ Sharhlar:")
+    rating = get_book_rating(conn, book_id)
+    if rating:
+        average, count, stars = rating
+        st.markdown(f"**O'rtacha baho:** {average:.1f} ⭐ ({count} ta sharh)")
+        for n in range(5, 0, -1):
+            st.progress(stars[n - 1] / count, text=f"{n} ⭐ — {stars[n - 1]}")
     reviews = get_book_reviews(conn, book_id)
 
     if reviews:
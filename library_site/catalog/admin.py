@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Author, Category, Book, BookCopy, Borrow, Review
+from .models import ArchivedBorrow, Author, Category, Book, BookCopy, Borrow, Hold, Review
 
 
 @admin.register(Author)
@@ -20,7 +20,7 @@ class BookCopyInline(admin.TabularInline):
 
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
-    list_display = ("title", "author", "year")
+    list_display = ("title", "author", "year", "available_copies", "total_copies")
     list_filter = ("author", "categories")
     search_fields = ("title", "isbn")
     filter_horizontal = ("categories",)
@@ -33,6 +33,26 @@ class BorrowAdmin(admin.ModelAdmin):
     list_filter = ("borrowed_at", "returned_at")
 
 
+@admin.register(ArchivedBorrow)
+class ArchivedBorrowAdmin(admin.ModelAdmin):
+    list_display = ("user", "copy", "borrowed_at", "returned_at", "archived_at")
+    list_select_related = ("user", "copy__book")
+    # filled by catalog.archive only
+    readonly_fields = ("user", "copy", "borrowed_at", "due_date", "returned_at", "archived_at")
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Hold)
+class HoldAdmin(admin.ModelAdmin):
+    list_display = ("book", "user", "status", "position", "priority", "created_at", "expires_at")
+    list_filter = ("status",)
+    list_select_related = ("book", "user")
+    # positions are renumbered by catalog.services only
+    readonly_fields = ("book", "user", "status", "priority", "position", "copy", "expires_at")
+
+
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ("book", "user", "rating", "created_at")
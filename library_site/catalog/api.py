@@ -0,0 +1,234 @@
+"""Read-only JSON API (``/api/v1/``) for the mobile app and kiosks.
+
+The list and detail endpoints reuse the querysets of ``BookListView`` and
+``BookDetailView``, so filters, sorts and search behave exactly like the
+HTML pages. ``?fields=title,author`` picks the keys to return and only
+their columns are selected (``.only()``); ``id`` is always included.
+
+Responses carry a strong ``ETag`` built from the per-book versions in
+``catalog.caching``, which every change to a book, its copies, reviews or
+author bumps. A matching ``If-None-Match`` gets a 304 before any row is
+loaded or serialized: with a warm cache a detail revalidation runs no
+query at all, and a list one only the narrow page-of-ids query. Detail
+bodies are cached per version, so repeat hits skip serialization too.
+(UZ: JSON API)
+"""
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_GET
+
+from . import autocomplete, caching
+from .models import Review
+from .pagination import keyset_paginate
+from .querybudget import query_budget
+from .routers import primary_reads
+from .views import BookDetailView, BookListView
+
+
+API_VERSION = "v1"
+REVIEW_LIMIT = 20
+
+
+def _author(b):
+    return {"id": b.author_id, "name": f"{b.author.first_name} {b.author.last_name}"}
+
+
+# public key -> (columns it reads, value)
+FIELDS = {
+    "id": ((), lambda b: b.pk),
+    "title": (("title",), lambda b: b.title),
+    "author": (("author__first_name", "author__last_name"), _author),
+    "year": (("year",), lambda b: b.year),
+    "isbn": (("isbn",), lambda b: b.isbn),
+    "description": (("description",), lambda b: b.description),
+    "cover": (("cover",), lambda b: b.cover.url if b.cover else None),
+    "availability": (
+        ("total_copies", "available_copies"),
+        lambda b: {"total": b.total_copies, "available": b.available_copies},
+    ),
+    "rating": (
+        ("rating_avg", "rating_count"),
+        lambda b: {"average": round(b.rating_avg, 2), "count": b.rating_count},
+    ),
+    "histogram": (
+        tuple(f"stars_{s}" for s in Review.STARS),
+        lambda b: {str(s): getattr(b, f"stars_{s}") for s in Review.STARS},
+    ),
+    "categories": ((), lambda b: [c.name for c in b.categories.all()]),
+    "url": ((), lambda b: b.get_absolute_url()),
+}
+LIST_FIELDS = ("id", "title", "author", "year", "cover", "availability", "rating")
+DETAIL_FIELDS = (*FIELDS, "reviews")
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def requested_fields(request, default, allowed):
+    """The ``fields=`` selection in canonical order (it is part of cache keys)."""
+    raw = request.GET.get("fields")
+    if not raw:
+        return default
+    wanted = {name.strip() for name in raw.split(",") if name.strip()}
+    unknown = wanted.difference(allowed)
+    if unknown:
+        raise BadRequest(f"Unknown field(s): {', '.join(sorted(unknown))}.")
+    return ("id", *(name for name in allowed if name in wanted and name != "id"))
+
+
+def narrow(qs, fields):
+    """``qs`` selecting only the columns (and relations) ``fields`` need."""
+    if "author" not in fields:
+        qs = qs.select_related(None)
+    if "categories" in fields:
+        qs = qs.prefetch_related("categories")
+    return qs.only("id", *(column for name in fields if name in FIELDS for column in FIELDS[name][0]))
+
+
+def serialize(book, fields):
+    return {name: FIELDS[name][1](book) for name in fields if name in FIELDS}
+
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def make_etag(*parts):
+    digest = hashlib.sha256(repr((API_VERSION, *parts)).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def not_modified(request, etag):
+    etags = parse_etags(request.headers.get("If-None-Match", ""))
+    return etag in etags or "*" in etags
+
+
+def respond(body, etag, status=200):
+    response = HttpResponse(body, status=status, content_type="application/json")
+    response["ETag"] = etag
+    # clients may keep the body but must revalidate it every time
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+def error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+def _page_url(request, **params):
+    query = request.GET.copy()
+    query.pop("page", None)
+    query.pop("after", None)
+    query.update(params)
+    return f"{request.path}?{query.urlencode()}"
+
+
+@query_budget(4)
+@require_GET
+def book_list(request):
+    """Books as ``{"results": [...], "next": url|null}``, with the
+    ``q``/``category``/``rating``/``sort`` filters of the HTML list."""
+    try:
+        fields = requested_fields(request, LIST_FIELDS, tuple(FIELDS))
+    except BadRequest as exc:
+        return error(str(exc), 400)
+    view = BookListView()
+    view.setup(request)
+    qs = view.get_queryset()
+
+    # 1) ids of the page only: all a revalidation needs
+    meta = {}
+    try:
+        if request.GET.get("q", "").strip():
+            paginator, page, rows, _ = view.paginate_queryset(narrow(qs, ("id",)), view.paginate_by)
+            meta = {"count": paginator.count, "page": page.number, "pages": paginator.num_pages}
+            next_url = _page_url(request, page=page.next_page_number()) if page.has_next() else None
+        else:
+            sort = view.get_sort()
+            ordering = view.sort_orderings[sort]
+            rows = keyset_paginate(
+                narrow(qs, ()).only(*(name.lstrip("-") for name in ordering)), sort, ordering,
+                after=request.GET.get("after"), per_page=view.paginate_by,
+            )
+            next_url = _page_url(request, after=rows.next_cursor) if rows.has_next else None
+    except Http404 as exc:
+        return error(str(exc), 404)
+    ids = [b.pk for b in rows]
+
+    # 2) versions before rows, so a body is never older than its ETag
+    current = caching.versions(ids)
+    etag = make_etag("list", fields, [(pk, current[pk]) for pk in ids], next_url, meta)
+    if not_modified(request, etag):
+        return respond(b"", etag, status=304)
+
+    found = narrow(view.get_queryset(), fields).in_bulk(ids)
+    body = {
+        **meta,
+        "results": [serialize(found[pk], fields) for pk in ids if pk in found],
+        "next": next_url,
+    }
+    return respond(dumps(body), etag)
+
+
+@query_budget(3)
+@require_GET
+def book_detail(request, pk):
+    """One book with its rating histogram, categories and latest reviews."""
+    try:
+        fields = requested_fields(request, DETAIL_FIELDS, DETAIL_FIELDS)
+    except BadRequest as exc:
+        return error(str(exc), 400)
+    version = caching.versions([pk])[pk]
+    etag = make_etag("book", fields, pk, version)
+    if not_modified(request, etag):
+        return respond(b"", etag, status=304)
+
+    key = f"catalog:api:{API_VERSION}:book:{pk}:{version}:{','.join(fields)}"
+    body = cache.get(key)
+    if body is None:
+        # cached under this version, so not read from a replica behind it
+        with primary_reads():
+            view = BookDetailView()
+            view.setup(request, pk=pk)
+            try:
+                view.object = view.get_object(narrow(view.get_queryset(), fields))
+            except Http404:
+                return error("No such book.", 404)
+            data = serialize(view.object, fields)
+            if "reviews" in fields:
+                data["reviews"] = [
+                    {
+                        "user": r.user.username,
+                        "rating": r.rating,
+                        "text": r.text,
+                        "created_at": r.created_at.isoformat(),
+                    }
+                    for r in view.get_reviews()[:REVIEW_LIMIT]
+                ]
+            body = dumps(data).encode()
+        cache.set(key, body, caching.CARD_TIMEOUT)
+    return respond(body, etag)
+
+
+@query_budget(2)
+@require_GET
+def book_autocomplete(request):
+    """Typeahead for the search box: ``?q=<prefix>&limit=n`` gives the most
+    reviewed books whose title, author or ISBN starts with it (see
+    catalog.autocomplete; normally no query at all)."""
+    try:
+        limit = min(int(request.GET.get("limit", autocomplete.LIMIT)), 20)
+    except ValueError:
+        return error("limit must be a number.", 400)
+    results = autocomplete.get_index().complete(request.GET.get("q", "")[:100], limit)
+    for r in results:
+        r["url"] = reverse("catalog:book_detail", args=[r["id"]])
+    response = JsonResponse({"results": results}, json_dumps_params={"ensure_ascii": False})
+    response["Cache-Control"] = "max-age=60"
+    return response
@@ -0,0 +1,103 @@
+"""Hot/cold split of the loan history.
+
+``Borrow`` keeps the open loans and the recent returns, which is all the
+profile, the return flow and the hold queue read. Loans returned more than
+``BORROW_ARCHIVE_AFTER_DAYS`` ago move to ``ArchivedBorrow`` under their
+original ids, in batches.
+
+The archive is a table in the same database, so each batch is copied and
+deleted in one transaction: an interrupted run loses or duplicates
+nothing, and the next run carries on where it stopped.
+
+The profile reads both tables with ``?archive=1`` (``returns_of``, ``merge``);
+catalog.recommendations always reads both, for the whole loan history.
+(UZ: arxiv)
+"""
+import heapq
+import logging
+import time
+from datetime import timedelta
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedBorrow, Borrow
+
+
+logger = logging.getLogger(__name__)
+
+# the copied columns, id included
+FIELDS = [field.attname for field in Borrow._meta.concrete_fields]
+# the profile's history length
+HISTORY = 20
+
+
+def cutoff(days=None):
+    """Loans returned before this moment are archived."""
+    if days is None:
+        days = settings.BORROW_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable(before):
+    # catalog_borrow_returned_idx holds returned loans only
+    return Borrow.objects.filter(returned_at__isnull=False, returned_at__lt=before)
+
+
+def archive_batch(before, batch_size=1000):
+    """Move the ``batch_size`` oldest returns; returns how many moved."""
+    with transaction.atomic():
+        rows = list(archivable(before).order_by("returned_at").values(*FIELDS)[:batch_size])
+        if not rows:
+            return 0
+        now = timezone.now()
+        ArchivedBorrow.objects.bulk_create(
+            [ArchivedBorrow(archived_at=now, **row) for row in rows], batch_size=batch_size
+        )
+        Borrow.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+    return len(rows)
+
+
+def run(before, batch_size=1000, sleep=0, max_batches=None):
+    """Archive in batches, pausing ``sleep`` seconds between them."""
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        n = archive_batch(before, batch_size)
+        if not n:
+            break
+        moved += n
+        batches += 1
+        logger.info("archived %d loan(s), %d so far", n, moved)
+        if sleep:
+            time.sleep(sleep)
+    return moved
+
+
+def stats(before=None):
+    """Hot table size: all rows, open loans, rows due for the archive; and the archive."""
+    if before is None:
+        before = cutoff()
+    sizes = {
+        "hot": Borrow.objects.count(),
+        "open": Borrow.objects.filter(returned_at__isnull=True).count(),
+        "archivable": archivable(before).count(),
+        "archived": ArchivedBorrow.objects.count(),
+    }
+    logger.info(
+        "loans: %(hot)d hot (%(open)d open, %(archivable)d due for the archive), %(archived)d archived",
+        sizes,
+    )
+    return sizes
+
+
+def returns_of(user):
+    """The archived counterpart of ``views.loans_of``'s history."""
+    return ArchivedBorrow.objects.select_related("copy__book").filter(user=user)[:HISTORY]
+
+
+def merge(hot, cold, order, limit):
+    """The first ``limit`` of two lists each sorted by ``order``."""
+    key = attrgetter(order.lstrip("-"))
+    return list(heapq.merge(hot, cold, key=key, reverse=order.startswith("-")))[:limit]
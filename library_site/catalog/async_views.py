@@ -0,0 +1,176 @@
+"""Async versions of the catalog read pages, served under ASGI.
+
+``catalog.urls`` routes to these instead of ``catalog.views`` when
+``ASYNC_VIEWS`` is on (``asgi.py`` turns it on), so a request waiting on
+the database no longer pins a server thread. They subclass the sync views
+and share their querysets, filters and templates; only data loading is
+async. Everything a template touches is loaded first, and templates are
+rendered on the request's sync thread (context processors read the
+session).
+
+Django's async ORM (``aget``, ``async for``, ``acount``) still runs all of
+a request's queries one after another on a single thread, so
+``gather_reads`` gives independent reads a worker thread and connection
+of their own to overlap them. The ``bench_concurrency`` command compares
+this against the sync views under WSGI. (UZ: asinxron sahifalar)
+"""
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import InvalidPage, Page
+from django.db import close_old_connections
+from django.http import Http404
+from django.shortcuts import render
+
+from . import archive, views
+from .forms import ReviewForm
+from .models import Book
+from .pagination import akeyset_paginate
+from .querybudget import query_budget
+
+
+# Shared by every request. Django connections are per thread, so each worker
+# keeps at most one connection per alias (default, replica) open: 32 per
+# process on top of the request threads, whatever the traffic. Keep
+# workers × server processes under the database's max_connections
+# (PostgreSQL: 100 by default) when adding processes or workers.
+READ_WORKERS = ThreadPoolExecutor(max_workers=32, thread_name_prefix="catalog-read")
+
+
+def _isolated(read):
+    try:
+        return read()
+    finally:
+        # as at the end of a request: the worker's connection stays open for
+        # the next read until CONN_MAX_AGE, unless it is broken
+        close_old_connections()
+
+
+async def gather_reads(*reads):
+    """Run independent reads at the same time and return their results.
+
+    Async ORM awaitables (``qs.acount()``) run on the request's database
+    thread; plain callables each run on a ``READ_WORKERS`` thread with a
+    connection of their own. Reads only: a worker is outside any
+    transaction the request holds.
+    """
+    async def run(read):
+        if inspect.isawaitable(read):
+            return await read
+        return await sync_to_async(_isolated, thread_sensitive=False, executor=READ_WORKERS)(read)
+
+    return await asyncio.gather(*map(run, reads))
+
+
+async def alist(qs):
+    return [row async for row in qs]
+
+
+async def resolve_user(request):
+    # once, so templates reading request.user do not query again
+    request.user = await request.auser()
+    return request.user
+
+
+async def render_async(request, template_name, context):
+    return await sync_to_async(render)(request, template_name, context)
+
+
+class HomeView(views.HomeView):
+    async def get(self, request, *args, **kwargs):
+        user = await resolve_user(request)
+        if not user.is_authenticated or request.GET:
+            # the cached anonymous page (cache, messages) stays sync code
+            return await sync_to_async(super().get)(request, *args, **kwargs)
+        latest, stats = await gather_reads(
+            alist(self.get_latest_books()),
+            lambda: Book.objects.aggregate(**self.stats),
+        )
+        return await render_async(request, self.template_name, {
+            "view": self, "latest_books": latest, "stats": stats,
+        })
+
+
+class BookListView(views.BookListView):
+    async def get(self, request, *args, **kwargs):
+        await resolve_user(request)
+        filters = self.get_filters()
+        self.object_list = self.get_queryset()
+        context = {"view": self, **filters, "is_paginated": False, "paginator": None, "page_obj": None}
+        if filters["q"].strip():
+            context.update(await self.search_page(self.object_list))
+        else:
+            page = await akeyset_paginate(
+                self.object_list,
+                filters["sort"],
+                self.sort_orderings[filters["sort"]],
+                after=request.GET.get("after"),
+                per_page=self.paginate_by,
+            )
+            context.update(books=page, object_list=page, keyset_page=page)
+        return await render_async(request, self.template_name, context)
+
+    async def search_page(self, qs):
+        """Ranked results by page number; the total and the page's rows are
+        fetched at the same time."""
+        try:
+            number = int(self.request.GET.get(self.page_kwarg) or 1)
+        except ValueError:
+            raise Http404("Invalid page.")
+        start = max(number - 1, 0) * self.paginate_by
+        count, rows = await gather_reads(
+            qs.acount(),
+            lambda: list(qs[start:start + self.paginate_by]),
+        )
+        paginator = self.get_paginator(qs, self.paginate_by)
+        paginator.count = count
+        try:
+            paginator.validate_number(number)
+        except InvalidPage as exc:
+            raise Http404(str(exc))
+        page = Page(rows, number, paginator)
+        return {
+            "books": rows, "object_list": rows, "page_obj": page,
+            "paginator": paginator, "is_paginated": paginator.num_pages > 1,
+        }
+
+
+class BookDetailView(views.BookDetailView):
+    async def get(self, request, *args, **kwargs):
+        await resolve_user(request)
+        try:
+            self.object, reviews, hold, also_borrowed = await gather_reads(
+                self.get_queryset().aget(pk=self.kwargs[self.pk_url_kwarg]),
+                self.get_review_page,
+                self.get_hold,
+                self.get_also_borrowed,
+            )
+        except Book.DoesNotExist:
+            raise Http404("No book found matching the query")
+        return await render_async(request, self.template_name, {
+            "view": self, "object": self.object, "book": self.object,
+            "review_form": ReviewForm(), "reviews": reviews, "also_borrowed": also_borrowed,
+            **self.get_hold_context(self.object, hold),
+        })
+
+
+@query_budget(5)
+@login_required
+async def profile(request):
+    if request.method == "POST":
+        return await sync_to_async(views.profile)(request)
+    user = await resolve_user(request)
+    active_loans, history = views.loans_of(user)
+    include_archive = request.GET.get("archive") == "1"
+    reads = [alist(active_loans), lambda: list(history)]
+    if include_archive:
+        reads.append(lambda: list(archive.returns_of(user)))
+    active_loans, history, *archived = await gather_reads(*reads)
+    if include_archive:
+        history = archive.merge(history, archived[0], "-borrowed_at", archive.HISTORY)
+    return await render_async(request, "catalog/profile.html", {
+        "active_loans": active_loans, "history": history, "include_archive": include_archive,
+    })
@@ -0,0 +1,391 @@
+"""Typeahead over titles, author names and ISBNs from an in-memory index.
+
+The index is a sorted array of normalized keys (every word-suffix of a
+title, the author's full and last name, the ISBN) pointing at books, so a
+prefix is found by binary search and its matches are adjacent. It lives in
+one compact snapshot: flat ``uint32`` arrays plus two UTF-8 blobs. With
+``AUTOCOMPLETE_SNAPSHOT`` set, the first worker writes that file (or
+``manage.py build_autocomplete`` does at deploy) and every worker maps it
+read-only, so the operating system keeps one copy in memory for all of them.
+Without it each worker builds its own copy on first use.
+
+Changes arrive through a log in the shared cache: the signals in
+``catalog.signals`` (and the bulk commands, explicitly) append the ids of
+changed books on commit, and each worker, at most once per
+``SYNC_INTERVAL``, reloads just those books into a small overlay that
+shadows their snapshot entries. A worker too far behind, or missing log
+entries for longer than ``LOG_GRACE``, rebuilds on a background thread and
+keeps answering from its current index meanwhile; requests never rebuild.
+
+Keys are folded so that diacritics, case and the many apostrophes used in
+Uzbek Latin (O'tkan, O‘tkan, Oʻtkan, O`tkan) all match. (UZ: avtoto‘ldirish)
+"""
+import heapq
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+from .models import Book
+from .routers import primary_reads
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CATAC\x01\x00\x00"
+# magic, change-log position, entries, books, key blob size, label blob size
+HEADER = struct.Struct("<8sQIIII")
+LIMIT = 8
+# matches looked at per lookup; very short prefixes stop here
+SCAN_LIMIT = 2000
+MAX_KEY = 64
+SYNC_INTERVAL = 1.0
+LOG_KEY = "catalog:ac:seq"
+LOG_TIMEOUT = 24 * 3600
+# a worker further behind than this rebuilds instead of replaying
+MAX_REPLAY = 1000
+# seconds a missing log entry may still be on its way (the writer moves the
+# counter first); after that it counts as lost and the worker rebuilds
+LOG_GRACE = 30
+REBUILD_LOCK = "catalog:ac:rebuild"
+
+APOSTROPHES = dict.fromkeys(map(ord, "'`´ʹʻʼʽ‘’′"), None)
+
+
+def normalize(text):
+    """Lowercase, no diacritics or apostrophes, single spaces between words."""
+    text = unicodedata.normalize("NFKD", (text or "").translate(APOSTROPHES)).casefold()
+    words, word = [], []
+    for ch in text:
+        if ch.isalnum():
+            word.append(ch)
+        elif not unicodedata.combining(ch) and word:
+            words.append("".join(word))
+            word = []
+    if word:
+        words.append("".join(word))
+    return " ".join(words)
+
+
+def book_keys(title, isbn, first_name, last_name):
+    words = normalize(title).split()
+    keys = {" ".join(words[i:])[:MAX_KEY] for i in range(len(words))}
+    keys.update(filter(None, (normalize(f"{first_name} {last_name}"), normalize(last_name), normalize(isbn))))
+    return keys
+
+
+def _book_rows(book_ids=None):
+    # from the primary: a replica may not have the logged change yet
+    qs = Book.objects.order_by()
+    if book_ids is not None:
+        qs = qs.filter(pk__in=book_ids)
+    with primary_reads():
+        yield from qs.values_list(
+            "pk", "title", "isbn", "author__first_name", "author__last_name", "rating_count"
+        ).iterator(chunk_size=2000)
+
+
+class Snapshot:
+    """The read-only sorted arrays, over bytes or a memory-mapped file."""
+
+    def __init__(self, buffer, mapped=None):
+        self.mapped = mapped
+        self.size = len(buffer)
+        magic, self.seq, n, books, keys_len, labels_len = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError("not an autocomplete snapshot")
+        view, at = memoryview(buffer), HEADER.size
+
+        def take(count, fmt="I"):
+            nonlocal at
+            part = view[at:at + count * 4].cast(fmt)
+            at += count * 4
+            return part
+
+        self.key_offsets = take(n + 1)
+        self.entry_book = take(n)
+        self.book_ids = take(books)
+        self.weights = take(books)
+        self.label_offsets = take(books + 1)
+        self.keys = view[at:at + keys_len]
+        self.labels = view[at + keys_len:at + keys_len + labels_len]
+        self.entries, self.books = n, books
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as fh:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, mapped)
+
+    @staticmethod
+    def build(rows, seq=0):
+        """Snapshot bytes for ``(pk, title, isbn, first, last, weight)`` rows."""
+        book_ids, weights, labels, label_offsets, entries = array("I"), array("I"), [], array("I", [0]), []
+        size = 0
+        for index, (pk, title, isbn, first, last, weight) in enumerate(rows):
+            book_ids.append(pk)
+            weights.append(min(weight or 0, 2**32 - 1))
+            label = f"{title}\x1f{first} {last}".encode()
+            labels.append(label)
+            size += len(label)
+            label_offsets.append(size)
+            entries.extend((key.encode(), index) for key in book_keys(title, isbn, first, last))
+        # UTF-8 byte order is code point order, so lookups compare raw bytes
+        entries.sort()
+        key_offsets, entry_book, size = array("I", [0]), array("I"), 0
+        for key, index in entries:
+            size += len(key)
+            key_offsets.append(size)
+            entry_book.append(index)
+        keys = b"".join(key for key, _ in entries)
+        label_blob = b"".join(labels)
+        if sys.byteorder != "little":
+            for part in (key_offsets, entry_book, book_ids, weights, label_offsets):
+                part.byteswap()
+        header = HEADER.pack(MAGIC, seq, len(entries), len(book_ids), len(keys), len(label_blob))
+        return b"".join([
+            header, key_offsets.tobytes(), entry_book.tobytes(), book_ids.tobytes(),
+            weights.tobytes(), label_offsets.tobytes(), keys, label_blob,
+        ])
+
+    def key(self, i):
+        return bytes(self.keys[self.key_offsets[i]:self.key_offsets[i + 1]])
+
+    def label(self, index):
+        label = bytes(self.labels[self.label_offsets[index]:self.label_offsets[index + 1]])
+        return tuple(label.decode().split("\x1f"))
+
+    def lower_bound(self, prefix):
+        lo, hi = 0, self.entries
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def matches(self, prefix):
+        """``{book index: weight}`` for up to SCAN_LIMIT entries under ``prefix``."""
+        found = {}
+        start = self.lower_bound(prefix)
+        for i in range(start, min(self.entries, start + SCAN_LIMIT)):
+            if not self.key(i).startswith(prefix):
+                break
+            index = self.entry_book[i]
+            found[index] = self.weights[index]
+        return found
+
+
+class Index:
+    """A snapshot plus the overlay of books changed since it was taken."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.seq = snapshot.seq
+        self.overlay = {}  # book id -> (sorted keys, weight, title, author), None if deleted
+        self.checked = time.monotonic()
+        self.gap = None  # (first missing log position, since when)
+        self.lock = threading.Lock()
+
+    def complete(self, query, limit=LIMIT):
+        """Up to ``limit`` ``{"id", "title", "author"}`` for ``query``, most
+        reviewed first."""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        snapshot, overlay = self.snapshot, self.overlay
+        scored = []
+        for index, weight in snapshot.matches(prefix.encode()).items():
+            pk = snapshot.book_ids[index]
+            if pk not in overlay:
+                scored.append((weight, -pk, index))
+        for pk, entry in overlay.items():
+            if entry and any(key.startswith(prefix) for key in entry[0]):
+                scored.append((entry[1], -pk, None))
+        results = []
+        for weight, pk, index in heapq.nlargest(limit, scored):
+            title, author = snapshot.label(index) if index is not None else overlay[-pk][2:]
+            results.append({"id": -pk, "title": title, "author": author})
+        return results
+
+    def apply(self, book_ids):
+        """Reload ``book_ids`` from the database into the overlay."""
+        found = {
+            pk: (sorted(book_keys(title, isbn, first, last)), weight or 0, title, f"{first} {last}")
+            for pk, title, isbn, first, last, weight in _book_rows(book_ids)
+        }
+        with self.lock:
+            self.overlay = {**self.overlay, **{pk: found.get(pk) for pk in book_ids}}
+
+    def stats(self):
+        overlay = sum(
+            sys.getsizeof(entry) + sum(map(sys.getsizeof, entry[0])) for entry in self.overlay.values() if entry
+        )
+        return {
+            "entries": self.snapshot.entries,
+            "books": self.snapshot.books,
+            "snapshot_bytes": self.snapshot.size,
+            "shared": self.snapshot.mapped is not None,
+            "overlay_books": len(self.overlay),
+            "overlay_bytes": overlay,
+        }
+
+
+_index = None
+_loading = threading.Lock()
+
+
+def current_seq():
+    seq = cache.get(LOG_KEY)
+    if seq is None:
+        cache.add(LOG_KEY, 0, None)
+        seq = cache.get(LOG_KEY, 0)
+    return seq
+
+
+def touch_books(book_ids):
+    """Queue ``book_ids`` for every worker's index once the transaction commits."""
+    book_ids = list(book_ids)
+
+    def log():
+        current_seq()
+        end = cache.incr(LOG_KEY, len(book_ids))
+        # more than MAX_REPLAY changes make every worker rebuild anyway
+        if len(book_ids) <= MAX_REPLAY:
+            start = end - len(book_ids) + 1
+            cache.set_many({f"{LOG_KEY}:{start + i}": pk for i, pk in enumerate(book_ids)}, LOG_TIMEOUT)
+
+    if book_ids:
+        transaction.on_commit(log)
+
+
+def touch_all():
+    """After bulk writes: every worker rebuilds its index (in the background)."""
+    def log():
+        current_seq()
+        cache.incr(LOG_KEY, MAX_REPLAY + 1)
+
+    transaction.on_commit(log)
+
+
+def write_snapshot(path):
+    """Build a snapshot from the database and atomically replace ``path``."""
+    seq = current_seq()  # before reading: later changes are replayed on top
+    data = Snapshot.build(_book_rows(), seq)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as fh:
+        fh.write(data)
+    os.replace(fh.name, path)
+    return len(data)
+
+
+def _load():
+    path = getattr(settings, "AUTOCOMPLETE_SNAPSHOT", None)
+    if not path:
+        return Index(Snapshot(Snapshot.build(_book_rows(), current_seq())))
+    if not os.path.exists(path):
+        write_snapshot(path)
+    index = Index(Snapshot.open(path))
+    index.mtime = os.path.getmtime(path)
+    return index
+
+
+def get_index():
+    """This worker's index, loaded on first use and kept in step with the
+    change log."""
+    global _index
+    if _index is None:
+        with _loading:
+            if _index is None:
+                _index = _load()
+    index = _index
+    if time.monotonic() - index.checked >= SYNC_INTERVAL:
+        index.checked = time.monotonic()
+        _index = _sync(index)
+    return _index
+
+
+def _sync(index):
+    path = getattr(settings, "AUTOCOMPLETE_SNAPSHOT", None)
+    if path and os.path.exists(path) and os.path.getmtime(path) != getattr(index, "mtime", None):
+        return _replay(_load())  # rewritten by build_autocomplete
+    return _replay(index)
+
+
+def _replay(index):
+    seq = current_seq()
+    if seq - index.seq > MAX_REPLAY:
+        _rebuild_in_background()
+        return index
+    if seq > index.seq:
+        keys = [f"{LOG_KEY}:{n}" for n in range(index.seq + 1, seq + 1)]
+        changed = cache.get_many(keys)
+        # apply up to the first missing entry: it may not be written yet
+        present = []
+        for key in keys:
+            if key not in changed:
+                break
+            present.append(changed[key])
+        if present:
+            index.apply(set(present))
+            index.seq += len(present)
+        if index.seq < seq:
+            missing, since = index.gap if index.gap and index.gap[0] == index.seq + 1 else (index.seq + 1, time.monotonic())
+            index.gap = (missing, since)
+            if time.monotonic() - since > LOG_GRACE:  # evicted, or its writer died
+                _rebuild_in_background()
+        else:
+            index.gap = None
+    return index
+
+
+_rebuilding = threading.Lock()
+
+
+def _rebuild_in_background():
+    """Replace this worker's index from a fresh build on a thread of its own;
+    requests keep using the current one until it is ready."""
+    if not _rebuilding.acquire(blocking=False):
+        return
+
+    def run():
+        global _index
+        try:
+            _index = _replay(_rebuild())
+        except Exception:
+            logger.exception("Could not rebuild the autocomplete index")
+        finally:
+            connections.close_all()
+            _rebuilding.release()
+
+    threading.Thread(target=run, name="catalog-autocomplete-rebuild", daemon=True).start()
+
+
+def _rebuild():
+    # a fresh snapshot starts at the current log position; with a shared
+    # snapshot one worker rewrites it and the others reload it (_sync)
+    path = getattr(settings, "AUTOCOMPLETE_SNAPSHOT", None)
+    if path and cache.add(REBUILD_LOCK, 1, 600):
+        try:
+            write_snapshot(path)
+        finally:
+            cache.delete(REBUILD_LOCK)
+    return _load()
+
+
+def reset():
+    """Forget this worker's index (tests, or after restoring a database)."""
+    global _index
+    _index = None
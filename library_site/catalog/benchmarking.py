@@ -0,0 +1,110 @@
+"""Helpers shared by the benchmark and dataset commands."""
+import logging
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection, connections, reset_queries, transaction
+from django.db.backends.signals import connection_created
+from django.test.utils import CaptureQueriesContext
+
+
+SYLLABLES = "ba ki lo mu na ro si ta yu zo qa sh ch ng dar ur ol bek xon oy gul".split()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def vocabulary(rnd, size=5000):
+    """Pseudo-words plus Zipf-ish weights: a few very common, a long rare tail."""
+    words = set()
+    while len(words) < size:
+        words.add("".join(rnd.choices(SYLLABLES, k=rnd.randint(2, 4))))
+    words = sorted(words)
+    rnd.shuffle(words)
+    return words, [1 / rank for rank in range(1, size + 1)]
+
+
+def summarize(latencies_ms, queries, statuses, elapsed):
+    return {
+        "requests": len(latencies_ms),
+        "throughput_rps": round(len(latencies_ms) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies_ms), 2),
+        "queries_mean": round(statistics.fmean(queries), 1),
+        "queries_max": max(queries),
+        "statuses": {str(code): statuses.count(code) for code in sorted(set(statuses))},
+    }
+
+
+@contextmanager
+def rolled_back():
+    """Run a benchmark inside a transaction that is always rolled back, so
+    URLs that change state (borrow, return, ...) leave no trace."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+@contextmanager
+def simulated_latency(seconds):
+    """Add ``seconds`` to every statement on every connection, including
+    ones other threads open meanwhile: a stand-in for a slow or distant
+    database."""
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(connection, **kwargs):
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, delay)
+
+    for alias in connections:
+        install(connections[alias])
+    connection_created.connect(install, weak=False)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+
+
+def run_targets(client, targets, requests=50, warmup=3):
+    """GET each ``(name, path)`` ``requests`` times and summarize it."""
+    results = {}
+    # expected 404s/403s would otherwise log once per request
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+    for name, path in targets:
+        for _ in range(warmup):
+            client.get(path)
+        latencies, queries, statuses = [], [], []
+        started = time.perf_counter()
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                response = client.get(path)
+                latencies.append((time.perf_counter() - t0) * 1000)
+            queries.append(len(ctx))
+            statuses.append(response.status_code)
+            reset_queries()
+        results[name] = {"path": path, **summarize(latencies, queries, statuses, time.perf_counter() - started)}
+    return results
+
+
+def compare(current, baseline):
+    """Per-target change of the headline numbers against an earlier run."""
+    rows = []
+    for name, now in current.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        rows.append({
+            "target": name,
+            "p95_ms": (before["p95_ms"], now["p95_ms"]),
+            "throughput_rps": (before["throughput_rps"], now["throughput_rps"]),
+            "queries_mean": (before["queries_mean"], now["queries_mean"]),
+        })
+    return rows
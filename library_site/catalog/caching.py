@@ -0,0 +1,197 @@
+"""Rendered-fragment and page caching with versioned keys.
+
+Every book has a version number in the cache; its card fragment is stored
+under ``catalog:card:<id>:<version>``, so bumping the version (from the
+signals in ``catalog.signals`` and from ``services``) invalidates exactly
+that book's entries and old ones simply age out. The anonymous home page is
+keyed by the catalogue "list" version plus the versions of the books it
+shows, so an unchanged home page is served without touching the database.
+
+Bumps run on commit, so a reader can never cache pre-commit data under a
+post-commit version. Hot keys use a soft expiry: the first request after it
+takes a short lock and recomputes while everyone else keeps getting the old
+value, so an expiring home page cannot stampede the database.
+
+Values computed here read from the primary (``routers.primary_reads``): a
+lagging replica must not get old rows cached under a new version. Cards
+are rendered from the rows the page already loaded, so with a replica a
+card can trail its book until the next change.
+
+Only add/get_many/set_many/incr are used, which every shared backend
+(Redis, Memcached, database) supports; tests run on LocMemCache.
+(UZ: kesh)
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from .routers import primary_reads
+
+
+CARD_TIMEOUT = 24 * 3600
+PAGE_TIMEOUT = 300
+LOCK_TIMEOUT = 10
+HOME_SIZE = 8
+
+LIST_KEY = "catalog:list:v"
+
+
+def _version_key(book_id):
+    return f"catalog:book:v:{book_id}"
+
+
+def _fresh_version():
+    # A version that never existed before: if a counter is evicted, the
+    # fragments cached under its old values can never be matched again.
+    return time.time_ns()
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:  # missing or evicted
+        cache.set(key, _fresh_version(), None)
+
+
+def versions(book_ids):
+    """``{book_id: version}``, creating missing counters."""
+    keys = {_version_key(pk): pk for pk in book_ids}
+    found = cache.get_many(keys)
+    missing = {key: _fresh_version() for key in keys if key not in found}
+    for key, value in missing.items():
+        # add() so two first readers agree on one value
+        if not cache.add(key, value, None):
+            value = cache.get(key, value)
+        found[key] = value
+    return {keys[key]: value for key, value in found.items()}
+
+
+def list_version():
+    version = cache.get(LIST_KEY)
+    if version is None:
+        cache.add(LIST_KEY, _fresh_version(), None)
+        version = cache.get(LIST_KEY)
+    return version
+
+
+def touch_books(book_ids, listing=False):
+    """Invalidate the cached fragments of ``book_ids`` once the transaction
+    commits; ``listing`` also invalidates which books the home page shows."""
+    book_ids = list(book_ids)
+
+    def bump():
+        for pk in book_ids:
+            _bump(_version_key(pk))
+        if listing:
+            _bump(LIST_KEY)
+
+    transaction.on_commit(bump)
+
+
+def touch_books_of(book_ids):
+    """Like touch_books() for a lazy ``values_list`` of book ids, which is
+    only evaluated on commit (keeps the lookup out of short transactions)."""
+    transaction.on_commit(lambda: [_bump(_version_key(pk)) for pk in book_ids])
+
+
+def touch_catalog():
+    """After bulk changes that bypass signals (imports, generated data)."""
+    transaction.on_commit(lambda: _bump(LIST_KEY))
+
+
+def get_or_compute(key, compute, timeout=PAGE_TIMEOUT, lock_timeout=LOCK_TIMEOUT):
+    """Cache-aside with a soft expiry and a recompute lock.
+
+    Entries live ``timeout + lock_timeout`` seconds but count as stale after
+    ``timeout``. The first request to see a stale or missing entry takes the
+    lock and recomputes; concurrent requests serve the stale value meanwhile
+    (or, with nothing cached yet, wait briefly for the winner).
+    """
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None and entry[1] > now:
+        return entry[0]
+
+    lock = f"{key}:lock"
+    owner = cache.add(lock, 1, lock_timeout)
+    if not owner:
+        if entry is not None:
+            return entry[0]
+        deadline = now + lock_timeout
+        while time.time() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+        # the lock holder died or is very slow; compute it ourselves
+    try:
+        with primary_reads():
+            value = compute()
+        cache.set(key, (value, time.time() + timeout), timeout + lock_timeout)
+    finally:
+        if owner:
+            cache.delete(lock)
+    return value
+
+
+def render_cards(books, template_name="catalog/_book_card.html"):
+    """Rendered cards for ``books`` in order, two cache round trips in all."""
+    books = list(books)
+    if not books:
+        return []
+    current = versions(b.pk for b in books)
+    keys = {b.pk: f"catalog:card:{b.pk}:{current[b.pk]}" for b in books}
+    cached = cache.get_many(keys.values())
+    fresh = {}
+    cards = []
+    for b in books:
+        html = cached.get(keys[b.pk])
+        if html is None:
+            html = fresh[keys[b.pk]] = render_to_string(template_name, {"b": b})
+        cards.append(html)
+    if fresh:
+        cache.set_many(fresh, CARD_TIMEOUT)
+    return cards
+
+
+def home_page_key(latest_ids):
+    """Key for the home page showing ``latest_ids``; changes whenever any of
+    those books (or the list itself) does."""
+    current = versions(latest_ids)
+    digest = hashlib.sha256(
+        ",".join(f"{pk}.{current[pk]}" for pk in latest_ids).encode()
+    ).hexdigest()[:16]
+    return f"catalog:home:{digest}"
+
+
+def latest_book_ids(fetch):
+    """Ids of the books on the home page, cached per list version."""
+    key = f"catalog:home:ids:{list_version()}"
+    ids = cache.get(key)
+    if ids is None:
+        with primary_reads():
+            ids = list(fetch())
+        cache.set(key, ids, PAGE_TIMEOUT)
+    return ids
+
+
+def first_reviews(book_id, fetch):
+    """The newest page of a book's reviews, cached per book version.
+
+    Only what the page shows is cached, as plain values (the reviewer's
+    username, not the user row with its password hash).
+    """
+    key = f"catalog:reviewpage:{book_id}:{versions([book_id])[book_id]}"
+    page = cache.get(key)
+    if page is None:
+        with primary_reads():
+            page = fetch()
+        page.object_list = [
+            {"user": r.user.get_username(), "rating": r.rating, "text": r.text, "created_at": r.created_at}
+            for r in page
+        ]
+        cache.set(key, page, CARD_TIMEOUT)
+    return page
@@ -0,0 +1,138 @@
+""""Readers also borrowed": the co-borrow matrix and its top-K lists.
+
+``catalog.recommendations`` reads the loan history and stores the lists;
+this module only does the maths. (library_system's books app has its own
+copy, books/coborrow.py.)
+
+From the readers × books matrix X of past loans, C = Xᵀ·X: C[a, b] is the
+number of readers who borrowed both books. Suggestions are ranked by
+cosine similarity, C[a, b] / √(n_a·n_b) with n the book's number of
+readers, so the titles everyone borrows do not crowd every list. C is a
+sparse (CSR) matrix product (NumPy, SciPy); the tests check it against a
+plain Python version.
+(UZ: birga olishlar matritsasi)
+"""
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+
+# neighbours stored per book
+TOP_K = 12
+# one shared reader may be a coincidence
+MIN_TOGETHER = 2
+# only a reader's most recent loans count, so a staff or class account with
+# thousands of loans does not make C dense
+MAX_BASKET = 500
+CHUNK = 500
+
+
+def baskets(rows):
+    """Each reader's books, distinct, most recent first, from ``(reader, book)``
+    rows that give each reader's loans newest first (the readers may
+    interleave, e.g. one table after another)."""
+    result = {}
+    for reader, book_id in rows:
+        basket = result.setdefault(reader, {})
+        if len(basket) < MAX_BASKET:
+            basket[book_id] = None
+    return [list(basket) for basket in result.values()]
+
+
+def chunks(ids):
+    ids = list(ids)
+    for i in range(0, len(ids), CHUNK):
+        yield ids[i:i + CHUNK]
+
+
+def neighbors(baskets, reader_counts=None, book_ids=None, k=TOP_K):
+    """``{book: [(neighbour, score, together), ...]}``, best first, at most
+    ``k`` per book (``k=None``: every pair of at least ``MIN_TOGETHER``).
+
+    Without ``book_ids`` every row of C, with the reader counts taken from
+    the baskets. With ``book_ids`` only those rows: the baskets are then the
+    histories of their readers only, so ``reader_counts(ids)`` has to count
+    the neighbours' readers elsewhere (the database).
+    """
+    if not baskets:
+        return {}
+    if book_ids is None:
+        n = Counter(b for basket in baskets for b in basket)
+
+        def reader_counts(ids):
+            return n
+    else:
+        book_ids = set(book_ids)
+    return neighbors_sparse(baskets, reader_counts, book_ids, k)
+
+
+def neighbors_sparse(baskets, reader_counts, book_ids, k=TOP_K):
+    columns = np.array(sorted({b for basket in baskets for b in basket}), dtype=np.int64)
+    position = {book_id: i for i, book_id in enumerate(columns.tolist())}
+    indptr = np.cumsum([0] + [len(basket) for basket in baskets], dtype=np.int64)
+    indices = np.fromiter((position[b] for basket in baskets for b in basket), dtype=np.int64, count=indptr[-1])
+    x = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.float32), indices, indptr), shape=(len(baskets), len(columns))
+    )
+    targets = columns if book_ids is None else np.array(sorted(book_ids & position.keys()), dtype=np.int64)
+    xt = x.T.tocsr()
+    if book_ids is not None:
+        xt = xt[[position[b] for b in targets.tolist()]]
+    together = (xt @ x).tocsr()
+    own = np.array([position[b] for b in targets.tolist()], dtype=np.int64)
+    row_of = np.repeat(np.arange(together.shape[0]), np.diff(together.indptr))
+    keep = (together.data >= MIN_TOGETHER) & (together.indices != own[row_of])
+    row_of, cols, counts = row_of[keep], together.indices[keep], together.data[keep]
+    needed = np.union1d(own[np.unique(row_of)], cols)
+    n = reader_counts(columns[needed].tolist())
+    readers = np.zeros(len(columns))
+    readers[needed] = [n[b] for b in columns[needed].tolist()]
+    scores = counts / np.sqrt(readers[own[row_of]] * readers[cols])
+
+    # within a row: best score first, ties by id; then the first k of each
+    order = np.lexsort((columns[cols], -scores, row_of))
+    row_of, cols, counts, scores = row_of[order], cols[order], counts[order], scores[order]
+    rank = np.arange(len(row_of)) - np.searchsorted(row_of, row_of)
+    best = rank < (len(rank) if k is None else k)
+    result = {}
+    for r, c, score, together_count in zip(
+        targets[row_of[best]].tolist(), columns[cols[best]].tolist(), scores[best].tolist(), counts[best].tolist()
+    ):
+        result.setdefault(r, []).append((c, score, int(together_count)))
+    return result
+
+
+def merge(neighbors, borrowed, stored):
+    """Partial run, in place: ``neighbors`` holds the recomputed rows of
+    ``borrowed`` in full (``k=None``); they are cut to ``TOP_K`` and, the
+    score being symmetric, each (b, score) in them replaces b's old score in
+    its neighbour's stored list. ``stored(chunk)`` reads those lists as
+    ``(book, neighbour, score, together)`` rows; of those lists only the
+    ones that change are added. A pair that was just outside a stored list is not known
+    here, so such a list can still differ from a rebuild until the next one.
+    """
+    for book_id in borrowed:
+        neighbors.setdefault(book_id, [])
+    incoming = {}
+    for book_id in borrowed:
+        for other, score, together in neighbors[book_id]:
+            if other not in borrowed:
+                incoming.setdefault(other, {})[book_id] = (score, together)
+        neighbors[book_id] = neighbors[book_id][:TOP_K]
+    for chunk in chunks(incoming):
+        merged = {book_id: {} for book_id in chunk}
+        for book_id, other, score, together in stored(chunk):
+            merged[book_id][other] = (score, together)
+        for book_id in chunk:
+            before = _best(merged[book_id])
+            merged[book_id].update(incoming[book_id])
+            best = _best(merged[book_id])
+            if best != before:
+                neighbors[book_id] = best
+    return neighbors
+
+
+def _best(row):
+    ranked = sorted(row.items(), key=lambda item: (-item[1][0], item[0]))[:TOP_K]
+    return [(other, score, together) for other, (score, together) in ranked]
@@ -0,0 +1,136 @@
+"""Streaming readers for bulk catalog imports.
+
+Every reader is a generator of plain dicts with the keys ``title``,
+``author`` ((first, last) tuple), ``isbn``, ``description``, ``year`` and
+``categories`` (list of names), so ``import_catalog`` never holds more than
+one batch in memory. (UZ: katalogni ommaviy yuklash)
+"""
+import csv
+import json
+import re
+
+
+ISBN_RE = re.compile(r"[^0-9Xx]")
+
+
+def normalize_isbn(value):
+    isbn = ISBN_RE.sub("", value or "").upper()
+    return isbn if len(isbn) in (10, 13) else ""
+
+
+def split_author(name):
+    """'Orwell, George' / 'George Orwell' -> ('George', 'Orwell')."""
+    name = " ".join((name or "").split())
+    if not name:
+        return "", ""
+    if "," in name:
+        last, first = name.split(",", 1)
+        return first.strip(" ."), last.strip()
+    first, _, last = name.rpartition(" ")
+    return first, last
+
+
+def parse_year(value):
+    match = re.search(r"\d{4}", str(value or ""))
+    return int(match.group()) if match else None
+
+
+def split_categories(value):
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in (value or "").split(";") if v.strip()]
+
+
+def normalize(raw):
+    if raw.get("author_last_name") or raw.get("author_first_name"):
+        author = (raw.get("author_first_name", "").strip(), raw.get("author_last_name", "").strip())
+    else:
+        author = split_author(raw.get("author", ""))
+    return {
+        "title": (raw.get("title") or "").strip(),
+        "author": author,
+        "isbn": normalize_isbn(raw.get("isbn")),
+        "description": (raw.get("description") or "").strip(),
+        "year": parse_year(raw.get("year")),
+        "categories": split_categories(raw.get("categories")),
+    }
+
+
+def read_csv(fh):
+    for raw in csv.DictReader(fh):
+        yield normalize(raw)
+
+
+def read_jsonl(fh):
+    for line in fh:
+        line = line.strip()
+        if line:
+            yield normalize(json.loads(line))
+
+
+# MARC21 (ISO 2709) -------------------------------------------------------
+
+RECORD_END, FIELD_END, SUBFIELD = b"\x1d", b"\x1e", b"\x1f"
+
+
+def _marc_records(fh, chunk_size=1 << 16):
+    buffer = b""
+    while True:
+        chunk = fh.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        *records, buffer = buffer.split(RECORD_END)
+        yield from records
+    if buffer.strip():
+        yield buffer
+
+
+def _marc_fields(record):
+    """Map tag -> list of {subfield code: value} for the variable data fields."""
+    base = int(record[12:17])
+    directory = record[24:base - 1]
+    fields = {}
+    for i in range(0, len(directory), 12):
+        tag = directory[i:i + 3].decode()
+        length, start = int(directory[i + 3:i + 7]), int(directory[i + 7:i + 12])
+        data = record[base + start:base + start + length].rstrip(FIELD_END)
+        if tag < "010":
+            continue
+        subfields = {}
+        for part in data.split(SUBFIELD)[1:]:
+            if part:
+                code = part[:1].decode()
+                subfields.setdefault(code, part[1:].decode("utf-8", "replace").strip(" /:;,."))
+        fields.setdefault(tag, []).append(subfields)
+    return fields
+
+
+def read_marc(fh):
+    for record in _marc_records(fh):
+        if len(record) < 25:
+            continue
+        fields = _marc_fields(record)
+
+        def first(tag, code):
+            for f in fields.get(tag, []):
+                if f.get(code):
+                    return f[code]
+            return ""
+
+        title = " ".join(p for p in (first("245", "a"), first("245", "b")) if p)
+        yield {
+            "title": title,
+            "author": split_author(first("100", "a")),
+            "isbn": normalize_isbn(first("020", "a").split(" ")[0]),
+            "description": first("520", "a"),
+            "year": parse_year(first("264", "c") or first("260", "c")),
+            "categories": [f["a"] for f in fields.get("650", []) if f.get("a")],
+        }
+
+
+READERS = {
+    "csv": (read_csv, "text"),
+    "jsonl": (read_jsonl, "text"),
+    "marc": (read_marc, "binary"),
+}
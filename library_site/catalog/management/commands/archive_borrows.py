@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from catalog import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move loans returned more than BORROW_ARCHIVE_AFTER_DAYS ago to the archive table, in "
+        "batches (nightly). An interrupted run carries on where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--days", type=int, help="Default: settings.BORROW_ARCHIVE_AFTER_DAYS.")
+        parser.add_argument("--sleep", type=float, default=0, help="Pause between batches, in seconds.")
+        parser.add_argument("--max-batches", type=int, help="Stop after this many batches.")
+        parser.add_argument("--dry-run", action="store_true", help="Only report the table sizes.")
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+        days = settings.BORROW_ARCHIVE_AFTER_DAYS if opts["days"] is None else opts["days"]
+        before = archive.cutoff(days)
+        sizes = archive.stats(before)
+        self.stdout.write(
+            f"Hot table: {sizes['hot']} loan(s), {sizes['open']} open, {sizes['archivable']} returned "
+            f"before {before:%Y-%m-%d}; archive: {sizes['archived']} loan(s)."
+        )
+        if opts["dry_run"]:
+            return
+        moved = archive.run(before, opts["batch_size"], opts["sleep"], opts["max_batches"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} loan(s) in {time.perf_counter() - started:.1f}s."
+        ))
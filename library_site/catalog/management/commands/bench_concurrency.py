@@ -0,0 +1,231 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from catalog.benchmarking import simulated_latency, summarize
+from catalog.models import Book
+
+
+QUERIES = re.compile(r'desc="(\d+) queries')
+USERNAME = "bench-concurrency"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync views under WSGI (a pool of server threads) with the async "
+        "views under ASGI (one event loop) at several client concurrencies, with every "
+        "SQL statement slowed down by --db-latency. Each mode runs in its own process "
+        "with the handlers called in-process, so only Django itself is measured."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64],
+                            help="Clients with a request in flight at once.")
+        parser.add_argument("--requests", type=int, default=200, help="Requests per URL and concurrency.")
+        parser.add_argument("--db-latency", type=float, default=20, help="Milliseconds added to every statement.")
+        parser.add_argument("--threads", type=int, default=8, help="WSGI server threads (gunicorn --threads).")
+        parser.add_argument("--only", nargs="+", metavar="NAME", help="Targets to run (home, book_list, ...).")
+        parser.add_argument("--output", help="Also write the JSON to this file.")
+        parser.add_argument("--mode", choices=["wsgi", "asgi"], help="Run one side only (used internally).")
+
+    def handle(self, *args, **opts):
+        if not Book.objects.exists():
+            raise CommandError("The catalog is empty; run generate_dataset first.")
+        if opts["mode"]:
+            self.stdout.write(json.dumps(self._run_mode(opts)))
+            return
+
+        results = {mode: self._spawn(mode, opts) for mode in ("wsgi", "asgi")}
+        report = json.dumps(results, indent=2)
+        self.stdout.write(report)
+        if opts["output"]:
+            with open(opts["output"], "w") as fh:
+                fh.write(report + "\n")
+        self.stdout.write(f"{'target':<16}{'clients':>8}  {'wsgi rps':>9} {'p95 ms':>8}  {'asgi rps':>9} {'p95 ms':>8}")
+        for name, levels in results["wsgi"].items():
+            for level, sync in levels.items():
+                other = results["asgi"][name][level]
+                self.stdout.write(
+                    f"{name:<16}{level:>8}  {sync['throughput_rps']:>9} {sync['p95_ms']:>8}  "
+                    f"{other['throughput_rps']:>9} {other['p95_ms']:>8}"
+                )
+
+    def _spawn(self, mode, opts):
+        """Run one side in a fresh process: urls.py picks sync or async views
+        at import time (ASYNC_VIEWS)."""
+        argv = [
+            sys.executable, sys.argv[0], "bench_concurrency", "--mode", mode,
+            "--requests", str(opts["requests"]), "--db-latency", str(opts["db_latency"]),
+            "--threads", str(opts["threads"]), "--concurrency", *map(str, opts["concurrency"]),
+        ]
+        if opts["only"]:
+            argv += ["--only", *opts["only"]]
+        env = {**os.environ, "ASYNC_VIEWS": "1" if mode == "asgi" else "0"}
+        self.stderr.write(f"running {mode}...")
+        done = subprocess.run(argv, env=env, capture_output=True, text=True)
+        if done.returncode:
+            raise CommandError(f"{mode} run failed:\n{done.stderr}")
+        return json.loads(done.stdout)
+
+    # one side ------------------------------------------------------------
+
+    def _run_mode(self, opts):
+        logging.getLogger("django.request").setLevel(logging.ERROR)
+        if (opts["mode"] == "asgi") != settings.ASYNC_VIEWS:
+            raise CommandError("Set ASYNC_VIEWS=1 for --mode asgi (and unset it for wsgi).")
+        cookie = self._login()
+        try:
+            targets = self._targets(opts["only"])
+            run = self._run_wsgi if opts["mode"] == "wsgi" else self._run_asgi
+            results = {}
+            with simulated_latency(opts["db_latency"] / 1000):
+                for name, path in targets:
+                    run(path, cookie, 2, 4, opts["threads"])  # warm up
+                    results[name] = {
+                        str(level): run(path, cookie, level, opts["requests"], opts["threads"])
+                        for level in opts["concurrency"]
+                    }
+            return results
+        finally:
+            get_user_model().objects.filter(username=USERNAME).delete()
+
+    def _login(self):
+        """A committed user and session (requests run on other threads and
+        connections, so nothing can stay inside a transaction)."""
+        User = get_user_model()
+        user, _ = User.objects.get_or_create(username=USERNAME)
+        session = SessionStore()
+        session["_auth_user_id"] = str(user.pk)
+        session["_auth_user_backend"] = "django.contrib.auth.backends.ModelBackend"
+        session["_auth_user_hash"] = user.get_session_auth_hash()
+        session.create()
+        return f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+
+    def _targets(self, only):
+        book = Book.objects.order_by("-rating_count", "id").first()
+        word = book.title.split()[0]
+        targets = [
+            ("home", reverse("catalog:home")),
+            ("book_list", reverse("catalog:book_list")),
+            ("book_list?q", f"{reverse('catalog:book_list')}?q={word}"),
+            ("book_detail", reverse("catalog:book_detail", args=[book.pk])),
+            ("profile", reverse("catalog:profile")),
+        ]
+        return [t for t in targets if not only or t[0] in only]
+
+    def _measure(self, fire):
+        """Time ``fire(record)``, which issues the requests and records each."""
+        latencies, queries, statuses = [], [], []
+        lock = threading.Lock()
+
+        def record(started, status, timing):
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses.append(status)
+                match = QUERIES.search(timing or "")
+                queries.append(int(match.group(1)) if match else 0)
+
+        started = time.perf_counter()
+        fire(record)
+        return summarize(latencies, queries, statuses, time.perf_counter() - started)
+
+    def _run_wsgi(self, path, cookie, concurrency, requests, threads):
+        from django.core.handlers.wsgi import WSGIHandler
+        from wsgiref.util import setup_testing_defaults
+
+        app = WSGIHandler()
+        url_path, _, query = path.partition("?")
+        server = ThreadPoolExecutor(max_workers=threads)
+
+        def handle():
+            environ = {
+                "REQUEST_METHOD": "GET", "PATH_INFO": url_path, "QUERY_STRING": query,
+                "HTTP_HOST": "localhost", "HTTP_COOKIE": cookie, "wsgi.input": io.BytesIO(),
+            }
+            setup_testing_defaults(environ)
+            reply = {}
+
+            def start_response(status, headers, exc_info=None):
+                reply["status"] = int(status.split()[0])
+                reply["headers"] = dict(headers)
+
+            response = app(environ, start_response)
+            b"".join(response)
+            response.close()
+            return reply["status"], reply["headers"].get("Server-Timing")
+
+        def client(record, count):
+            for _ in range(count):
+                t0 = time.perf_counter()
+                record(t0, *server.submit(handle).result())
+
+        def fire(record):
+            with ThreadPoolExecutor(max_workers=concurrency) as clients:
+                for n in _split(requests, concurrency):
+                    clients.submit(client, record, n)
+
+        try:
+            return self._measure(fire)
+        finally:
+            server.shutdown()
+
+    def _run_asgi(self, path, cookie, concurrency, requests, threads):
+        from django.core.handlers.asgi import ASGIHandler
+
+        app = ASGIHandler()
+        url_path, _, query = path.partition("?")
+
+        async def handle():
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+                "method": "GET", "scheme": "http", "path": url_path, "raw_path": url_path.encode(),
+                "query_string": query.encode(), "root_path": "",
+                "headers": [(b"host", b"localhost"), (b"cookie", cookie.encode())],
+                "client": ("127.0.0.1", 50000), "server": ("localhost", 80),
+            }
+            body_sent = False
+            reply = {}
+
+            async def receive():
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await asyncio.Future()  # the client never disconnects
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    reply["status"] = message["status"]
+                    reply["headers"] = {k.decode(): v.decode() for k, v in message["headers"]}
+
+            await app(scope, receive, send)
+            return reply["status"], reply["headers"].get("Server-Timing")
+
+        async def client(record, count):
+            for _ in range(count):
+                t0 = time.perf_counter()
+                record(t0, *await handle())
+
+        async def clients(record):
+            await asyncio.gather(*(client(record, n) for n in _split(requests, concurrency)))
+
+        return self._measure(lambda record: asyncio.run(clients(record)))
+
+
+def _split(total, parts):
+    """``total`` requests over ``parts`` clients, as evenly as possible."""
+    return [total // parts + (i < total % parts) for i in range(parts)]
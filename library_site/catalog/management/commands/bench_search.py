@@ -0,0 +1,79 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog import search
+from catalog.benchmarking import percentile, vocabulary
+from catalog.models import Author, Book
+
+
+class Command(BaseCommand):
+    help = "Benchmark catalog full-text search against icontains on synthetic data (rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000])
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--no-baseline", action="store_true", help="Skip the title__icontains comparison.")
+
+    def handle(self, *args, **opts):
+        rnd = random.Random(opts["seed"])
+        words, weights = vocabulary(rnd)
+        queries = [
+            " ".join(rnd.choices(words, weights, k=rnd.choice([1, 1, 2]))) for _ in range(opts["queries"])
+        ]
+        # synthetic rows never outlive the run (UZ: ma'lumotlar saqlanmaydi)
+        with transaction.atomic():
+            authors = Author.objects.bulk_create(
+                Author(first_name=rnd.choice(words).title(), last_name=rnd.choice(words).title())
+                for _ in range(500)
+            )
+            count = 0
+            for size in sorted(opts["sizes"]):
+                count = self._fill(rnd, words, weights, authors, count, size, opts["batch_size"])
+                fts = self._time(lambda q: search.search_books(Book.objects.all(), q), queries)
+                self._report(size, "fulltext", fts)
+                if not opts["no_baseline"]:
+                    base = self._time(lambda q: Book.objects.filter(title__icontains=q).order_by("-id"), queries)
+                    self._report(size, "icontains", base)
+            transaction.set_rollback(True)
+
+    def _fill(self, rnd, words, weights, authors, count, size, batch_size):
+        started = time.perf_counter()
+        while count < size:
+            n = min(batch_size, size - count)
+            books = Book.objects.bulk_create(
+                Book(
+                    title=" ".join(rnd.choices(words, weights, k=rnd.randint(2, 5))).capitalize(),
+                    author=rnd.choice(authors),
+                    description=" ".join(rnd.choices(words, weights, k=30)),
+                    isbn=f"{rnd.randrange(10**12, 10**13)}",
+                    year=rnd.randint(1900, 2025),
+                )
+                for _ in range(n)
+            )
+            search.reindex_books([b.pk for b in books])
+            count += n
+        self.stdout.write(f"{size} books ready in {time.perf_counter() - started:.1f}s")
+        return count
+
+    def _time(self, build, queries):
+        samples = []
+        for q in queries:
+            started = time.perf_counter()
+            qs = build(q)
+            # what BookListView pays: the paginator count plus the first page
+            qs.count()
+            list(qs[:12])
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    def _report(self, size, mode, samples):
+        self.stdout.write(
+            f"{size:>9} {mode:<10} p50={statistics.median(samples):8.2f}ms "
+            f"p95={percentile(samples, 95):8.2f}ms max={max(samples):8.2f}ms"
+        )
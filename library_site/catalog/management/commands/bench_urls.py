@@ -0,0 +1,105 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from catalog import services
+from catalog.benchmarking import compare, rolled_back, run_targets
+from catalog.models import Book, BookCopy, Borrow
+from catalog.urls import app_name, urlpatterns
+
+
+# GETs on these change data; they are still rolled back, but after the first
+# request every repeat only measures the "already borrowed/returned" path
+UNSAFE = {"borrow_copy", "return_copy"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every URL in catalog/urls.py with the test client (throughput, "
+        "p50/p95/p99 latency, query counts) and print the results as JSON. "
+        "Run `generate_dataset` first for meaningful numbers; the run itself is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50, help="Timed requests per URL.")
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument("--only", nargs="+", metavar="NAME", help="URL names (or variants) to run.")
+        parser.add_argument("--user", help="Username to log in as. Default: the most recent borrower.")
+        parser.add_argument("--include-unsafe", action="store_true", help=f"Also time {', '.join(sorted(UNSAFE))}.")
+        parser.add_argument("--output", help="Also write the JSON to this file.")
+        parser.add_argument("--compare", metavar="BASELINE", help="JSON from an earlier run to diff against.")
+
+    def handle(self, *args, **opts):
+        if not Book.objects.exists():
+            raise CommandError("The catalog is empty; run generate_dataset first.")
+        # a crashing view is reported as a 500 instead of aborting the run;
+        # the host must pass ALLOWED_HOSTS or every URL answers 400
+        host = next((h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"), "localhost")
+        client = Client(HTTP_HOST=host, raise_request_exception=False)
+        with rolled_back():
+            user = self._user(opts["user"])
+            client.force_login(user)
+            targets = self._targets(user, opts)
+            results = run_targets(client, targets, opts["requests"], opts["warmup"])
+
+        report = json.dumps(results, indent=2)
+        self.stdout.write(report)
+        if opts["output"]:
+            with open(opts["output"], "w") as fh:
+                fh.write(report + "\n")
+        if opts["compare"]:
+            with open(opts["compare"]) as fh:
+                for row in compare(results, json.load(fh)):
+                    self.stdout.write(
+                        "{target:<28} p95 {p95_ms[0]:>8} -> {p95_ms[1]:<8} ms  "
+                        "rps {throughput_rps[0]:>7} -> {throughput_rps[1]:<7}  "
+                        "queries {queries_mean[0]:>5} -> {queries_mean[1]}".format(**row)
+                    )
+
+    def _user(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {username!r}.")
+        latest = Borrow.objects.order_by("-id").select_related("user").first()
+        return latest.user if latest else User.objects.create_user("bench")
+
+    def _samples(self, user):
+        """Values for the URL parameters: the best-stocked book, one of its
+        free copies and an open loan of ``user`` (made here if it has none)."""
+        book = Book.objects.order_by("-available_copies", "id").first()
+        copy_id = book.copies.filter(status=BookCopy.AVAILABLE).values_list("pk", flat=True).first()
+        borrow_id = Borrow.objects.filter(user=user, returned_at=None).values_list("pk", flat=True).first()
+        if borrow_id is None and copy_id is not None:
+            borrow_id = services.borrow_copy(user, copy_id).pk
+            copy_id = book.copies.filter(status=BookCopy.AVAILABLE).values_list("pk", flat=True).first()
+        word = book.title.split()[0]
+        return {"pk": book.pk, "copy_id": copy_id, "borrow_id": borrow_id}, word
+
+    def _targets(self, user, opts):
+        samples, word = self._samples(user)
+        targets = []
+        for pattern in urlpatterns:
+            name = pattern.name
+            if name in UNSAFE and not opts["include_unsafe"]:
+                continue
+            params = {key: samples.get(key) for key in pattern.pattern.converters}
+            if None in params.values():
+                self.stderr.write(f"skipping {name}: no sample for {params}")
+                continue
+            targets.append((name, reverse(f"{app_name}:{name}", kwargs=params)))
+            if name == "book_list":
+                # the list view's other code paths
+                targets += [
+                    ("book_list?q", f"{targets[-1][1]}?q={word}"),
+                    ("book_list?sort=title", f"{targets[-1][1]}?sort=title"),
+                ]
+        if opts["only"]:
+            targets = [t for t in targets if t[0] in opts["only"]]
+        return targets
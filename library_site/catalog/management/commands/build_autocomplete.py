@@ -0,0 +1,43 @@
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import autocomplete
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the autocomplete snapshot that workers memory-map (AUTOCOMPLETE_SNAPSHOT) "
+        "and report its size, build memory and lookup latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="Snapshot path (default: settings.AUTOCOMPLETE_SNAPSHOT).")
+        parser.add_argument("--probe", nargs="*", default=["b", "ba", "o'tkan", "978"],
+                            help="Prefixes to time after the build.")
+
+    def handle(self, *args, **opts):
+        path = opts["output"] or settings.AUTOCOMPLETE_SNAPSHOT
+        if not path:
+            raise CommandError("Set AUTOCOMPLETE_SNAPSHOT or pass --output.")
+        tracemalloc.start()
+        started = time.perf_counter()
+        size = autocomplete.write_snapshot(path)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        index = autocomplete.Index(autocomplete.Snapshot.open(path))
+        stats = index.stats()
+        self.stdout.write(
+            f"{stats['books']} books, {stats['entries']} keys: {size / 2**20:.1f} MiB snapshot "
+            f"(shared between workers), built in {time.perf_counter() - started:.1f}s "
+            f"with a {peak / 2**20:.0f} MiB peak"
+        )
+        for prefix in opts["probe"]:
+            runs = 200
+            t0 = time.perf_counter()
+            for _ in range(runs):
+                results = index.complete(prefix)
+            ms = (time.perf_counter() - t0) * 1000 / runs
+            self.stdout.write(f"  {prefix!r}: {len(results)} result(s) in {ms:.3f} ms")
@@ -0,0 +1,32 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from catalog import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the \"readers also borrowed\" table (BookNeighbor) from the loan history: in full "
+        "(weekly) or, with --days, only what the recent loans changed (nightly)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="Only refresh books borrowed in the last N days.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+        if opts["days"]:
+            since = timezone.now() - timedelta(days=opts["days"])
+            books, rows = recommendations.refresh(since, batch_size=opts["batch_size"])
+            self.stdout.write(self.style.SUCCESS(
+                f"Refreshed {books} book(s), {rows} row(s) in {time.perf_counter() - started:.1f}s."
+            ))
+            return
+        rows = recommendations.rebuild(batch_size=opts["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {rows} suggestion(s) in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from catalog import services
+from catalog.models import Hold
+
+
+class Command(BaseCommand):
+    help = "Expire holds whose copy was not picked up in time and pass the copies on (run hourly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report expired holds.")
+
+    def handle(self, *args, **opts):
+        if opts["dry_run"]:
+            stale = Hold.objects.filter(status=Hold.READY, expires_at__lt=timezone.now()).count()
+            self.stdout.write(f"{stale} unclaimed hold(s) past pickup")
+            return
+        expired = services.expire_holds()
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} hold(s)."))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from catalog import caching, thumbnails
+from catalog.models import Book
+
+
+class Command(BaseCommand):
+    help = "Render WebP/JPEG cover thumbnails for books that do not have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+        parser.add_argument("--force", action="store_true", help="Re-render every cover, not just missing ones.")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        books = Book.objects.exclude(cover="").exclude(cover__isnull=True)
+        if not opts["force"]:
+            books = books.filter(cover_hash="")
+        pending = dict(books.values_list("cover", "pk"))
+        self.stdout.write(f"{len(pending)} cover(s) to render")
+        if not pending:
+            return
+
+        # forked workers must not share this process's DB connection
+        close_old_connections()
+        started, done, failed, batch = time.perf_counter(), 0, 0, []
+        for name, digest, error in thumbnails.render_many(pending, opts["workers"], opts["force"]):
+            if error:
+                failed += 1
+                self.stderr.write(f"{name}: {error}")
+                continue
+            batch.append(Book(pk=pending[name], cover_hash=digest))
+            if len(batch) >= opts["batch_size"]:
+                done += self._flush(batch)
+        done += self._flush(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {done} cover(s), {failed} failed, in {time.perf_counter() - started:.1f}s"
+        ))
+
+    def _flush(self, batch):
+        n = len(batch)
+        Book.objects.bulk_update(batch, ["cover_hash"])
+        # bulk_update sends no signals: the cached cards show the old cover
+        caching.touch_books([b.pk for b in batch])
+        batch.clear()
+        return n
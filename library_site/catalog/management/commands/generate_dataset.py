@@ -0,0 +1,233 @@
+import random
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from catalog import autocomplete, caching, search
+from catalog.benchmarking import vocabulary
+from catalog.models import Author, Book, BookCopy, Borrow, Category, Review
+
+
+@contextmanager
+def historic_timestamps(*fields):
+    """Let bulk_create write past dates into ``auto_now_add`` fields."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the catalog with seeded random authors, categories, books, copies, "
+        "loans and reviews at a chosen scale, e.g. --books 1000000 for "
+        "1M books / 3M copies / 10M loans. Rows are added to what is already there."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=10_000)
+        parser.add_argument("--copies", type=int, help="Default: 3 per book.")
+        parser.add_argument("--borrows", type=int, help="Default: 10 per book.")
+        parser.add_argument("--reviews", type=int, help="Default: 2 per book.")
+        parser.add_argument("--users", type=int, help="Default: one per 100 books (at least 50).")
+        parser.add_argument("--authors", type=int, help="Default: one per 20 books (at least 50).")
+        parser.add_argument("--categories", type=int, default=40)
+        parser.add_argument("--on-loan", type=float, default=0.1, help="Share of copies currently borrowed.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        books = opts["books"]
+        copies = opts["copies"] if opts["copies"] is not None else books * 3
+        if books < 1 or copies < books:
+            raise CommandError("Need at least one book and one copy per book.")
+        self.batch_size = opts["batch_size"]
+        self.rnd = random.Random(opts["seed"])
+        self.words, weights = vocabulary(self.rnd)
+        self.cum_weights = list(accumulate(weights))
+        self.now = timezone.now()
+        self.tag = f"g{opts['seed']}"
+
+        self.started = time.perf_counter()
+        users = self._users(opts["users"] or max(50, books // 100))
+        authors = self._authors(opts["authors"] or max(50, books // 20))
+        categories = self._categories(opts["categories"])
+        book_ids, copy_ids, on_loan = self._books(books, copies, authors, categories, opts["on_loan"])
+        borrows = opts["borrows"] if opts["borrows"] is not None else books * 10
+        self._borrows(max(borrows, len(on_loan)), copy_ids, on_loan, users)
+        self._reviews(opts["reviews"] if opts["reviews"] is not None else books * 2, book_ids, users)
+        caching.touch_catalog()
+        autocomplete.touch_all()
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - self.started:.0f}s"))
+
+    # helpers -------------------------------------------------------------
+
+    def _phrase(self, low, high):
+        return " ".join(self.rnd.choices(self.words, cum_weights=self.cum_weights, k=self.rnd.randint(low, high)))
+
+    def _popular(self, ids):
+        """Pick an id with a long-tail skew: low indexes are far more popular."""
+        return ids[int(len(ids) * self.rnd.random() ** 3)]
+
+    def _past(self, days):
+        return self.now - timedelta(days=self.rnd.uniform(0, days))
+
+    def _batches(self, total):
+        done = 0
+        while done < total:
+            n = min(self.batch_size, total - done)
+            yield n
+            done += n
+
+    def _progress(self, label, done, total):
+        rate = done / max(time.perf_counter() - self.started, 1e-6)
+        self.stdout.write(f"{label}: {done}/{total} ({rate:.0f} rows/s overall)")
+
+    # tables --------------------------------------------------------------
+
+    def _users(self, total):
+        User = get_user_model()
+        password = make_password(None)  # unusable, and hashed only once
+        prefix = f"{self.tag}-reader"
+        for start in range(0, total, self.batch_size):
+            User.objects.bulk_create(
+                [
+                    User(username=f"{prefix}{i:07}", password=password)
+                    for i in range(start, min(total, start + self.batch_size))
+                ],
+                ignore_conflicts=True,
+            )
+        ids = list(User.objects.filter(username__startswith=prefix).values_list("pk", flat=True))
+        self._progress("users", len(ids), total)
+        return ids
+
+    def _authors(self, total):
+        ids = []
+        for n in self._batches(total):
+            ids += [
+                a.pk
+                for a in Author.objects.bulk_create(
+                    Author(first_name=self.rnd.choice(self.words).title(), last_name=self.rnd.choice(self.words).title())
+                    for _ in range(n)
+                )
+            ]
+        self._progress("authors", len(ids), total)
+        return ids
+
+    def _categories(self, total):
+        names = {self._phrase(1, 2).title()[:100] for _ in range(total * 2)}
+        names = sorted(names)[:total]
+        Category.objects.bulk_create([Category(name=n) for n in names], ignore_conflicts=True)
+        return list(Category.objects.filter(name__in=names).values_list("pk", flat=True))
+
+    def _books(self, total, copies, authors, categories, on_loan):
+        book_ids, copy_ids, borrowed = array("q"), array("q"), array("q")
+        extra = copies - total  # every book gets one copy, the rest are spread
+        Through = Book.categories.through
+        # unique across repeated runs with the same seed
+        barcode = f"{self.tag}-{BookCopy.objects.aggregate(m=Max('pk'))['m'] or 0}"
+        made = 0
+        for n in self._batches(total):
+            share = round(extra * n / total)
+            counts = [1] * n
+            for _ in range(share):
+                counts[int(n * self.rnd.random() ** 2)] += 1
+            statuses = [
+                [BookCopy.BORROWED if self.rnd.random() < on_loan else BookCopy.AVAILABLE for _ in range(k)]
+                for k in counts
+            ]
+            with transaction.atomic():
+                books = Book.objects.bulk_create(
+                    Book(
+                        title=self._phrase(2, 5).capitalize()[:200],
+                        author_id=self._popular(authors),
+                        description=self._phrase(20, 60),
+                        isbn=f"{self.rnd.randrange(10**12, 10**13)}",
+                        year=self.rnd.randint(1900, 2025),
+                        # counters written directly; bulk_create skips BookCopy.save()
+                        total_copies=len(s),
+                        available_copies=s.count(BookCopy.AVAILABLE),
+                    )
+                    for s in statuses
+                )
+                Through.objects.bulk_create(
+                    [
+                        Through(book_id=b.pk, category_id=c)
+                        for b in books
+                        for c in set(self.rnd.choices(categories, k=self.rnd.randint(1, 3)))
+                    ],
+                    ignore_conflicts=True,
+                )
+                rows = [
+                    BookCopy(book_id=b.pk, barcode=f"{barcode}-{made + i}-{j}", status=status)
+                    for i, (b, s) in enumerate(zip(books, statuses))
+                    for j, status in enumerate(s)
+                ]
+                for copy in BookCopy.objects.bulk_create(rows, batch_size=self.batch_size):
+                    copy_ids.append(copy.pk)
+                    if copy.status == BookCopy.BORROWED:
+                        borrowed.append(copy.pk)
+                search.reindex_books([b.pk for b in books])
+            book_ids.extend(b.pk for b in books)
+            made += n
+            self._progress("books", made, total)
+        self.stdout.write(f"copies: {len(copy_ids)} ({len(borrowed)} on loan)")
+        return book_ids, copy_ids, borrowed
+
+    def _borrows(self, total, copy_ids, on_loan, users):
+        made = 0
+        with historic_timestamps(Borrow._meta.get_field("borrowed_at")):
+            for n in self._batches(total):
+                rows = []
+                for _ in range(n):
+                    if made < len(on_loan):
+                        # the open loan behind every copy marked borrowed;
+                        # some already past due
+                        borrowed_at = self._past(30)
+                        copy_id, returned_at = on_loan[made], None
+                    else:
+                        borrowed_at = self._past(3 * 365)
+                        copy_id = self._popular(copy_ids)
+                        returned_at = min(self.now, borrowed_at + timedelta(days=self.rnd.randint(1, 30)))
+                    rows.append(Borrow(
+                        user_id=self.rnd.choice(users),
+                        copy_id=copy_id,
+                        borrowed_at=borrowed_at,
+                        due_date=(borrowed_at + timedelta(days=14)).date(),
+                        returned_at=returned_at,
+                    ))
+                    made += 1
+                Borrow.objects.bulk_create(rows)
+                self._progress("borrows", made, total)
+
+    def _reviews(self, total, book_ids, users):
+        made = 0
+        with historic_timestamps(Review._meta.get_field("created_at")):
+            for n in self._batches(total):
+                Review.objects.bulk_create(
+                    Review(
+                        book_id=self._popular(book_ids),
+                        user_id=self.rnd.choice(users),
+                        rating=self.rnd.choices((1, 2, 3, 4, 5), (1, 1, 3, 6, 6))[0],
+                        text=self._phrase(5, 40).capitalize(),
+                        created_at=self._past(3 * 365),
+                    )
+                    for _ in range(n)
+                )
+                made += n
+                self._progress("reviews", made, total)
+        # bulk_create skips Review.save(), which maintains the book aggregates
+        call_command("reconcile_ratings", stdout=self.stdout)
@@ -0,0 +1,165 @@
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from catalog import autocomplete, caching, search
+from catalog.importers import READERS
+from catalog.models import Author, Book, CatalogImport, Category
+
+
+EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".mrc": "marc", ".marc": "marc"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream books from CSV, JSON Lines or MARC21 into the catalog in batches. "
+        "Rows already catalogued (same ISBN, or same title, author and year) are skipped; an interrupted run "
+        "resumes from its last committed batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=sorted(READERS), help="Default: guessed from the file extension.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--restart", action="store_true", help="Ignore saved progress for this file.")
+
+    def handle(self, path, **opts):
+        fmt = opts["format"] or EXTENSIONS.get(os.path.splitext(path)[1].lower())
+        if fmt not in READERS:
+            raise CommandError("Cannot guess the format, pass --format.")
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist.")
+        reader, mode = READERS[fmt]
+
+        state, _ = CatalogImport.objects.get_or_create(source=os.path.abspath(path))
+        if opts["restart"]:
+            state.rows_done = state.books_created = 0
+            state.finished = False
+            state.save()
+        if state.finished:
+            self.stdout.write(f"{path} was already imported ({state.books_created} books); use --restart to redo it.")
+            return
+        if state.rows_done:
+            self.stdout.write(f"Resuming after row {state.rows_done}")
+
+        # name -> pk lookups so rows never query per author/category
+        self.authors = {
+            (first.lower(), last.lower()): pk
+            for pk, first, last in Author.objects.values_list("pk", "first_name", "last_name").iterator()
+        }
+        self.categories = {name.lower(): pk for pk, name in Category.objects.values_list("pk", "name")}
+
+        self.started, self.rows_seen = time.perf_counter(), 0
+        open_args = {"mode": "rb"} if mode == "binary" else {"mode": "r", "encoding": "utf-8", "newline": ""}
+        with open(path, **open_args) as fh:
+            rows = reader(fh)
+            for _ in islice(rows, state.rows_done):
+                pass
+            while batch := list(islice(rows, opts["batch_size"])):
+                self._commit(state, batch)
+
+        state.finished = True
+        state.save(update_fields=["finished", "updated_at"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {state.rows_done} rows, {state.books_created} books created."
+        ))
+
+    def _commit(self, state, batch):
+        with transaction.atomic():
+            created = self._write(batch)
+            state.rows_done += len(batch)
+            state.books_created += created
+            state.save(update_fields=["rows_done", "books_created", "updated_at"])
+        self.rows_seen += len(batch)
+        rate = self.rows_seen / (time.perf_counter() - self.started)
+        self.stdout.write(f"{state.rows_done} rows, {state.books_created} books created, {rate:.0f} rows/s")
+
+    def _write(self, batch):
+        rows = [r for r in batch if r["title"] and r["author"][1]]
+
+        # dedupe against the catalogue and within the batch: by ISBN, and by
+        # title + author + year for rows without one (so --restart does not
+        # add them twice)
+        isbns = {r["isbn"] for r in rows if r["isbn"]}
+        seen = set(Book.objects.filter(isbn__in=isbns).values_list("isbn", flat=True)) if isbns else set()
+        seen |= self._catalogued_without_isbn(rows)
+        fresh = []
+        for r in rows:
+            key = r["isbn"] or _book_key(r)
+            if key in seen:
+                continue
+            seen.add(key)
+            fresh.append(r)
+        if not fresh:
+            return 0
+
+        self._ensure_authors(fresh)
+        self._ensure_categories(fresh)
+        books = Book.objects.bulk_create(
+            Book(
+                title=r["title"][:200],
+                author_id=self.authors[_author_key(r)],
+                description=r["description"],
+                isbn=r["isbn"],
+                year=r["year"],
+            )
+            for r in fresh
+        )
+        Through = Book.categories.through
+        Through.objects.bulk_create(
+            [
+                Through(book_id=book.pk, category_id=self.categories[name.lower()])
+                for book, r in zip(books, fresh)
+                for name in {c[:100] for c in r["categories"]}
+            ],
+            ignore_conflicts=True,
+        )
+        # bulk_create skips the post_save signals that keep search in sync
+        search.reindex_books([b.pk for b in books])
+        autocomplete.touch_books([b.pk for b in books])
+        caching.touch_catalog()
+        return len(books)
+
+    def _catalogued_without_isbn(self, rows):
+        """Keys of the rows without an ISBN that are catalogued already."""
+        keys = {_book_key(r) for r in rows if not r["isbn"] and _author_key(r) in self.authors}
+        if not keys:
+            return set()
+        authors = {self.authors[author]: author for _, author, _ in keys}
+        books = Book.objects.filter(
+            isbn="", title__in={title for title, _, _ in keys}, author_id__in=authors
+        ).values_list("title", "author_id", "year")
+        return keys & {(title, authors[author_id], year) for title, author_id, year in books}
+
+    def _ensure_authors(self, rows):
+        missing = {}
+        for r in rows:
+            key = _author_key(r)
+            if key not in self.authors and key not in missing:
+                missing[key] = Author(first_name=r["author"][0][:100], last_name=r["author"][1][:100])
+        for key, author in zip(missing, Author.objects.bulk_create(missing.values())):
+            self.authors[key] = author.pk
+
+    def _ensure_categories(self, rows):
+        missing = {}
+        for r in rows:
+            for name in r["categories"]:
+                name = name[:100]
+                missing.setdefault(name.lower(), name)
+        missing = {k: v for k, v in missing.items() if k not in self.categories}
+        if missing:
+            Category.objects.bulk_create([Category(name=n) for n in missing.values()], ignore_conflicts=True)
+            for pk, name in Category.objects.filter(name__in=missing.values()).values_list("pk", "name"):
+                self.categories[name.lower()] = pk
+
+
+def _author_key(row):
+    first, last = row["author"]
+    return first[:100].lower(), last[:100].lower()
+
+
+def _book_key(row):
+    return row["title"][:200], _author_key(row), row["year"]
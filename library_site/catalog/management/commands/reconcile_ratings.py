@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from catalog import caching
+from catalog.models import Book, Review
+
+
+STAR_FIELDS = [f"stars_{n}" for n in Review.STARS]
+
+
+class Command(BaseCommand):
+    help = "Recompute Book rating aggregates (sum, count, average, histogram) where they drifted from Review rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Only report drifted books.")
+
+    def handle(self, *args, **opts):
+        in_step = {"rating_sum": F("true_sum"), "rating_count": F("true_count")}
+        in_step.update({name: F(f"true_{name}") for name in STAR_FIELDS})
+        ids = list(Book.recount_ratings().exclude(**in_step).values_list("pk", flat=True))
+        self.stdout.write(f"{len(ids)} book(s) with drifted rating aggregates")
+        if opts["dry_run"] or not ids:
+            return
+
+        batch = opts["batch_size"]
+        for start in range(0, len(ids), batch):
+            with transaction.atomic():
+                books = list(Book.recount_ratings(
+                    Book.objects.select_for_update().filter(pk__in=ids[start:start + batch])
+                ).only("pk"))
+                for b in books:
+                    b.rating_sum, b.rating_count = b.true_sum, b.true_count
+                    b.rating_avg = b.true_sum / b.true_count if b.true_count else 0.0
+                    for name in STAR_FIELDS:
+                        setattr(b, name, getattr(b, f"true_{name}"))
+                Book.objects.bulk_update(books, ["rating_sum", "rating_count", "rating_avg", *STAR_FIELDS])
+                caching.touch_books(b.pk for b in books)
+        self.stdout.write(self.style.SUCCESS(f"Repaired {len(ids)} book(s)."))
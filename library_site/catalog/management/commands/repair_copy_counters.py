@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from catalog import caching
+from catalog.models import Book
+
+
+class Command(BaseCommand):
+    help = "Recompute Book.total_copies / available_copies where they drifted from BookCopy rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Only report drifted books.")
+
+    def handle(self, *args, **opts):
+        drifted = Book.recount_copies().exclude(
+            total_copies=F("true_total"), available_copies=F("true_available")
+        ).values_list("pk", flat=True)
+        ids = list(drifted)
+        self.stdout.write(f"{len(ids)} book(s) with drifted copy counters")
+        if opts["dry_run"] or not ids:
+            return
+
+        batch = opts["batch_size"]
+        for start in range(0, len(ids), batch):
+            with transaction.atomic():
+                books = list(Book.recount_copies(
+                    Book.objects.select_for_update().filter(pk__in=ids[start:start + batch])
+                ).only("pk"))
+                for b in books:
+                    b.total_copies, b.available_copies = b.true_total, b.true_available
+                Book.objects.bulk_update(books, ["total_copies", "available_copies"])
+                caching.touch_books(b.pk for b in books)
+        self.stdout.write(self.style.SUCCESS(f"Repaired {len(ids)} book(s)."))
@@ -0,0 +1,54 @@
+from django.db import migrations
+
+
+# Frozen copy of the search structures as of this migration; catalog.search
+# may change later, this schema step must not.
+PG_CREATE = [
+    "ALTER TABLE catalog_book ADD COLUMN search_vector tsvector",
+    "CREATE INDEX catalog_book_search_gin ON catalog_book USING GIN (search_vector)",
+    "UPDATE catalog_book b SET search_vector = "
+    "setweight(to_tsvector('simple', coalesce(b.title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(b.isbn, '')), 'A') || "
+    "setweight(to_tsvector('simple', a.first_name || ' ' || a.last_name), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(b.description, '')), 'C') "
+    "FROM catalog_author a WHERE a.id = b.author_id",
+]
+PG_DROP = [
+    "DROP INDEX IF EXISTS catalog_book_search_gin",
+    "ALTER TABLE catalog_book DROP COLUMN search_vector",
+]
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE catalog_book_fts USING fts5("
+    "title, author, description, isbn, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO catalog_book_fts (rowid, title, author, description, isbn) "
+    "SELECT b.id, b.title, a.first_name || ' ' || a.last_name, b.description, b.isbn "
+    "FROM catalog_book b JOIN catalog_author a ON a.id = b.author_id",
+]
+SQLITE_DROP = [
+    "DROP TABLE IF EXISTS catalog_book_fts",
+]
+
+
+def execute(schema_editor, postgres, sqlite):
+    statements = postgres if schema_editor.connection.vendor == "postgresql" else sqlite
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def create_index(apps, schema_editor):
+    execute(schema_editor, PG_CREATE, SQLITE_CREATE)
+
+
+def drop_index(apps, schema_editor):
+    execute(schema_editor, PG_DROP, SQLITE_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
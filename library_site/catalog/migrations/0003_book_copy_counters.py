@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:31
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Book = apps.get_model('catalog', 'Book')
+    BookCopy = apps.get_model('catalog', 'BookCopy')
+    copies = BookCopy.objects.filter(book=OuterRef('pk')).order_by().values('book')
+    Book.objects.update(
+        total_copies=Coalesce(Subquery(copies.annotate(n=Count('pk')).values('n')), 0),
+        available_copies=Coalesce(
+            Subquery(copies.filter(status='available').annotate(n=Count('pk')).values('n')), 0
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_book_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='available_copies',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='total_copies',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
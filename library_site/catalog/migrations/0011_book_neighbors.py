@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_holds'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('together', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['borrowed_at'], name='catalog_borrow_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='bookneighbor',
+            name='book',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='catalog.book'),
+        ),
+        migrations.AddField(
+            model_name='bookneighbor',
+            name='neighbor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbor_of', to='catalog.book'),
+        ),
+        migrations.AddIndex(
+            model_name='bookneighbor',
+            index=models.Index(fields=['book', '-score'], name='catalog_neighbor_book_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_book_neighbors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBorrow',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('borrowed_at', models.DateTimeField()),
+                ('due_date', models.DateField()),
+                ('returned_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-borrowed_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(condition=models.Q(('returned_at__isnull', False)), fields=['returned_at'], name='catalog_borrow_returned_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedborrow',
+            name='copy',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='catalog.bookcopy'),
+        ),
+        migrations.AddField(
+            model_name='archivedborrow',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedborrow',
+            index=models.Index(fields=['user', '-borrowed_at'], name='catalog_archive_user_idx'),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.conf import settings
-from django.db import models
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf
 from django.urls import reverse
+from django.utils import timezone
 
 
 class Author(models.Model):
@@ -36,7 +40,38 @@ class Book(models.Model):
     description = models.TextField(blank=True)
     isbn = models.CharField(max_length=13, blank=True)
     cover = models.ImageField(upload_to="covers/", blank=True, null=True)
+    # content hash naming the cover's thumbnails (see catalog.thumbnails)
+    cover_hash = models.CharField(max_length=12, blank=True, editable=False)
     year = models.PositiveIntegerField(blank=True, null=True)
+    # Denormalized from BookCopy so list pages need no per-row COUNT
+    # (UZ: nusxalar soni keshlangan). Kept in step by BookCopy.save()/delete();
+    # `manage.py repair_copy_counters` fixes any drift.
+    total_copies = models.PositiveIntegerField(default=0, editable=False)
+    available_copies = models.PositiveIntegerField(default=0, editable=False)
+    # length of the hold queue, kept by catalog.services (UZ: navbat uzunligi)
+    holds_waiting = models.PositiveIntegerField(default=0, editable=False)
+    # Review aggregates, same idea (UZ: baholar keshlangan): kept in step by
+    # Review.save() and the review post_delete signal, so lists sort and
+    # filter by rating through an index; `manage.py reconcile_ratings`
+    # fixes any drift. rating_avg is 0 until the first review.
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0, editable=False)
+    # histogram: number of 1..5 star reviews
+    stars_1 = models.PositiveIntegerField(default=0, editable=False)
+    stars_2 = models.PositiveIntegerField(default=0, editable=False)
+    stars_3 = models.PositiveIntegerField(default=0, editable=False)
+    stars_4 = models.PositiveIntegerField(default=0, editable=False)
+    stars_5 = models.PositiveIntegerField(default=0, editable=False)
+
+
+    class Meta:
+        indexes = [
+            # keyset pagination for the "title" sort
+            models.Index(fields=["title", "id"], name="catalog_book_title_id_idx"),
+            # "rating" sort and minimum-rating filter
+            models.Index(fields=["rating_avg", "id"], name="catalog_book_rating_id_idx"),
+        ]
 
 
     def __str__(self):
@@ -47,24 +82,146 @@ class Book(models.Model):
         return reverse("catalog:book_detail", args=[self.pk])
 
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "cover" in field_names:
+            instance._loaded_cover = instance.cover.name or ""
+        return instance
+
+
+    @staticmethod
+    def adjust_copy_counters(book_id, total=0, available=0):
+        """Apply counter deltas in a single UPDATE (no read-modify-write)."""
+        if total or available:
+            Book.objects.filter(pk=book_id).update(
+                total_copies=F("total_copies") + total,
+                available_copies=F("available_copies") + available,
+            )
+
+
+    def rating_histogram(self):
+        """``[(stars, count, percent), ...]`` from 5 stars down."""
+        return [
+            (stars, n, round(100 * n / self.rating_count) if self.rating_count else 0)
+            for stars, n in ((s, getattr(self, f"stars_{s}")) for s in Review.STARS[::-1])
+        ]
+
+
+    @staticmethod
+    def adjust_ratings(book_id, removed=None, added=None):
+        """Move one review's rating out of and/or into the aggregates in a
+        single UPDATE (no read-modify-write)."""
+        if removed == added:
+            return
+        count = (added is not None) - (removed is not None)
+        total = (added or 0) - (removed or 0)
+        changes = {
+            "rating_count": F("rating_count") + count,
+            "rating_sum": F("rating_sum") + total,
+            # right-hand sides see the old row, hence the deltas here too
+            "rating_avg": Coalesce(
+                Cast(F("rating_sum") + total, FloatField()) / NullIf(F("rating_count") + count, 0), 0.0
+            ),
+        }
+        for stars, delta in ((removed, -1), (added, 1)):
+            if stars in Review.STARS:
+                changes[f"stars_{stars}"] = F(f"stars_{stars}") + delta
+        Book.objects.filter(pk=book_id).update(**changes)
+
+
+    @staticmethod
+    def recount_ratings(queryset=None):
+        """Annotate books with their true review aggregates (``true_sum``,
+        ``true_count`` and ``true_stars_1`` .. ``true_stars_5``)."""
+        reviews = Review.objects.filter(book=OuterRef("pk")).order_by().values("book")
+        annotations = {
+            "true_sum": Coalesce(Subquery(reviews.annotate(n=Sum("rating")).values("n")), 0),
+            "true_count": Coalesce(Subquery(reviews.annotate(n=Count("pk")).values("n")), 0),
+        }
+        for stars in Review.STARS:
+            annotations[f"true_stars_{stars}"] = Coalesce(
+                Subquery(reviews.filter(rating=stars).annotate(n=Count("pk")).values("n")), 0
+            )
+        return (queryset if queryset is not None else Book.objects.all()).annotate(**annotations)
+
+
+    @staticmethod
+    def recount_copies(queryset=None):
+        """Annotate books with their true copy counts (``true_total``/``true_available``)."""
+        copies = BookCopy.objects.filter(book=OuterRef("pk")).order_by().values("book")
+        total = copies.annotate(n=Count("pk")).values("n")
+        available = copies.filter(status=BookCopy.AVAILABLE).annotate(n=Count("pk")).values("n")
+        return (queryset if queryset is not None else Book.objects.all()).annotate(
+            true_total=Coalesce(Subquery(total), 0),
+            true_available=Coalesce(Subquery(available), 0),
+        )
+
+
 class BookCopy(models.Model):
     AVAILABLE = "available"
     BORROWED = "borrowed"
+    # returned and set aside for the next hold (see Hold)
+    RESERVED = "reserved"
     STATUS_CHOICES = [
     (AVAILABLE, "Available"),
     (BORROWED, "Borrowed"),
+    (RESERVED, "On hold"),
     ]
 
 
-    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="copies")
+    # indexed as the prefix of catalog_copy_book_status_idx
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="copies", db_index=False)
     barcode = models.CharField(max_length=50, unique=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=AVAILABLE)
 
 
+    class Meta:
+        indexes = [
+            # a book's free copies (counter recounts, borrowing)
+            models.Index(fields=["book", "status"], name="catalog_copy_book_status_idx"),
+        ]
+
+
     def __str__(self):
         return f"{self.book.title} — {self.barcode} ({self.status})"
 
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the counters currently reflect (skipped for .only()
+        # loads, where touching a deferred field would query again)
+        if "book_id" in field_names and "status" in field_names:
+            instance._counted = (instance.book_id, instance.status)
+        return instance
+
+    def _counted_state(self):
+        """The ``(book_id, status)`` the counters reflect, ``(None, None)`` for
+        a new copy; read back from the row after an ``.only()`` load."""
+        if not hasattr(self, "_counted"):
+            if self.pk is None:
+                return None, None
+            row = BookCopy.objects.select_for_update().filter(pk=self.pk).values_list("book_id", "status").first()
+            if row is None:
+                return None, None
+            self._counted = row
+        return self._counted
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            old_book, old_status = self._counted_state()
+            super().save(*args, **kwargs)
+            available = int(self.status == self.AVAILABLE)
+            if old_book == self.book_id:
+                Book.adjust_copy_counters(self.book_id, available=available - (old_status == self.AVAILABLE))
+            else:
+                if old_book is not None:
+                    Book.adjust_copy_counters(old_book, total=-1, available=-(old_status == self.AVAILABLE))
+                Book.adjust_copy_counters(self.book_id, total=1, available=available)
+        self._counted = (self.book_id, self.status)
+
+
 class Borrow(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     copy = models.ForeignKey(BookCopy, on_delete=models.PROTECT)
@@ -75,23 +232,210 @@ class Borrow(models.Model):
 
     class Meta:
         ordering = ["-borrowed_at"]
+        indexes = [
+            # profile: open loans and recent returns, newest first; each
+            # partial index holds only its half of the table
+            models.Index(
+                fields=["user", "-borrowed_at"], name="catalog_borrow_open_idx",
+                condition=models.Q(returned_at__isnull=True),
+            ),
+            models.Index(
+                fields=["user", "-borrowed_at"], name="catalog_borrow_closed_idx",
+                condition=models.Q(returned_at__isnull=False),
+            ),
+            # the archiver's oldest returns first (catalog.archive)
+            models.Index(
+                fields=["returned_at"], name="catalog_borrow_returned_idx",
+                condition=models.Q(returned_at__isnull=False),
+            ),
+            # the day's new loans for catalog.recommendations
+            models.Index(fields=["borrowed_at"], name="catalog_borrow_date_idx"),
+        ]
 
 
     def __str__(self):
         return f"{self.user} → {self.copy}"
 
 
+class ArchivedBorrow(models.Model):
+    """A returned ``Borrow`` moved out of the hot table by catalog.archive,
+    with its original id. (UZ: arxiv)"""
+    id = models.BigIntegerField(primary_key=True)
+    # (user, -borrowed_at) below leads with it
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    copy = models.ForeignKey(BookCopy, on_delete=models.PROTECT)
+    # copied as is, so no auto_now_add
+    borrowed_at = models.DateTimeField()
+    due_date = models.DateField()
+    returned_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+
+    class Meta:
+        ordering = ["-borrowed_at"]
+        indexes = [
+            # profile history with ?archive=1
+            models.Index(fields=["user", "-borrowed_at"], name="catalog_archive_user_idx"),
+        ]
+
+
+    def __str__(self):
+        return f"{self.user} → {self.copy}"
+
+
+class Hold(models.Model):
+    """A patron's place in a book's hold queue (UZ: navbat).
+
+    ``position`` is 1-based among the book's waiting holds and kept
+    contiguous by catalog.services, so the detail page reads a patron's
+    place without counting the queue. Higher ``priority`` goes first, then
+    first come first served. A returned copy goes to position 1 and waits
+    for pickup (READY) until ``expires_at``.
+    """
+    WAITING = "waiting"
+    READY = "ready"
+    FULFILLED = "fulfilled"
+    EXPIRED = "expired"
+    CANCELLED = "cancelled"
+    STATUS_CHOICES = [
+    (WAITING, "Waiting"),
+    (READY, "Ready for pickup"),
+    (FULFILLED, "Fulfilled"),
+    (EXPIRED, "Expired"),
+    (CANCELLED, "Cancelled"),
+    ]
+    ACTIVE = (WAITING, READY)
+
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # indexed as the prefix of catalog_hold_queue_idx
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="holds", db_index=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=WAITING)
+    priority = models.SmallIntegerField(default=0)
+    position = models.PositiveIntegerField(default=0)
+    copy = models.ForeignKey(BookCopy, on_delete=models.SET_NULL, blank=True, null=True, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(blank=True, null=True)
+
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [
+            # the next hold of a book when a copy comes back
+            models.Index(
+                fields=["book", "position"], name="catalog_hold_queue_idx",
+                condition=models.Q(status="waiting"),
+            ),
+            # unclaimed copies past their pickup window
+            models.Index(
+                fields=["expires_at"], name="catalog_hold_ready_idx",
+                condition=models.Q(status="ready"),
+            ),
+        ]
+        constraints = [
+            # one active hold per patron and book
+            models.UniqueConstraint(
+                fields=["book", "user"], name="catalog_hold_active_uniq",
+                condition=models.Q(status__in=("waiting", "ready")),
+            ),
+        ]
+
+
+    def __str__(self):
+        return f"{self.user} ⧗ {self.book} ({self.status})"
+
+
 class Review(models.Model):
-    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="reviews")
+    STARS = (1, 2, 3, 4, 5)
+
+
+    # indexed as the prefix of catalog_review_book_new_idx
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="reviews", db_index=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    rating = models.PositiveSmallIntegerField(default=5)
+    rating = models.PositiveSmallIntegerField(
+        default=5, validators=[MinValueValidator(1), MaxValueValidator(5)]
+    )
     text = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # a book's reviews, newest first (detail page)
+            # (the id breaks ties for the keyset "load more")
+            models.Index(fields=["book", "-created_at", "-id"], name="catalog_review_book_new_idx"),
+        ]
+
+
+    def __str__(self):
+        return f"{self.book} — {self.user} ({self.rating})"
+
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # what the book's rating aggregates currently include (see BookCopy)
+        if "book_id" in field_names and "rating" in field_names:
+            instance._counted = (instance.book_id, instance.rating)
+        return instance
+
+    def _counted_state(self):
+        """As ``BookCopy._counted_state``, with the rating."""
+        if not hasattr(self, "_counted"):
+            if self.pk is None:
+                return None, None
+            row = Review.objects.select_for_update().filter(pk=self.pk).values_list("book_id", "rating").first()
+            if row is None:
+                return None, None
+            self._counted = row
+        return self._counted
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            old_book, old_rating = self._counted_state()
+            super().save(*args, **kwargs)
+            if old_book == self.book_id:
+                Book.adjust_ratings(self.book_id, removed=old_rating, added=self.rating)
+            else:
+                if old_book is not None:
+                    Book.adjust_ratings(old_book, removed=old_rating)
+                Book.adjust_ratings(self.book_id, added=self.rating)
+        self._counted = (self.book_id, self.rating)
+
+
+class CatalogImport(models.Model):
+    """Progress of an `import_catalog` run, committed with each batch so a
+    crashed import resumes exactly where it stopped."""
+    source = models.CharField(max_length=500, unique=True)
+    rows_done = models.PositiveBigIntegerField(default=0)
+    books_created = models.PositiveBigIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+    def __str__(self):
+        return f"{self.source} ({self.rows_done} rows)"
+
+
+class BookNeighbor(models.Model):
+    """One "readers also borrowed" suggestion: ``neighbor`` was borrowed by
+    patrons who borrowed ``book``. Computed offline by catalog.recommendations,
+    at most ``TOP_K`` rows per book. (UZ: tavsiya)"""
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="neighbors", db_index=False)
+    neighbor = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="neighbor_of")
+    score = models.FloatField()
+    # patrons who borrowed both
+    together = models.PositiveIntegerField()
+
+
+    class Meta:
+        indexes = [
+            # the detail page: one range scan, best first
+            models.Index(fields=["book", "-score"], name="catalog_neighbor_book_idx"),
+        ]
 
 
     def __str__(self):
-        return f"{self.book} — {self.user} ({self.rating})"
\ No newline at end of file
+        return f"{self.book_id} → {self.neighbor_id} ({self.score:.2f})"
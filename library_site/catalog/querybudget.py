@@ -0,0 +1,183 @@
+"""Per-request query accounting and per-view query budgets.
+
+``QueryBudgetMiddleware`` counts every statement a request runs, its total
+database time and repeated statements (the N+1 signature), reports them in
+a ``Server-Timing`` header and, with ``QUERY_LOG`` on, one JSON log line.
+
+A view's budget comes from ``settings.QUERY_BUDGETS`` keyed by URL name
+(``"catalog:home"``, handy for views we do not own) or else from
+``@query_budget(n)`` on the view, function or class. Going over budget
+logs a warning, or raises ``QueryBudgetExceeded`` when
+``QUERY_BUDGET_STRICT`` is set, as the tests do.
+
+Statements are attributed through a context variable rather than a
+per-connection wrapper, so async views count too: their ORM calls and
+``catalog.async_views.gather_reads`` workers run on other threads (and
+connections) but inherit the request's context.
+(UZ: so‘rovlar soni chegarasi)
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+logger = logging.getLogger("catalog.queries")
+
+# "IN (%s, %s, %s)" differs only by batch size; count those as one statement
+IN_LIST = re.compile(r"\((?:%s, )+%s\)")
+SPACES = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    return IN_LIST.sub("(%s, ...)", SPACES.sub(" ", sql.strip()))
+
+
+class QueryStats:
+    """``execute_wrapper`` that tallies the statements it sees."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        """Statements run more than once, most repeated first."""
+        return [(sql, n) for sql, n in self.fingerprints.most_common() if n > 1]
+
+
+_current = ContextVar("catalog_query_stats", default=None)
+
+
+def _tally(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def install(connection, **kwargs):
+    # first, so execute_wrapper() blocks that are open keep popping their own
+    if _tally not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _tally)
+
+
+connection_created.connect(install)
+
+
+@contextmanager
+def record_queries():
+    """Count queries on every configured database inside the block, from
+    any thread that runs in (a copy of) the current context."""
+    stats = QueryStats()
+    for alias in connections:
+        install(connections[alias])
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def query_budget(limit):
+    """Declare the most queries a view may run per request."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def budget_for(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return None
+    budgets = getattr(settings, "QUERY_BUDGETS", {})
+    if match.view_name in budgets:
+        return budgets[match.view_name]
+    for owner in (match.func, getattr(match.func, "view_class", None)):
+        limit = getattr(owner, "query_budget", None)
+        if limit is not None:
+            return limit
+    return None
+
+
+def server_timing(stats, total):
+    repeated = sum(n - 1 for _, n in stats.duplicates)
+    return (
+        f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries, {repeated} repeated", '
+        f"total;dur={total * 1000:.2f}"
+    )
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with record_queries() as stats:
+            response = self.get_response(request)
+        return self.report(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with record_queries() as stats:
+            response = await self.get_response(request)
+        return self.report(request, response, stats, time.perf_counter() - started)
+
+    def report(self, request, response, stats, total):
+        response["Server-Timing"] = server_timing(stats, total)
+
+        limit = budget_for(request)
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else None
+        if getattr(settings, "QUERY_LOG", False):
+            logger.info(json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "view": view,
+                "status": response.status_code,
+                "queries": stats.count,
+                "db_ms": round(stats.duration * 1000, 2),
+                "total_ms": round(total * 1000, 2),
+                "budget": limit,
+                "repeated": [{"sql": sql[:300], "count": n} for sql, n in stats.duplicates[:5]],
+            }))
+        if limit is not None and stats.count > limit:
+            message = f"{view} ran {stats.count} queries (budget {limit}) for {request.path}"
+            if stats.duplicates:
+                sql, n = stats.duplicates[0]
+                message += f"; repeated {n}x: {sql[:300]}"
+            if getattr(settings, "QUERY_BUDGET_STRICT", False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
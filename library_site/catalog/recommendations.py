@@ -0,0 +1,115 @@
+""""Readers also borrowed" suggestions from the loan history.
+
+The co-borrow matrix and each book's best ``TOP_K`` neighbours come from
+``catalog.coborrow``; this module reads the patrons' baskets from the loan
+history and stores the lists in ``BookNeighbor``, where the detail page
+reads them with one range scan of its (book, -score) index.
+
+``manage.py build_recommendations`` rebuilds the table (weekly);
+``--days 1`` refreshes only what the day's loans changed. A new loan of
+book a only changes row and column a of C. The rows of the books borrowed
+that day are recomputed in full, and since the score is symmetric, their
+new scores replace the old ones in their neighbours' stored lists.
+
+The baskets cover the whole loan history: ``Borrow`` and the loans
+catalog.archive moved to ``ArchivedBorrow`` are read together, so
+archiving does not change the suggestions.
+(UZ: tavsiyalar)
+"""
+from collections import Counter
+from itertools import chain
+
+from django.db import transaction
+
+from . import coborrow
+from .models import ArchivedBorrow, BookNeighbor, Borrow
+from .routers import primary_reads
+
+
+# the loan history: the hot table and the archive, with the same columns
+HISTORY = (Borrow, ArchivedBorrow)
+
+
+def _baskets(**filters):
+    """Each patron's borrowed books, distinct, most recent first (the hot
+    table, then the archive)."""
+    rows = chain.from_iterable(
+        model.objects.filter(**filters).order_by("user_id", "-borrowed_at")
+        .values_list("user_id", "copy__book_id").iterator(chunk_size=5000)
+        for model in HISTORY
+    )
+    return coborrow.baskets(rows)
+
+
+def _pairs(**filters):
+    """Distinct (patron, book) pairs of both tables, in one query."""
+    hot, archived = (
+        model.objects.filter(**filters).order_by().values_list("user_id", "copy__book_id") for model in HISTORY
+    )
+    return hot.union(archived)
+
+
+def _reader_counts(book_ids):
+    """Distinct borrowers per book, from the database (partial runs)."""
+    counts = Counter()
+    for chunk in coborrow.chunks(book_ids):
+        counts.update(book_id for _, book_id in _pairs(copy__book_id__in=chunk))
+    return counts
+
+
+def compute(book_ids=None, k=coborrow.TOP_K):
+    """``{book: [(neighbour, score, together), ...]}``; with ``book_ids`` only
+    those rows, from the history of the patrons who borrowed them."""
+    if book_ids is None:
+        return coborrow.neighbors(_baskets(), k=k)
+    readers = set()
+    for chunk in coborrow.chunks(book_ids):
+        readers.update(user_id for user_id, _ in _pairs(copy__book_id__in=chunk))
+    baskets = []
+    for chunk in coborrow.chunks(readers):
+        baskets.extend(_baskets(user_id__in=chunk))
+    # the neighbours' other borrowers are not in these baskets: count
+    # them in the database, only for the pairs that get scored
+    return coborrow.neighbors(baskets, _reader_counts, book_ids, k)
+
+
+def _rows(neighbors):
+    return [
+        BookNeighbor(book_id=book_id, neighbor_id=other, score=score, together=together)
+        for book_id, row in neighbors.items()
+        for other, score, together in row
+    ]
+
+
+def rebuild(batch_size=5000):
+    """Recompute the whole table; returns the number of rows stored."""
+    rows = _rows(compute())
+    with transaction.atomic():
+        BookNeighbor.objects.all().delete()
+        BookNeighbor.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def _stored(book_ids):
+    with primary_reads():  # the lists about to be rewritten
+        return list(BookNeighbor.objects.filter(book_id__in=book_ids)
+                    .values_list("book_id", "neighbor_id", "score", "together"))
+
+
+def refresh(since, batch_size=5000):
+    """Recompute the books borrowed since ``since`` and merge their scores
+    into their neighbours' lists; returns ``(books updated, rows stored)``."""
+    borrowed = set(
+        Borrow.objects.filter(borrowed_at__gte=since).order_by().values_list("copy__book_id", flat=True).distinct()
+    )
+    if not borrowed:
+        return 0, 0
+    # whole rows: a neighbour that left a row's top K still needs its new score
+    neighbors = coborrow.merge(compute(borrowed, k=None), borrowed, _stored)
+
+    rows = _rows(neighbors)
+    with transaction.atomic():
+        for chunk in coborrow.chunks(neighbors):
+            BookNeighbor.objects.filter(book_id__in=chunk).delete()
+        BookNeighbor.objects.bulk_create(rows, batch_size=batch_size)
+    return len(neighbors), len(rows)
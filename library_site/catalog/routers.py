@@ -0,0 +1,118 @@
+"""Primary/replica database routing with read-your-writes.
+
+Reads go to a replica (``settings.DATABASE_REPLICAS``) only while
+``ReplicaRoutingMiddleware`` handles a safe request (GET/HEAD/OPTIONS);
+everything else uses ``default``, the primary. That includes writes,
+every statement inside a transaction, management commands and the shell.
+
+A replica lags the primary, so a patron who has just borrowed a copy or
+posted a review must not be shown the old state. As soon as a request
+writes anything, its remaining reads stay on the primary and the response
+sets a short-lived cookie: that browser's requests read from the primary
+for the next ``REPLICA_PIN_SECONDS``.
+
+``primary_reads()`` forces the primary for reads whose result is cached
+under a freshly bumped version (see ``catalog.caching``), which must not
+come from a replica that has not caught up yet. (UZ: replika)
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+PIN_COOKIE = "db_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# the current request's routing; None outside requests (primary only)
+_routing = ContextVar("catalog_db_routing", default=None)
+
+
+class _Routing:
+    def __init__(self, replica_reads):
+        self.replica_reads = replica_reads
+        self.wrote = False
+
+
+def replicas():
+    return getattr(settings, "DATABASE_REPLICAS", ())
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary inside this block."""
+    token = _routing.set(None)
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if (
+            routing is None or not routing.replica_reads or routing.wrote or not replicas()
+            # the primary's open transaction must see its own changes
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas())
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replicas()
+
+
+class ReplicaRoutingMiddleware:
+    """Scopes replica reads to one request and pins writers to the primary.
+    Goes above SessionMiddleware so a session save counts as a write."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        routing = self.start(request)
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.finish(routing, response)
+
+    async def __acall__(self, request):
+        routing = self.start(request)
+        token = _routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.finish(routing, response)
+
+    def start(self, request):
+        return _Routing(request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES)
+
+    def finish(self, routing, response):
+        if routing.wrote and replicas():
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite="Lax"
+            )
+        return response
@@ -0,0 +1,170 @@
+"""Circulation: borrowing and returning copies, and the hold queue.
+
+Each operation is one short transaction built from conditional UPDATEs, so
+two patrons racing for the same copy cannot both win: the second UPDATE
+matches zero rows and is reported as a conflict. No row is read first, which
+also keeps a checkout to three statements. (UZ: kitob berish / qaytarish)
+
+Queue changes start by updating the book's ``holds_waiting`` counter, so
+the book row serializes everything that renumbers its holds.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Subquery
+from django.utils import timezone
+
+from . import caching
+from .models import Book, BookCopy, Borrow, Hold
+
+
+LOAN_DAYS = 14
+PICKUP_DAYS = 3
+
+
+class CirculationError(Exception):
+    """The copy or loan was not in the state the operation needs."""
+
+
+class CopyUnavailable(CirculationError):
+    pass
+
+
+class LoanNotOpen(CirculationError):
+    pass
+
+
+class CopyOnShelf(CirculationError):
+    """A copy is free (or the book does not exist): borrow it, no hold needed."""
+
+
+class AlreadyOnHold(CirculationError):
+    pass
+
+
+class HoldNotActive(CirculationError):
+    pass
+
+
+def borrow_copy(user, copy_id, days=LOAN_DAYS):
+    """Lend copy ``copy_id`` to ``user``; raise CopyUnavailable if someone else
+    has it. A copy on the hold shelf goes only to the patron it is held for."""
+    with transaction.atomic():
+        taken = BookCopy.objects.filter(pk=copy_id, status=BookCopy.AVAILABLE).update(
+            status=BookCopy.BORROWED
+        )
+        if taken:
+            _adjust_available(copy_id, -1)
+        elif not (
+            Hold.objects.filter(user=user, copy_id=copy_id, status=Hold.READY).update(status=Hold.FULFILLED)
+            and BookCopy.objects.filter(pk=copy_id, status=BookCopy.RESERVED).update(status=BookCopy.BORROWED)
+        ):
+            raise CopyUnavailable(copy_id)
+        borrow = Borrow.objects.create(
+            user=user, copy_id=copy_id, due_date=timezone.localdate() + timedelta(days=days)
+        )
+        caching.touch_books_of(BookCopy.objects.filter(pk=copy_id).values_list("book_id", flat=True))
+    return borrow
+
+
+def return_copy(user, borrow_id):
+    """Close ``user``'s open loan ``borrow_id``; raise LoanNotOpen if it is not open."""
+    with transaction.atomic():
+        closed = Borrow.objects.filter(pk=borrow_id, user=user, returned_at__isnull=True).update(
+            returned_at=timezone.now()
+        )
+        if not closed:
+            raise LoanNotOpen(borrow_id)
+        copy_id = Subquery(Borrow.objects.filter(pk=borrow_id).values("copy_id"))
+        freed = BookCopy.objects.filter(pk=copy_id, status=BookCopy.BORROWED).update(
+            status=BookCopy.RESERVED
+        )
+        if freed:
+            _shelve(copy_id)
+
+
+def place_hold(user, book_id, priority=0):
+    """Queue ``user`` for ``book_id`` behind every hold of at least the same
+    priority. Raise CopyOnShelf while a copy is free, AlreadyOnHold if the
+    patron is queued or has a copy waiting already."""
+    try:
+        with transaction.atomic():
+            if not Book.objects.filter(pk=book_id, available_copies=0).update(
+                holds_waiting=F("holds_waiting") + 1
+            ):
+                raise CopyOnShelf(book_id)
+            queue = Hold.objects.filter(book_id=book_id, status=Hold.WAITING)
+            ahead = queue.filter(priority__gte=priority).count()
+            queue.filter(priority__lt=priority).update(position=F("position") + 1)
+            return Hold.objects.create(user=user, book_id=book_id, priority=priority, position=ahead + 1)
+    except IntegrityError:
+        raise AlreadyOnHold(book_id)
+
+
+def cancel_hold(user, hold_id):
+    """Withdraw ``user``'s hold and return it; a copy already set aside
+    passes to the next hold."""
+    with transaction.atomic():
+        book_id = Hold.objects.filter(pk=hold_id, user=user).values_list("book_id", flat=True).first()
+        Book.objects.filter(pk=book_id).update(holds_waiting=F("holds_waiting"))  # queue lock
+        hold = Hold.objects.filter(pk=hold_id, user=user, status__in=Hold.ACTIVE).first()
+        if hold is None:
+            raise HoldNotActive(hold_id)
+        Hold.objects.filter(pk=hold.pk).update(status=Hold.CANCELLED, position=0)
+        if hold.status == Hold.WAITING:
+            leave_queue(hold.book_id, hold.position)
+        else:
+            _shelve(hold.copy_id)
+    return hold
+
+
+def leave_queue(book_id, position):
+    """Close the gap a waiting hold at ``position`` leaves behind."""
+    Book.objects.filter(pk=book_id).update(holds_waiting=F("holds_waiting") - 1)
+    Hold.objects.filter(book_id=book_id, status=Hold.WAITING, position__gt=position).update(
+        position=F("position") - 1
+    )
+
+
+def expire_holds(now=None):
+    """Expire holds whose copy was not picked up in time and pass each copy
+    on; return how many expired. Each hold is its own short transaction."""
+    now = now or timezone.now()
+    # read up front: holds made READY below wait for the next run
+    stale = list(Hold.objects.filter(status=Hold.READY, expires_at__lt=now).values_list("pk", "copy_id"))
+    expired = 0
+    for hold_id, copy_id in stale:
+        with transaction.atomic():
+            if Hold.objects.filter(pk=hold_id, status=Hold.READY).update(status=Hold.EXPIRED):
+                _shelve(copy_id)
+                expired += 1
+    return expired
+
+
+def estimated_ready(book, position):
+    """Rough date queue ``position`` gets a copy: every copy serves one hold
+    per loan period. Needs no query."""
+    rounds = -(-position // max(book.total_copies, 1))
+    return timezone.localdate() + timedelta(days=rounds * LOAN_DAYS)
+
+
+def _shelve(copy_id):
+    """Hand a set-aside (RESERVED) copy to the book's next hold, or put it
+    back into circulation if nobody is waiting."""
+    book_id = Subquery(BookCopy.objects.filter(pk=copy_id).values("book_id"))
+    if Book.objects.filter(pk=book_id, holds_waiting__gt=0).update(holds_waiting=F("holds_waiting") - 1):
+        Hold.objects.filter(book_id=book_id, status=Hold.WAITING, position=1).update(
+            status=Hold.READY, position=0, copy_id=copy_id,
+            expires_at=timezone.now() + timedelta(days=PICKUP_DAYS),
+        )
+        Hold.objects.filter(book_id=book_id, status=Hold.WAITING).update(position=F("position") - 1)
+    else:
+        BookCopy.objects.filter(pk=copy_id).update(status=BookCopy.AVAILABLE)
+        _adjust_available(copy_id, 1)
+    caching.touch_books_of(BookCopy.objects.filter(pk=copy_id).values_list("book_id", flat=True))
+
+
+def _adjust_available(copy_id, delta):
+    # Same bookkeeping BookCopy.save() does, without loading the copy
+    book_id = Subquery(BookCopy.objects.filter(pk=copy_id).values("book_id"))
+    Book.objects.filter(pk=book_id).update(available_copies=F("available_copies") + delta)
@@ -0,0 +1,128 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import autocomplete, caching, search, services, thumbnails
+from .models import Author, Book, BookCopy, Hold, Review
+
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.reindex_books([instance.pk])
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, **kwargs):
+    search.unindex_books([instance.pk])
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def refresh_autocomplete(sender, instance, raw=False, **kwargs):
+    if not raw:
+        autocomplete.touch_books([instance.pk])
+
+
+@receiver(post_save, sender=Author)
+def reindex_author_books(sender, instance, created=False, raw=False, **kwargs):
+    # Author name is part of every one of their books' search documents
+    # and cards
+    if not created and not raw:
+        book_ids = list(Book.objects.filter(author=instance).values_list("pk", flat=True))
+        search.reindex_books(book_ids)
+        caching.touch_books(book_ids)
+        autocomplete.touch_books(book_ids)
+
+
+# Cached fragments (catalog.caching) -------------------------------------
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def touch_book(sender, instance, signal, created=False, **kwargs):
+    # new or deleted books change which books the home page lists
+    caching.touch_books([instance.pk], listing=created or signal is post_delete)
+
+
+@receiver(post_save, sender=BookCopy)
+@receiver(post_delete, sender=BookCopy)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def touch_reviewed_or_stocked_book(sender, instance, **kwargs):
+    # _counted still holds the pre-save book when a row moves between books
+    old_book = getattr(instance, "_counted", (instance.book_id,))[0]
+    caching.touch_books({instance.book_id, old_book})
+
+
+@receiver(m2m_changed, sender=Book.categories.through)
+def touch_recategorized_books(sender, instance, action, reverse, pk_set, **kwargs):
+    # the API detail lists the categories (and its ETag follows the version)
+    if not reverse and action in ("post_add", "post_remove", "post_clear"):
+        caching.touch_books([instance.pk])
+    elif reverse and action in ("post_add", "post_remove"):
+        caching.touch_books(pk_set)
+    elif reverse and action == "pre_clear":
+        # after the clear nothing says which books were in the category
+        caching.touch_books(list(instance.book_set.values_list("pk", flat=True)))
+
+
+@receiver(post_delete, sender=Review)
+def drop_review_rating(sender, instance, **kwargs):
+    # a signal rather than Review.delete() so cascades (a deleted user) are
+    # counted too; it runs inside the deletion's transaction
+    book_id, rating = getattr(instance, "_counted", (instance.book_id, instance.rating))
+    Book.adjust_ratings(book_id, removed=rating)
+
+
+@receiver(post_delete, sender=BookCopy)
+def drop_copy_counters(sender, instance, **kwargs):
+    # like drop_review_rating: queryset deletes and cascades skip
+    # BookCopy.delete(), the signal sees every deleted copy
+    book_id, status = getattr(instance, "_counted", (instance.book_id, instance.status))
+    Book.adjust_copy_counters(book_id, total=-1, available=-(status == BookCopy.AVAILABLE))
+
+
+@receiver(post_delete, sender=Hold)
+def close_queue_gap(sender, instance, **kwargs):
+    # holds deleted with their patron must not leave a hole in the queue,
+    # nor a copy set aside for nobody: once the deletion is committed it
+    # goes to the next hold or back on the shelf
+    if instance.status == Hold.WAITING:
+        services.leave_queue(instance.book_id, instance.position)
+    elif instance.status == Hold.READY:
+        transaction.on_commit(lambda: shelve_copy(instance.copy_id))
+
+
+def shelve_copy(copy_id):
+    with transaction.atomic():
+        services._shelve(copy_id)
+
+
+@receiver(post_save, sender=Book)
+def refresh_cover_thumbnails(sender, instance, raw=False, **kwargs):
+    name = instance.cover.name if instance.cover else ""
+    unchanged = name == getattr(instance, "_loaded_cover", None)
+    if raw or (unchanged and (instance.cover_hash or not name)):
+        return
+    instance._loaded_cover = name
+    if not name:
+        Book.objects.filter(pk=instance.pk).update(cover_hash="")
+        return
+    # render once the upload is committed; the hash lands via update() so
+    # this handler is not re-entered (UZ: rasm yuklangandan keyin)
+    transaction.on_commit(lambda: render_cover(instance.pk, name))
+
+
+def render_cover(book_id, name):
+    try:
+        digest = thumbnails.render_derivatives(name)
+    except OSError:
+        logger.exception("Could not render thumbnails for %s", name)
+        return
+    if Book.objects.filter(pk=book_id, cover=name).update(cover_hash=digest):
+        caching.touch_books([book_id])
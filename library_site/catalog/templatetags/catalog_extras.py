@@ -1,8 +1,41 @@
 from django import template
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from catalog import caching, thumbnails
 
 
 register = template.Library()
 
 @register.filter
 def available_count(book):
-    return book.copies.filter(status="available").count()
\ No newline at end of file
+    # Denormalized counter, no query (UZ: so‘rovsiz)
+    return book.available_copies
+
+
+@register.simple_tag
+def cover_img(book, css_class="", sizes="(max-width: 576px) 100vw, 320px"):
+    """<picture> with WebP/JPEG srcsets of the cover's thumbnails.
+
+    Falls back to the original upload until its thumbnails are rendered.
+    """
+    if not book.cover:
+        return ""
+    if not book.cover_hash:
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" loading="lazy" />', book.cover.url, css_class, book.title
+        )
+    name, digest = book.cover.name, book.cover_hash
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}" />'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="lazy" /></picture>',
+        thumbnails.srcset(name, digest, "webp"), sizes,
+        thumbnails.derivative_url(name, digest, thumbnails.WIDTHS[1], "jpg"),
+        thumbnails.srcset(name, digest, "jpg"), sizes, css_class, book.title,
+    )
+
+
+@register.simple_tag
+def book_cards(books):
+    """Cards for ``books``, reusing cached fragments (see catalog.caching)."""
+    return [mark_safe(html) for html in caching.render_cards(books)]
@@ -1,3 +1,1209 @@
-from django.test import TestCase
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from io import BytesIO, StringIO
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from . import (
+    archive, async_views, autocomplete, caching, coborrow, importers, pagination, recommendations, routers, search,
+    services, thumbnails, views,
+)
+from . import urls as catalog_urls
+from .models import (
+    ArchivedBorrow, Author, Book, BookCopy, BookNeighbor, Borrow, CatalogImport, Category, Hold, Review,
+)
+from .querybudget import QueryBudgetExceeded
+
+
+# throughput of the contention tests (not shown unless logging is set up for it)
+logger = logging.getLogger(__name__)
+
+# ROOT_URLCONF for AsyncViewTests: the site with the async read pages
+urlpatterns = [
+    path("", include((catalog_urls.build(async_views), "catalog"))),
+    path("accounts/", include("django.contrib.auth.urls")),
+]
+
+
+def rounded(neighbors):
+    # float32 (SciPy) and float (Python) scores differ in the last digits
+    return {book: [(other, round(score, 6), together) for other, score, together in row]
+            for book, row in neighbors.items()}
+
+
+def neighbors_python(baskets, reader_counts, book_ids, k=coborrow.TOP_K):
+    """coborrow.neighbors_sparse in plain Python, to check it against."""
+    rows = {}
+    for basket in baskets:
+        if len(basket) < 2:
+            continue
+        for book_id in basket if book_ids is None else (b for b in basket if b in book_ids):
+            rows.setdefault(book_id, Counter()).update(basket)
+    needed = set(rows)
+    for row in rows.values():
+        needed.update(other for other, together in row.items() if together >= coborrow.MIN_TOGETHER)
+    n = reader_counts(needed)
+    result = {}
+    for book_id, row in rows.items():
+        scored = sorted(
+            (-together / math.sqrt(n[book_id] * n[other]), other, together)
+            for other, together in row.items()
+            if together >= coborrow.MIN_TOGETHER and other != book_id
+        )
+        if scored:
+            result[book_id] = [(other, -score, together) for score, other, together in scored[:k]]
+    return result
+
+
+def make_book(copies=1, title="1984"):
+    author = Author.objects.create(first_name="George", last_name="Orwell")
+    book = Book.objects.create(title=title, author=author)
+    for i in range(copies):
+        BookCopy.objects.create(book=book, barcode=f"{title}-{i}")
+    return book
+
+
+class CirculationServiceTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("reader")
+        self.book = make_book(copies=1)
+        self.copy = self.book.copies.get()
+
+    def test_borrow_and_return_keep_counters(self):
+        borrow = services.borrow_copy(self.user, self.copy.pk)
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.total_copies, self.book.available_copies), (1, 0))
+
+        services.return_copy(self.user, borrow.pk)
+        self.book.refresh_from_db()
+        self.copy.refresh_from_db()
+        self.assertEqual(self.copy.status, BookCopy.AVAILABLE)
+        self.assertEqual((self.book.total_copies, self.book.available_copies), (1, 1))
+
+    def test_partial_load_save_keeps_counters(self):
+        # an .only() load does not carry book/status: save() reads them back
+        copy = BookCopy.objects.only("barcode").get(pk=self.copy.pk)
+        copy.barcode = "1984-relabelled"
+        copy.save()
+        copy = BookCopy.objects.only("status").get(pk=self.copy.pk)
+        copy.status = BookCopy.BORROWED
+        copy.save()
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.total_copies, self.book.available_copies), (1, 0))
+
+    def test_queryset_delete_keeps_counters(self):
+        BookCopy.objects.create(book=self.book, barcode="1984-x", status=BookCopy.BORROWED)
+        BookCopy.objects.create(book=self.book, barcode="1984-y")
+        BookCopy.objects.filter(barcode__in=["1984-0", "1984-x"]).delete()
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.total_copies, self.book.available_copies), (1, 1))
+        self.book.copies.get().delete()
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.total_copies, self.book.available_copies), (0, 0))
+
+    def test_second_borrow_conflicts(self):
+        services.borrow_copy(self.user, self.copy.pk)
+        with self.assertRaises(services.CopyUnavailable):
+            services.borrow_copy(self.user, self.copy.pk)
+        self.assertEqual(Borrow.objects.count(), 1)
+
+    def test_double_return_is_rejected(self):
+        borrow = services.borrow_copy(self.user, self.copy.pk)
+        services.return_copy(self.user, borrow.pk)
+        with self.assertRaises(services.LoanNotOpen):
+            services.return_copy(self.user, borrow.pk)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 1)
+
+    def test_borrow_is_three_statements(self):
+        with CaptureQueriesContext(connection) as ctx:
+            services.borrow_copy(self.user, self.copy.pk)
+        statements = [q["sql"] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        self.assertEqual(len(statements), 3, statements)
+
+
+class HoldQueueTests(TestCase):
+    """Returned copies go to the head of the hold queue (UZ: navbat)."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.lender, self.a, self.b, self.c = (User.objects.create_user(n) for n in "lender a b c".split())
+        self.book = make_book(copies=1)
+        self.copy = self.book.copies.get()
+        self.loan = services.borrow_copy(self.lender, self.copy.pk)
+
+    def positions(self):
+        waiting = Hold.objects.filter(book=self.book, status=Hold.WAITING).order_by("position")
+        return [(h.user.username, h.position) for h in waiting]
+
+    def test_queue_order_and_renumbering(self):
+        services.place_hold(self.a, self.book.pk)
+        services.place_hold(self.b, self.book.pk)
+        services.place_hold(self.c, self.book.pk, priority=1)
+        self.assertEqual(self.positions(), [("c", 1), ("a", 2), ("b", 3)])
+        with self.assertRaises(services.AlreadyOnHold):
+            services.place_hold(self.a, self.book.pk)
+
+        services.cancel_hold(self.c, Hold.objects.get(user=self.c).pk)
+        self.assertEqual(self.positions(), [("a", 1), ("b", 2)])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.holds_waiting, 2)
+
+    def test_return_goes_to_next_hold_only(self):
+        hold = services.place_hold(self.a, self.book.pk)
+        services.place_hold(self.b, self.book.pk)
+        services.return_copy(self.lender, self.loan.pk)
+
+        hold.refresh_from_db()
+        self.copy.refresh_from_db()
+        self.book.refresh_from_db()
+        self.assertEqual((hold.status, hold.copy_id), (Hold.READY, self.copy.pk))
+        self.assertEqual(self.copy.status, BookCopy.RESERVED)
+        self.assertEqual((self.book.available_copies, self.book.holds_waiting), (0, 1))
+        self.assertEqual(self.positions(), [("b", 1)])
+
+        with self.assertRaises(services.CopyUnavailable):
+            services.borrow_copy(self.b, self.copy.pk)
+        services.borrow_copy(self.a, self.copy.pk)
+        hold.refresh_from_db()
+        self.assertEqual(hold.status, Hold.FULFILLED)
+
+    def test_unclaimed_copy_passes_on_then_returns_to_shelf(self):
+        services.place_hold(self.a, self.book.pk)
+        services.place_hold(self.b, self.book.pk)
+        services.return_copy(self.lender, self.loan.pk)
+
+        later = timezone.now() + timedelta(days=services.PICKUP_DAYS + 1)
+        self.assertEqual(services.expire_holds(later), 1)
+        self.assertEqual(Hold.objects.get(user=self.b).status, Hold.READY)
+        self.assertEqual(services.expire_holds(later + timedelta(days=services.PICKUP_DAYS + 1)), 1)
+        self.copy.refresh_from_db()
+        self.book.refresh_from_db()
+        self.assertEqual(self.copy.status, BookCopy.AVAILABLE)
+        self.assertEqual((self.book.available_copies, self.book.holds_waiting), (1, 0))
+        with self.assertRaises(services.CopyOnShelf):
+            services.place_hold(self.c, self.book.pk)
+
+    def test_deleted_patron_leaves_no_gap(self):
+        services.place_hold(self.a, self.book.pk)
+        services.place_hold(self.b, self.book.pk)
+        self.a.delete()
+        self.assertEqual(self.positions(), [("b", 1)])
+
+    def test_deleted_patron_frees_ready_copy(self):
+        services.place_hold(self.a, self.book.pk)
+        services.place_hold(self.b, self.book.pk)
+        services.return_copy(self.lender, self.loan.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.a.delete()
+        self.assertEqual(Hold.objects.get(user=self.b).status, Hold.READY)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.b.delete()
+        self.copy.refresh_from_db()
+        self.book.refresh_from_db()
+        self.assertEqual(self.copy.status, BookCopy.AVAILABLE)
+        self.assertEqual((self.book.available_copies, self.book.holds_waiting), (1, 0))
+
+    def test_return_with_holds_is_bounded(self):
+        for n in range(20):
+            services.place_hold(get_user_model().objects.create_user(f"p{n}"), self.book.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            services.return_copy(self.lender, self.loan.pk)
+        statements = [q["sql"] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        self.assertEqual(len(statements), 5, statements)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_detail_page_shows_place_in_queue(self):
+        services.place_hold(self.a, self.book.pk)
+        self.client.force_login(self.b)
+        url = reverse("catalog:book_detail", args=[self.book.pk])
+        self.assertContains(self.client.get(url), "1 waiting")
+        self.client.post(reverse("catalog:place_hold", args=[self.book.pk]))
+        self.assertContains(self.client.get(url), "You are #2 of 2 in the queue")
+        hold = Hold.objects.get(user=self.b)
+        self.client.post(reverse("catalog:cancel_hold", args=[hold.pk]))
+        self.assertContains(self.client.get(url), "Place hold")
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("critic")
+        self.book = make_book(copies=0)
+
+    def assertRatings(self, book, total, count, histogram):
+        book.refresh_from_db()
+        self.assertEqual((book.rating_sum, book.rating_count), (total, count))
+        self.assertEqual([book.stars_1, book.stars_2, book.stars_3, book.stars_4, book.stars_5], histogram)
+        self.assertAlmostEqual(book.rating_avg, total / count if count else 0)
+
+    def test_create_update_delete(self):
+        first = Review.objects.create(book=self.book, user=self.user, rating=5)
+        Review.objects.create(book=self.book, user=self.user, rating=2)
+        self.assertRatings(self.book, 7, 2, [0, 1, 0, 0, 1])
+
+        first = Review.objects.get(pk=first.pk)
+        first.rating = 4
+        first.save()
+        self.assertRatings(self.book, 6, 2, [0, 1, 0, 1, 0])
+
+        first.delete()
+        self.assertRatings(self.book, 2, 1, [0, 1, 0, 0, 0])
+
+    def test_partial_load_save(self):
+        review = Review.objects.create(book=self.book, user=self.user, rating=5)
+        review = Review.objects.only("text").get(pk=review.pk)
+        review.text = "Still great"
+        review.save()
+        review = Review.objects.only("rating").get(pk=review.pk)
+        review.rating = 3
+        review.save()
+        self.assertRatings(self.book, 3, 1, [0, 0, 1, 0, 0])
+
+    def test_moving_a_review_and_cascades(self):
+        other = make_book(copies=0, title="Animal Farm")
+        review = Review.objects.create(book=self.book, user=self.user, rating=3)
+        review.book = other
+        review.save()
+        self.assertRatings(self.book, 0, 0, [0, 0, 0, 0, 0])
+        self.assertRatings(other, 3, 1, [0, 0, 1, 0, 0])
+
+        self.user.delete()
+        self.assertRatings(other, 0, 0, [0, 0, 0, 0, 0])
+
+    def test_reconcile_fixes_drift(self):
+        Review.objects.bulk_create([Review(book=self.book, user=self.user, rating=r) for r in (5, 4, 4)])
+        self.assertRatings(self.book, 0, 0, [0, 0, 0, 0, 0])
+        call_command("reconcile_ratings", stdout=StringIO())
+        self.assertRatings(self.book, 13, 3, [0, 0, 0, 2, 1])
+
+
+def marc_record(fields):
+    """A minimal ISO 2709 record from ``{tag: [(code, value), ...]}``."""
+    directory, data = b"", b""
+    for tag, subfields in fields.items():
+        field = b"  " + b"".join(b"\x1f" + code.encode() + value.encode() for code, value in subfields) + b"\x1e"
+        directory += f"{tag}{len(field):04d}{len(data):05d}".encode()
+        data += field
+    base = 24 + len(directory) + 1
+    leader = f"{base + len(data) + 1:05d}nam a22{base:05d} a 4500".encode()
+    return leader + directory + b"\x1e" + data + b"\x1d"
+
+
+class ImportCatalogTests(TestCase):
+    """catalog.importers and import_catalog: parsers, dedupe, resume (UZ: import)."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, "wb") as fh:
+            fh.write(content if isinstance(content, bytes) else content.encode())
+        return path
+
+    def run_import(self, path, *args):
+        out = StringIO()
+        call_command("import_catalog", path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_parsers_yield_the_same_rows(self):
+        row = {
+            "title": "O‘tkan kunlar", "author": ("Abdulla", "Qodiriy"), "isbn": "9789943000011",
+            "description": "Roman", "year": 1926, "categories": ["Roman", "Klassika"],
+        }
+        csv_text = (
+            "title,author,isbn,description,year,categories\n"
+            "O‘tkan kunlar,\"Qodiriy, Abdulla\",978-9943-00001-1,Roman,c1926,Roman; Klassika\n"
+        )
+        jsonl_text = (
+            '{"title": "O‘tkan kunlar", "author_first_name": "Abdulla", "author_last_name": "Qodiriy", '
+            '"isbn": "9789943000011", "description": "Roman", "year": 1926, "categories": ["Roman", "Klassika"]}\n\n'
+        )
+        marc = marc_record({
+            "020": [("a", "9789943000011 (hbk.)")],
+            "100": [("a", "Qodiriy, Abdulla.")],
+            "245": [("a", "O‘tkan kunlar /")],
+            "264": [("c", "1926.")],
+            "520": [("a", "Roman")],
+            "650": [("a", "Roman.")],
+        }) + marc_record({"245": [("a", "")], "650": [("a", "Klassika")]})
+        with open(self.write("a.csv", csv_text), encoding="utf-8", newline="") as fh:
+            self.assertEqual(list(importers.read_csv(fh)), [row])
+        with open(self.write("a.jsonl", jsonl_text), encoding="utf-8") as fh:
+            self.assertEqual(list(importers.read_jsonl(fh)), [row])
+        path = self.write("a.mrc", marc)
+        with open(path, "rb") as fh:
+            records = list(importers.read_marc(fh))
+        self.assertEqual(records[0], {**row, "categories": ["Roman"]})
+        self.assertEqual(records[1]["categories"], ["Klassika"])
+        with open(path, "rb") as fh:
+            # small reads split records across chunks
+            self.assertEqual(len(list(importers._marc_records(fh, chunk_size=7))), 2)
+
+    def test_isbn_normalization(self):
+        self.assertEqual(importers.normalize_isbn("0-306-40615-x"), "030640615X")
+        self.assertEqual(importers.normalize_isbn("12345"), "")
+        self.assertEqual(importers.split_author("George Orwell"), ("George", "Orwell"))
+
+    def test_dedupe_and_restart(self):
+        path = self.write("books.csv", (
+            "title,author,isbn,year\n"
+            "1984,George Orwell,9780451524935,1949\n"
+            "1984,George Orwell,978-0-451-52493-5,1949\n"
+            "Animal Farm,George Orwell,,1945\n"
+            "Animal Farm,George Orwell,,1945\n"
+            "Animal Farm,George Orwell,,1954\n"
+            "No author,,,\n"
+        ))
+        self.assertIn("3 books created", self.run_import(path))
+        self.assertIn("already imported", self.run_import(path))
+        self.run_import(path, "--restart", "--batch-size", "2")
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertEqual(Author.objects.count(), 1)
+
+    def test_resumes_after_last_committed_batch(self):
+        path = self.write("books.jsonl", "".join(
+            f'{{"title": "Book {n}", "author": "Ann Author", "isbn": "97800000000{n:02d}"}}\n' for n in range(5)
+        ))
+        CatalogImport.objects.create(source=os.path.abspath(path), rows_done=3, books_created=3)
+        self.assertIn("Resuming after row 3", self.run_import(path, "--batch-size", "1"))
+        self.assertEqual(sorted(Book.objects.values_list("title", flat=True)), ["Book 3", "Book 4"])
+        state = CatalogImport.objects.get()
+        self.assertEqual((state.rows_done, state.books_created, state.finished), (5, 5, True))
+
+
+def png(width, height):
+    buf = BytesIO()
+    Image.new("RGB", (width, height), "teal").save(buf, "PNG")
+    return buf.getvalue()
+
+
+class CoverThumbnailTests(TestCase):
+    """Uploaded covers get hashed WebP/JPEG renditions (UZ: muqova nusxalari)."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        self.book = make_book()
+
+    def upload(self, data, name="cover.png"):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.cover = SimpleUploadedFile(name, data)
+            self.book.save()
+        self.book.refresh_from_db()
+
+    def test_upload_renders_every_derivative(self):
+        data = png(400, 600)
+        self.upload(data)
+        self.assertEqual(self.book.cover_hash, thumbnails.content_hash(data))
+        for width in thumbnails.WIDTHS:
+            for ext, _ in thumbnails.FORMATS:
+                name = thumbnails.derivative_name(self.book.cover.name, self.book.cover_hash, width, ext)
+                with default_storage.open(name) as fh, Image.open(fh) as image:
+                    # never upscaled: the 640w rendition keeps the original size
+                    self.assertEqual(image.width, min(width, 400))
+        self.assertIn(" 320w, ", thumbnails.srcset(self.book.cover.name, self.book.cover_hash, "webp"))
+
+    def test_new_cover_gets_a_new_hash_and_clearing_drops_it(self):
+        self.upload(png(200, 300))
+        first = self.book.cover_hash
+        before = caching.versions([self.book.pk])[self.book.pk]
+        self.upload(png(300, 200), "other.png")
+        self.assertNotIn(self.book.cover_hash, ("", first))
+        self.assertGreater(caching.versions([self.book.pk])[self.book.pk], before)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.cover = None
+            self.book.save()
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.cover_hash, "")
+
+    def test_unreadable_cover_is_logged_and_left_unhashed(self):
+        with self.assertLogs("catalog.signals", "ERROR") as logs:
+            self.upload(b"not an image")
+        self.assertIn("Could not render thumbnails", logs.output[0])
+        self.assertEqual(self.book.cover_hash, "")
+
+    def test_backfill_command_hashes_and_touches_books(self):
+        default_storage.save("covers/old.png", BytesIO(png(200, 300)))
+        Book.objects.filter(pk=self.book.pk).update(cover="covers/old.png")  # no signals
+        before = caching.versions([self.book.pk])[self.book.pk]
+
+        def render_many(names, workers=None, force=False):
+            return map(thumbnails._render_safely, [(name, force) for name in names])
+
+        out = StringIO()
+        # rendered in this process: no pool, and the test's connection stays open
+        command = "catalog.management.commands.generate_cover_thumbnails"
+        with patch.object(thumbnails, "render_many", render_many), patch(f"{command}.close_old_connections"), \
+                self.captureOnCommitCallbacks(execute=True):
+            call_command("generate_cover_thumbnails", stdout=out)
+        self.assertIn("Rendered 1 cover(s), 0 failed", out.getvalue())
+        self.book.refresh_from_db()
+        self.assertEqual(len(self.book.cover_hash), 12)
+        self.assertGreater(caching.versions([self.book.pk])[self.book.pk], before)
+
+
+class FragmentCacheTests(TestCase):
+    """Cards and the anonymous home page come from the cache until something
+    they show changes (UZ: kesh)."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("reader")
+        self.book = make_book(copies=2)
+
+    def home(self):
+        return self.client.get(reverse("catalog:home")).content.decode()
+
+    def test_repeat_home_hit_runs_no_queries(self):
+        self.home()
+        with self.assertNumQueries(0):
+            self.home()
+
+    def test_changes_reach_cached_pages(self):
+        self.assertIn("Available: 2 / 2", self.home())
+        # writes that skip signals are not seen...
+        Book.objects.filter(pk=self.book.pk).update(title="Nineteen Eighty-Four")
+        self.assertIn("1984", self.home())
+
+        # ...everything else is, once committed
+        with self.captureOnCommitCallbacks(execute=True):
+            services.borrow_copy(self.user, self.book.copies.first().pk)
+        self.assertIn("Available: 1 / 2", self.home())
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(book=self.book, user=self.user, rating=5)
+        self.assertIn("★ 5.0", self.home())
+        with self.captureOnCommitCallbacks(execute=True):
+            make_book(title="Animal Farm")
+        self.assertIn("Animal Farm", self.home())
+
+    def test_category_changes_bump_the_version(self):
+        fiction = Category.objects.create(name="Fiction")
+        for change in (
+            lambda: self.book.categories.add(fiction),
+            lambda: self.book.categories.clear(),
+            lambda: fiction.book_set.add(self.book),
+            lambda: fiction.book_set.clear(),
+        ):
+            before = caching.versions([self.book.pk])
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            self.assertNotEqual(caching.versions([self.book.pk]), before)
+
+    def test_stale_entry_served_while_recomputing(self):
+        caching.get_or_compute("key", lambda: "old", timeout=-1)
+        cache.add("key:lock", 1)  # another worker is recomputing
+        self.assertEqual(caching.get_or_compute("key", lambda: "new"), "old")
+        cache.delete("key:lock")
+        self.assertEqual(caching.get_or_compute("key", lambda: "new"), "new")
+
+
+class SearchTests(TestCase):
+    """Ranked full-text search and the list filters around it (UZ: qidiruv)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        orwell = Author.objects.create(first_name="George", last_name="Orwell")
+        huxley = Author.objects.create(first_name="Aldous", last_name="Huxley")
+        cls.dystopia = Category.objects.create(name="Dystopia")
+        cls.farm = Book.objects.create(title="Animal Farm", author=orwell, rating_avg=4.5)
+        cls.nineteen = Book.objects.create(
+            title="Nineteen Eighty-Four", author=orwell, description="Big Brother and the farm of Oceania",
+        )
+        cls.brave = Book.objects.create(title="Brave New World", author=huxley, description="A world state")
+        cls.farm.categories.add(cls.dystopia)
+        cls.nineteen.categories.add(cls.dystopia)
+
+    def found(self, q, qs=None):
+        return [b.title for b in search.search_books(qs or Book.objects.all(), q)]
+
+    def test_title_outranks_description(self):
+        self.assertEqual(self.found("farm"), ["Animal Farm", "Nineteen Eighty-Four"])
+        self.assertEqual(self.found("world"), ["Brave New World"])
+
+    def test_every_word_must_match_and_the_last_is_a_prefix(self):
+        self.assertEqual(self.found("orwell anim"), ["Animal Farm"])
+        self.assertCountEqual(self.found("geo"), ["Animal Farm", "Nineteen Eighty-Four"])
+        self.assertEqual(self.found("huxley farm"), [])
+        self.assertEqual(self.found("!!"), [])
+
+    def test_short_prefixes_match_whole_words_only(self):
+        self.assertEqual(self.found("an"), [])
+        self.assertEqual(self.found("a"), ["Brave New World"])  # "A world state"
+
+    def test_index_follows_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.brave.title = "Island"
+            self.brave.save()
+            self.farm.delete()
+        self.assertEqual(self.found("island"), ["Island"])
+        self.assertEqual(self.found("brave"), [])
+        self.assertEqual(self.found("animal"), [])
+
+    def test_list_filters_narrow_the_ranking(self):
+        url = reverse("catalog:book_list")
+        response = self.client.get(url, {"q": "farm", "rating": "4"})
+        self.assertEqual([b.title for b in response.context["books"]], ["Animal Farm"])
+        response = self.client.get(url, {"q": "george", "category": "dystopia"})
+        self.assertCountEqual([b.title for b in response.context["books"]], ["Animal Farm", "Nineteen Eighty-Four"])
+        response = self.client.get(url, {"q": "world", "category": "Dystopia"})
+        self.assertEqual(list(response.context["books"]), [])
+
+
+class KeysetPaginationTests(TestCase):
+    """Browsing with cursors: every book once per sort, ties included (UZ: kursor)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name="George", last_name="Orwell")
+        # repeated titles and ratings: only the pk tells those books apart
+        cls.books = [
+            Book.objects.create(title=f"Book {n % 3}", author=author, rating_avg=n % 2 * 4.0) for n in range(7)
+        ]
+
+    def page(self, sort, after=None):
+        ordering = views.BookListView.sort_orderings[sort]
+        return pagination.keyset_paginate(Book.objects.all(), sort, ordering, after=after, per_page=2)
+
+    def walk(self, sort):
+        seen, after = [], None
+        while True:
+            page = self.page(sort, after)
+            seen += [b.pk for b in page]
+            if not page.has_next:
+                return seen
+            after = page.next_cursor
+
+    def test_each_sort_walks_every_book_once(self):
+        for sort, ordering in views.BookListView.sort_orderings.items():
+            with self.subTest(sort=sort):
+                self.assertEqual(self.walk(sort), list(Book.objects.order_by(*ordering).values_list("pk", flat=True)))
+
+    def test_ties_are_broken_by_pk(self):
+        same_title = [b.pk for b in self.books if b.title == "Book 0"]
+        same_rating = [b.pk for b in self.books if b.rating_avg]
+        self.assertEqual([pk for pk in self.walk("title") if pk in same_title], sorted(same_title))
+        self.assertEqual([pk for pk in self.walk("rating") if pk in same_rating], sorted(same_rating, reverse=True))
+
+    def test_forged_or_stale_cursor_restarts(self):
+        first = self.page("title")
+        # signed with another key: the values would be accepted if the signature were not checked
+        forged = signing.dumps(["title", ["Book 2", self.books[-1].pk]], salt=pagination.SALT, key="not-the-secret")
+        stale = pagination.encode_cursor("title", ["Book 0"])  # a key of an older, shorter ordering
+        for after in ("garbage", forged, stale):
+            with self.subTest(after=after):
+                self.assertEqual(list(self.page("title", after)), list(first))
+        response = self.client.get(reverse("catalog:book_list"), {"sort": "title", "after": forged})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["keyset_page"].object_list[:2], list(first))
+
+    def test_cursor_of_another_sort_restarts(self):
+        title_cursor = self.page("title").next_cursor
+        self.assertEqual(list(self.page("rating", title_cursor)), list(self.page("rating")))
+        response = self.client.get(reverse("catalog:book_list"), {"sort": "rating", "after": title_cursor})
+        self.assertEqual(len(response.context["keyset_page"]), len(self.books))
+
+
+class ReviewPageTests(TestCase):
+    """The detail page shows a bounded page of reviews whatever their number."""
+
+    def setUp(self):
+        cache.clear()
+        self.book = make_book()
+        self.user = get_user_model().objects.create_user("reader")
+
+    def add_reviews(self, count):
+        for n in range(count):
+            Review.objects.create(book=self.book, user=self.user, rating=n % 5 + 1, text=f"review #{n}")
+
+    def detail_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("catalog:book_detail", args=[self.book.pk]))
+        return len(ctx)
+
+    def test_query_count_does_not_grow_with_reviews(self):
+        self.add_reviews(1)
+        few = self.detail_queries()
+        self.add_reviews(30)
+        self.assertEqual(self.detail_queries(), few)
+
+    def test_load_more_walks_every_review_once(self):
+        self.add_reviews(23)
+        response = self.client.get(reverse("catalog:book_detail", args=[self.book.pk]))
+        self.assertEqual(len(response.context["reviews"]), 10)
+        page = response.context["reviews"]
+        seen = [r["text"] for r in page]  # the cached first page holds plain values
+        while page.has_next:
+            response = self.client.get(
+                reverse("catalog:book_reviews", args=[self.book.pk]), {"reviews": page.next_cursor}
+            )
+            page = response.context["reviews"]
+            seen += [r.text for r in page]
+        self.assertEqual(seen, [f"review #{n}" for n in range(22, -1, -1)])
+        self.assertNotContains(response, "Load more")
+
+    def test_first_page_is_cached_until_a_review_is_added(self):
+        self.add_reviews(3)
+        url = reverse("catalog:book_detail", args=[self.book.pk])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        self.assertFalse([q for q in ctx.captured_queries if "catalog_review" in q["sql"]])
+        page = caching.first_reviews(self.book.pk, None)
+        self.assertEqual(page.object_list[0], {
+            "user": "reader", "rating": 3, "text": "review #2", "created_at": page.object_list[0]["created_at"],
+        })
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(book=self.book, user=self.user, rating=1, text="newest")
+        self.assertContains(self.client.get(url), "newest")
+
+
+class AutocompleteTests(TestCase):
+    """Typeahead from the in-memory index (UZ: avtoto‘ldirish)."""
+
+    def setUp(self):
+        cache.clear()
+        autocomplete.reset()
+        self.addCleanup(autocomplete.reset)
+        author = Author.objects.create(first_name="Abdulla", last_name="Qodiriy")
+        self.days = Book.objects.create(title="O‘tkan kunlar", author=author, isbn="9789943000011", rating_count=9)
+        self.scorpion = Book.objects.create(title="Mehrobdan chayon", author=author, rating_count=3)
+
+    def complete(self, q):
+        index = autocomplete.get_index()
+        return [r["title"] for r in index.complete(q)]
+
+    def test_spelling_variants_match(self):
+        self.assertEqual(autocomplete.normalize("Oʻtkan  KUNLAR!"), "otkan kunlar")
+        for q in ("o'tkan", "O`tkan", "otk", "kunl", "97899", "qodiriy"):
+            with self.subTest(q=q):
+                self.assertIn("O‘tkan kunlar", self.complete(q))
+        self.assertEqual(self.complete("abdulla"), ["O‘tkan kunlar", "Mehrobdan chayon"])
+        self.assertEqual(self.complete("zz"), [])
+
+    def test_changes_reach_the_index(self):
+        self.complete("a")  # load
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title="Kecha va kunduz", author=self.days.author)
+            self.scorpion.delete()
+        autocomplete.get_index().checked -= autocomplete.SYNC_INTERVAL
+        self.assertEqual(self.complete("k"), ["O‘tkan kunlar", "Kecha va kunduz"])
+        self.assertEqual(self.complete("mehr"), [])
+
+    def test_missing_entries_wait_and_backlogs_rebuild_aside(self):
+        self.complete("a")  # load
+        index = autocomplete.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            autocomplete.touch_books([self.days.pk, self.scorpion.pk])
+        # a writer that has moved the counter but not yet written its entry
+        cache.delete(f"{autocomplete.LOG_KEY}:{index.seq + 1}")
+        with patch.object(autocomplete, "_rebuild_in_background") as rebuild:
+            autocomplete._replay(index)
+            rebuild.assert_not_called()
+            self.assertIsNotNone(index.gap)
+            cache.set(f"{autocomplete.LOG_KEY}:{index.seq + 1}", self.days.pk)
+            autocomplete._replay(index)
+            self.assertEqual((index.seq, index.gap), (autocomplete.current_seq(), None))
+            rebuild.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                autocomplete.touch_all()
+            self.assertIs(autocomplete._replay(index), index)
+            rebuild.assert_called_once()
+
+    def test_workers_share_a_mapped_snapshot(self):
+        path = os.path.join(tempfile.mkdtemp(), "autocomplete.idx")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with override_settings(AUTOCOMPLETE_SNAPSHOT=path):
+            self.assertEqual(self.complete("mehr"), ["Mehrobdan chayon"])
+            self.assertTrue(os.path.exists(path))
+            self.assertTrue(autocomplete.get_index().stats()["shared"])
+            url = reverse("catalog:api_autocomplete")
+            with self.assertNumQueries(0):
+                data = self.client.get(url, {"q": "o‘tk"}).json()
+            self.assertEqual(data["results"][0]["url"], self.days.get_absolute_url())
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.a, cls.b, cls.c, cls.d = [make_book(title=title) for title in "ABCD"]
+        User = get_user_model()
+        cls.readers = {name: User.objects.create_user(name) for name in ("r1", "r2", "r3", "r4")}
+        for name, books in [("r1", "ABC"), ("r2", "AB"), ("r3", "ACD"), ("r4", "D")]:
+            for title in books:
+                cls.borrow(name, getattr(cls, title.lower()))
+        Borrow.objects.update(borrowed_at=timezone.now() - timedelta(days=7))
+
+    @classmethod
+    def borrow(cls, name, book):
+        return Borrow.objects.create(
+            user=cls.readers[name], copy=book.copies.first(), due_date=timezone.localdate(),
+            returned_at=timezone.now(),
+        )
+
+    def table(self):
+        return {(r.book_id, r.neighbor_id): (round(r.score, 4), r.together) for r in BookNeighbor.objects.all()}
+
+    def test_rebuild_ranks_by_cosine(self):
+        recommendations.rebuild()
+        score = round(2 / 6 ** 0.5, 4)
+        self.assertEqual(self.table(), {
+            (self.a.pk, self.b.pk): (score, 2), (self.a.pk, self.c.pk): (score, 2),
+            (self.b.pk, self.a.pk): (score, 2), (self.c.pk, self.a.pk): (score, 2),
+        })
+
+    def test_nightly_refresh_matches_rebuild(self):
+        call_command("build_recommendations", stdout=StringIO())
+        self.borrow("r2", self.c)
+        out = StringIO()
+        call_command("build_recommendations", "--days", "1", stdout=out)
+        self.assertIn("Refreshed 3 book(s)", out.getvalue())
+        refreshed = self.table()
+        recommendations.rebuild()
+        self.assertEqual(refreshed, self.table())
+
+    def test_archived_loans_still_count(self):
+        recommendations.rebuild()
+        rebuilt = self.table()
+        with self.assertLogs("catalog.archive", "INFO"):
+            archive.run(timezone.now() + timedelta(minutes=1))
+        self.assertFalse(Borrow.objects.exists())
+        recommendations.rebuild()
+        self.assertEqual(self.table(), rebuilt)
+        # the nightly refresh reads the archived history too
+        self.borrow("r2", self.c)
+        recommendations.refresh(timezone.now() - timedelta(days=1))
+        refreshed = self.table()
+        recommendations.rebuild()
+        self.assertEqual(refreshed, self.table())
+        self.assertEqual(refreshed[self.c.pk, self.a.pk], (1.0, 3))
+
+    def test_sparse_and_python_agree(self):
+        self.borrow("r2", self.c)
+        sparse_result = recommendations.compute()
+        with patch.object(coborrow, "neighbors_sparse", neighbors_python):
+            python_result = recommendations.compute()
+        self.assertEqual(rounded(sparse_result), rounded(python_result))
+        self.assertEqual(recommendations.compute({self.c.pk}), {self.c.pk: sparse_result[self.c.pk]})
+
+    def test_merge_replaces_scores_that_left_the_top_k(self):
+        # book 2's new row ranks book 1 below book 4; book 1's stored list
+        # must get the lower score, not keep the old one
+        stored = {1: [(1, 2, 0.9, 5), (1, 3, 0.5, 2)], 4: []}
+        with patch.object(coborrow, "TOP_K", 1):
+            neighbors = coborrow.merge(
+                {2: [(4, 0.8, 4), (1, 0.4, 2)]}, {2},
+                lambda chunk: [row for book_id in chunk for row in stored[book_id]],
+            )
+        self.assertEqual(neighbors, {2: [(4, 0.8, 4)], 1: [(3, 0.5, 2)], 4: [(2, 0.8, 4)]})
+
+    def test_detail_page_lists_neighbours(self):
+        recommendations.rebuild()
+        response = self.client.get(reverse("catalog:book_detail", args=[self.a.pk]))
+        self.assertEqual(response.context["also_borrowed"], [self.b, self.c])
+        self.assertContains(response, "Readers also borrowed")
+        response = self.client.get(reverse("catalog:book_detail", args=[self.d.pk]))
+        self.assertNotContains(response, "Readers also borrowed")
+
+
+class ArchiveTests(TestCase):
+    """catalog.archive: old returns move to the archive, the profile reads both (UZ: arxiv)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("reader")
+        cls.book = make_book(copies=2)
+        now = timezone.now()
+        cls.old = [cls.borrow(now - timedelta(days=400 - n), now - timedelta(days=300 - n)) for n in range(5)]
+        cls.recent = cls.borrow(now - timedelta(days=20), now - timedelta(days=5))
+        cls.open = cls.borrow(now - timedelta(days=3), None)
+
+    @classmethod
+    def borrow(cls, borrowed_at, returned_at):
+        borrow = Borrow.objects.create(
+            user=cls.user, copy=cls.book.copies.first(), due_date=borrowed_at.date() + timedelta(days=14),
+            returned_at=returned_at,
+        )
+        Borrow.objects.filter(pk=borrow.pk).update(borrowed_at=borrowed_at)
+        return borrow
+
+    def setUp(self):
+        # progress goes to the catalog.archive log; keep it out of the test output
+        self.logs = self.enterContext(self.assertLogs("catalog.archive", "INFO"))
+
+    def test_moves_old_returns_in_batches(self):
+        before = archive.cutoff(180)
+        self.assertEqual(archive.run(before, batch_size=2, max_batches=1), 2)
+        self.assertEqual(archive.run(before, batch_size=2), 3)
+        self.assertEqual(archive.run(before, batch_size=2), 0)
+        self.assertEqual(
+            [r.getMessage() for r in self.logs.records],
+            ["archived 2 loan(s), 2 so far", "archived 2 loan(s), 2 so far", "archived 1 loan(s), 3 so far"],
+        )
+        self.assertEqual(set(Borrow.objects.values_list("pk", flat=True)), {self.recent.pk, self.open.pk})
+        moved = ArchivedBorrow.objects.get(pk=self.old[0].pk)
+        # copied as is, not reset to now
+        self.assertEqual(moved.borrowed_at.date(), moved.due_date - timedelta(days=14))
+        self.assertEqual(moved.returned_at, self.old[0].returned_at)
+
+    def test_stats_and_command(self):
+        self.assertEqual(archive.stats(archive.cutoff(180)), {"hot": 7, "open": 1, "archivable": 5, "archived": 0})
+        out = StringIO()
+        call_command("archive_borrows", "--dry-run", stdout=out)
+        self.assertEqual(Borrow.objects.count(), 7)
+        call_command("archive_borrows", "--days", "1", stdout=out)
+        self.assertEqual(archive.stats(archive.cutoff(1)), {"hot": 1, "open": 1, "archivable": 0, "archived": 6})
+        self.assertIn("Archived 6 loan(s)", out.getvalue())
+
+    def test_profile_reads_archive_when_asked(self):
+        archive.run(archive.cutoff(180))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("catalog:profile"))
+        self.assertEqual([b.pk for b in response.context["history"]], [self.recent.pk])
+        response = self.client.get(reverse("catalog:profile") + "?archive=1")
+        self.assertEqual(
+            [b.pk for b in response.context["history"]], [self.recent.pk] + [b.pk for b in reversed(self.old)]
+        )
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_PIN_SECONDS=10)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Safe requests read from the replica until the browser writes (UZ: replika)."""
+
+    def route(self, request, write=False):
+        seen = {}
+
+        def view(request):
+            seen["before"] = router.db_for_read(Book)
+            if write:
+                router.db_for_write(Book)
+                seen["after"] = router.db_for_read(Book)
+            return HttpResponse()
+
+        response = routers.ReplicaRoutingMiddleware(view)(request)
+        return seen, response
+
+    def test_reads_and_writes(self):
+        factory = RequestFactory()
+        self.assertEqual(router.db_for_read(Book), "default")  # not in a request
+
+        seen, response = self.route(factory.get("/"))
+        self.assertEqual(seen, {"before": "replica"})
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+        seen, response = self.route(factory.get("/borrow/1/"), write=True)
+        self.assertEqual(seen, {"before": "replica", "after": "default"})
+        self.assertEqual(response.cookies[routers.PIN_COOKIE]["max-age"], 10)
+
+        pinned = factory.get("/")
+        pinned.COOKIES[routers.PIN_COOKIE] = "1"
+        self.assertEqual(self.route(pinned)[0], {"before": "default"})
+        self.assertEqual(self.route(factory.post("/"))[0], {"before": "default"})
+
+    def test_primary_reads_block(self):
+        def view(request):
+            with routers.primary_reads():
+                self.assertEqual(router.db_for_read(Book), "default")
+            self.assertEqual(router.db_for_read(Book), "replica")
+            return HttpResponse()
+
+        routers.ReplicaRoutingMiddleware(view)(RequestFactory().get("/"))
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("reader")
+        self.book = make_book(copies=2)
+        Review.objects.create(book=self.book, user=self.user, rating=4, text="Bleak")
+
+    def get(self, url, **headers):
+        return self.client.get(url, headers=headers)
+
+    def test_sparse_fields(self):
+        response = self.get(reverse("catalog:api_book_list") + "?fields=title,availability")
+        self.assertEqual(response.json()["results"], [
+            {"id": self.book.pk, "title": "1984", "availability": {"total": 2, "available": 2}},
+        ])
+        response = self.get(reverse("catalog:api_book_list") + "?fields=title,shelf")
+        self.assertEqual(response.status_code, 400)
+
+    def test_detail(self):
+        data = self.get(reverse("catalog:api_book_detail", args=[self.book.pk])).json()
+        self.assertEqual(data["author"]["name"], "George Orwell")
+        self.assertEqual(data["histogram"]["4"], 1)
+        self.assertEqual([r["text"] for r in data["reviews"]], ["Bleak"])
+        self.assertEqual(self.get(reverse("catalog:api_book_detail", args=[0])).status_code, 404)
+
+    def test_etag_revalidation(self):
+        for url in (
+            reverse("catalog:api_book_list"),
+            reverse("catalog:api_book_detail", args=[self.book.pk]),
+        ):
+            with self.subTest(url=url):
+                etag = self.get(url)["ETag"]
+                with self.assertNumQueries(1 if url.endswith("books/") else 0):
+                    response = self.get(url, if_none_match=etag)
+                self.assertEqual((response.status_code, response.content), (304, b""))
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    copy = self.book.copies.filter(status=BookCopy.AVAILABLE).first()
+                    services.borrow_copy(self.user, copy.pk)
+                response = self.get(url, if_none_match=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response["ETag"], etag)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class AsyncViewTests(TransactionTestCase):
+    """The async read pages show what the sync ones do, with the same query
+    counts: reads on gather_reads worker threads are counted too."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("reader")
+        self.book = make_book(copies=2)
+        Review.objects.create(book=self.book, user=self.user, rating=5, text="Chilling")
+        services.borrow_copy(self.user, self.book.copies.first().pk)
+
+    async def test_pages_match_sync_views(self):
+        pages = [
+            (reverse("catalog:home"), "1 of 2 copies"),
+            (reverse("catalog:book_list"), "Available: 1 / 2"),
+            (reverse("catalog:book_list") + "?q=1984", 'card-title">1984'),
+            (reverse("catalog:book_detail", args=[self.book.pk]), "Chilling"),
+            (reverse("catalog:profile"), "Due date"),
+            (reverse("catalog:profile") + "?archive=1", "Due date"),
+        ]
+        await self.async_client.aforce_login(self.user)
+        await sync_to_async(self.client.force_login)(self.user)
+        for url, text in pages:
+            with self.subTest(url=url):
+                with override_settings(ROOT_URLCONF=__name__):
+                    response = await self.async_client.get(url)
+                self.assertContains(response, text)
+                cache.clear()  # both from cold caches
+                expected = await sync_to_async(self.client.get)(url)
+                self.assertEqual(response["Server-Timing"].split(";")[2], expected["Server-Timing"].split(";")[2])
+
+        with override_settings(ROOT_URLCONF=__name__):
+            response = await self.async_client.get(reverse("catalog:book_detail", args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+@skipUnless(connection.vendor == "sqlite", "checks SQLite's EXPLAIN QUERY PLAN text")
+class IndexUsageTests(TestCase):
+    """The hot queries are planned on their indexes (UZ: indekslar)."""
+
+    def assertUsesIndex(self, qs, name):
+        plan = qs.explain()
+        self.assertIn(name, plan)
+        # an index read in the wanted order needs no separate sort step
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_circulation_and_review_queries(self):
+        user = get_user_model().objects.create_user("reader")
+        open_loans, history = views.loans_of(user)
+        self.assertUsesIndex(open_loans, "catalog_borrow_open_idx")
+        self.assertUsesIndex(history, "catalog_borrow_closed_idx")
+        self.assertUsesIndex(BookCopy.objects.filter(book_id=1, status=BookCopy.AVAILABLE), "catalog_copy_book_status_idx")
+        self.assertUsesIndex(Hold.objects.filter(book_id=1, status=Hold.WAITING, position=1).order_by(), "catalog_hold_queue_idx")
+
+        detail = views.BookDetailView(kwargs={"pk": 1})
+        self.assertUsesIndex(detail.get_reviews(), "catalog_review_book_new_idx")
+
+
+class ConcurrentBorrowTests(TransactionTestCase):
+    """Many patrons racing for a handful of copies (UZ: navbat uchun poyga)."""
+
+    borrowers = 60
+    copies = 5
+
+    def test_no_double_loans_under_contention(self):
+        book = make_book(copies=self.copies)
+        users = [
+            get_user_model().objects.create_user(f"reader{i}")
+            for i in range(self.borrowers)
+        ]
+        copy_ids = list(book.copies.values_list("pk", flat=True))
+        start = threading.Barrier(self.borrowers)
+        attempts = []
+
+        def attempt(user):
+            start.wait()
+            won = 0
+            try:
+                for copy_id in copy_ids:
+                    attempts.append(copy_id)
+                    try:
+                        services.borrow_copy(user, copy_id)
+                        won += 1
+                        break
+                    except services.CopyUnavailable:
+                        continue
+            finally:
+                connection.close()
+            return won
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.borrowers) as pool:
+            wins = sum(pool.map(attempt, users))
+        elapsed = time.perf_counter() - started
+
+        # no double loans: one loan per copy, every copy lent exactly once
+        self.assertEqual(wins, self.copies)
+        self.assertEqual(Borrow.objects.count(), self.copies)
+        self.assertEqual(Borrow.objects.values("copy").distinct().count(), self.copies)
+        self.assertFalse(BookCopy.objects.filter(book=book).exclude(status=BookCopy.BORROWED).exists())
+        # the counters match the rows and never went below zero
+        book = Book.recount_copies(Book.objects.filter(pk=book.pk)).get()
+        self.assertEqual((book.total_copies, book.available_copies), (book.true_total, book.true_available))
+        self.assertEqual(book.available_copies, 0)
+        logger.info(
+            "%d borrowers, %d copies: %d attempts in %.0fms (%.0f attempts/s)",
+            self.borrowers, len(copy_ids), len(attempts), elapsed * 1000, len(attempts) / elapsed,
+        )
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class DatasetCommandTests(TestCase):
+    """generate_dataset leaves consistent data behind; bench_urls times every URL."""
+
+    def setUp(self):
+        cache.clear()
+        autocomplete.reset()
+        self.addCleanup(autocomplete.reset)
+
+    def generate(self, **opts):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("generate_dataset", books=30, users=5, authors=5, categories=3, stdout=StringIO(), **opts)
+
+    def test_generated_rows_are_consistent(self):
+        seq = autocomplete.current_seq()
+        self.generate()
+        self.assertEqual((Book.objects.count(), BookCopy.objects.count()), (30, 90))
+        self.assertEqual((Borrow.objects.count(), Review.objects.count()), (300, 60))
+        for book in Book.recount_copies().filter(total_copies__gt=0):
+            self.assertEqual((book.total_copies, book.available_copies), (book.true_total, book.true_available))
+        for book in Book.recount_ratings():
+            self.assertEqual((book.rating_sum, book.rating_count), (book.true_sum, book.true_count))
+        borrowed = BookCopy.objects.filter(status=BookCopy.BORROWED)
+        self.assertEqual(
+            sorted(borrowed.values_list("pk", flat=True)),
+            sorted(Borrow.objects.filter(returned_at=None).values_list("copy_id", flat=True)),
+        )
+        # bulk_create skips the signals: the search index and the autocomplete log are updated in bulk
+        book = Book.objects.order_by("?").first()
+        self.assertIn(book, search.search_books(Book.objects.all(), book.title))
+        self.assertGreater(autocomplete.current_seq() - seq, autocomplete.MAX_REPLAY)
+
+    def test_same_seed_same_catalogue(self):
+        with transaction.atomic():
+            self.generate(seed=7)
+            first = list(Book.objects.order_by("pk").values_list("title", "year"))
+            transaction.set_rollback(True)
+        self.assertFalse(Book.objects.exists())
+        self.generate(seed=7)
+        self.assertEqual(list(Book.objects.order_by("pk").values_list("title", "year")), first)
+
+    def test_bench_urls_reports_every_url(self):
+        with self.assertRaises(CommandError):
+            call_command("bench_urls", stdout=StringIO())
+        self.generate()
+        books, borrows = Book.objects.count(), Borrow.objects.count()
+        out = StringIO()
+        call_command("bench_urls", "--requests", "2", "--warmup", "0", stdout=out, stderr=StringIO())
+        results = json.loads(out.getvalue())
+        self.assertLessEqual({"home", "book_list", "book_list?q", "book_detail", "profile"}, results.keys())
+        for name, result in results.items():
+            with self.subTest(name=name):
+                self.assertEqual(result["requests"], 2)
+                self.assertEqual(set(result["statuses"]) - {"200", "302"}, set(), result["path"])
+        # the run is rolled back
+        self.assertEqual((Book.objects.count(), Borrow.objects.count()), (books, borrows))
+
+
+class QueryBudgetTests(TestCase):
+    """Every page stays within its @query_budget whatever the data size;
+    an N+1 regression raises QueryBudgetExceeded (UZ: so‘rovlar chegarasi)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user("reader")
+        reviewers = [User.objects.create_user(f"critic{i}") for i in range(4)]
+        fiction = Category.objects.create(name="Fiction")
+        for n in range(6):
+            book = make_book(copies=3, title=f"Book {n}")
+            book.categories.add(fiction)
+            for reviewer in reviewers:
+                Review.objects.create(book=book, user=reviewer, rating=4, text="Good")
+        cls.book = book
+        for copy in BookCopy.objects.filter(book__title__in=["Book 0", "Book 1", "Book 2"]):
+            borrow = services.borrow_copy(cls.user, copy.pk)
+            if copy.book.title != "Book 0":
+                services.return_copy(cls.user, borrow.pk)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_pages_stay_within_budget(self):
+        urls = [
+            reverse("catalog:home"),
+            reverse("catalog:book_list"),
+            reverse("catalog:book_list") + "?q=book",
+            reverse("catalog:book_list") + "?sort=title&category=Fiction",
+            reverse("catalog:book_detail", args=[self.book.pk]),
+            reverse("catalog:profile"),
+            reverse("catalog:profile") + "?archive=1",
+            reverse("catalog:signup"),
+            reverse("catalog:api_book_list") + "?fields=title,categories",
+            reverse("catalog:api_book_list") + "?q=book&sort=rating",
+            reverse("catalog:api_book_detail", args=[self.book.pk]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('desc="', response["Server-Timing"])
+
+    def test_circulation_stays_within_budget(self):
+        copy = self.book.copies.first()
+        self.client.get(reverse("catalog:borrow_copy", args=[copy.pk]))
+        borrow = Borrow.objects.get(copy=copy, returned_at=None)
+        self.client.get(reverse("catalog:return_copy", args=[borrow.pk]))
+
+    @override_settings(QUERY_BUDGETS={"catalog:book_detail": 2})
+    def test_exceeded_budget_raises(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, "catalog:book_detail ran"):
+            self.client.get(reverse("catalog:book_detail", args=[self.book.pk]))
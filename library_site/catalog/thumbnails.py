@@ -0,0 +1,81 @@
+"""Cover image derivatives.
+
+Each uploaded cover gets fixed-width WebP and JPEG renditions stored next to
+the original as ``<stem>.<content hash>.<width>w.<ext>``. The hash is kept on
+``Book.cover_hash`` so templates can build the ``srcset`` without touching
+storage, and a new upload gets new URLs (safe to cache forever).
+(UZ: muqova rasmining kichik nusxalari)
+"""
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+WIDTHS = (160, 320, 640)
+FORMATS = (("webp", "WEBP"), ("jpg", "JPEG"))
+QUALITY = 80
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def derivative_name(name, digest, width, ext):
+    stem, _ = os.path.splitext(name)
+    return f"{stem}.{digest}.{width}w.{ext}"
+
+
+def render_derivatives(name, force=False):
+    """Write every rendition of the original ``name``; return its content hash.
+
+    Module-level and DB-free so it can run in a worker process.
+    """
+    with default_storage.open(name, "rb") as fh:
+        data = fh.read()
+    digest = content_hash(data)
+    with Image.open(BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original).convert("RGB")
+    for width in WIDTHS:
+        # thumbnail() never upscales, so small originals stay as they are
+        resized = image.copy()
+        resized.thumbnail((width, width * 4), Image.LANCZOS)
+        for ext, fmt in FORMATS:
+            target = derivative_name(name, digest, width, ext)
+            if default_storage.exists(target):
+                if not force:
+                    continue
+                default_storage.delete(target)
+            buf = BytesIO()
+            resized.save(buf, fmt, quality=QUALITY, optimize=True)
+            default_storage.save(target, ContentFile(buf.getvalue()))
+    return digest
+
+
+def _render_safely(args):
+    name, force = args
+    try:
+        return name, render_derivatives(name, force), None
+    except Exception as exc:  # one bad upload must not stop a backfill
+        return name, None, f"{type(exc).__name__}: {exc}"
+
+
+def render_many(names, workers=None, force=False):
+    """Render derivatives for ``names`` across a process pool.
+
+    Yields ``(name, digest, error)`` in input order.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_render_safely, [(n, force) for n in names], chunksize=4)
+
+
+def derivative_url(name, digest, width, ext):
+    return default_storage.url(derivative_name(name, digest, width, ext))
+
+
+def srcset(name, digest, ext):
+    return ", ".join(f"{derivative_url(name, digest, w, ext)} {w}w" for w in WIDTHS)
@@ -1,16 +1,31 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
 
 
 app_name = "catalog"
 
 
-urlpatterns = [
-    path("", views.HomeView.as_view(), name="home"),
-    path("books/", views.BookListView.as_view(), name="book_list"),
-    path("books/<int:pk>/", views.BookDetailView.as_view(), name="book_detail"),
-    path("signup/", views.SignUpView.as_view(), name="signup"),
-    path("borrow/<int:copy_id>/", views.borrow_copy, name="borrow_copy"),
-    path("return/<int:borrow_id>/", views.return_copy, name="return_copy"),
-    path("profile/", views.profile, name="profile"),
-]
\ No newline at end of file
+def build(pages):
+    """URL patterns with the read pages (home, list, detail, profile) taken
+    from ``pages``: ``catalog.views`` or ``catalog.async_views``."""
+    return [
+        path("", pages.HomeView.as_view(), name="home"),
+        path("books/", pages.BookListView.as_view(), name="book_list"),
+        path("books/<int:pk>/", pages.BookDetailView.as_view(), name="book_detail"),
+        path("books/<int:pk>/reviews/", views.book_reviews, name="book_reviews"),
+        path("signup/", views.SignUpView.as_view(), name="signup"),
+        path("borrow/<int:copy_id>/", views.borrow_copy, name="borrow_copy"),
+        path("return/<int:borrow_id>/", views.return_copy, name="return_copy"),
+        path("books/<int:book_id>/hold/", views.place_hold, name="place_hold"),
+        path("holds/<int:hold_id>/cancel/", views.cancel_hold, name="cancel_hold"),
+        path("profile/", pages.profile, name="profile"),
+        # read-only JSON for the mobile app and kiosks (see catalog.api)
+        path("api/v1/books/", api.book_list, name="api_book_list"),
+        path("api/v1/books/<int:pk>/", api.book_detail, name="api_book_detail"),
+        path("api/v1/autocomplete/", api.book_autocomplete, name="api_autocomplete"),
+    ]
+
+
+# async read pages under ASGI (asgi.py sets ASYNC_VIEWS=1)
+urlpatterns = build(async_views if settings.ASYNC_VIEWS else views)
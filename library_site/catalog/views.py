@@ -1,62 +1,205 @@
-from datetime import date, timedelta
 from django.contrib import messages
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404, redirect, render
+from django.contrib.messages import get_messages
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect, render
+from django.views.decorators.http import require_POST
 from django.views.generic import ListView, DetailView, TemplateView, CreateView
 
+from . import archive, caching, services
+from .querybudget import query_budget
 from .forms import SignUpForm, ReviewForm
-from .models import Book, BookCopy, Borrow
+from .models import Book, BookCopy, Borrow, Hold, Review
+from .pagination import keyset_paginate
+from .search import search_books
 
 
+@query_budget(4)
 class HomeView(TemplateView):
     template_name = "catalog/home.html"
+    # shelf totals; on the cached anonymous page they may lag by up to
+    # caching.PAGE_TIMEOUT, nothing else there does
+    stats = {
+        "books": Count("id"),
+        "copies": Coalesce(Sum("total_copies"), 0),
+        "available": Coalesce(Sum("available_copies"), 0),
+    }
+
+    def get(self, request, *args, **kwargs):
+        # Every anonymous visitor without pending messages sees the same
+        # page: serve it from the cache, keyed by the books it shows
+        if request.user.is_authenticated or request.GET or len(get_messages(request)):
+            return super().get(request, *args, **kwargs)
+        latest_ids = caching.latest_book_ids(
+            lambda: Book.objects.order_by("-id").values_list("pk", flat=True)[:caching.HOME_SIZE]
+        )
+        html = caching.get_or_compute(
+            caching.home_page_key(latest_ids),
+            lambda: super(HomeView, self).get(request, *args, **kwargs).render().content,
+        )
+        return HttpResponse(html)
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        # Oxirgi qo‘shilgan 8 ta kitob (UZ: so‘nggi kitoblar)
-        ctx["latest_books"] = (
-            Book.objects
-            .select_related("author")
-            .prefetch_related("categories", "copies")
-            .order_by("-id")[:8]
-        )
+        ctx["latest_books"] = self.get_latest_books()
+        ctx["stats"] = Book.objects.aggregate(**self.stats)
         return ctx
 
+    def get_latest_books(self):
+        # Oxirgi qo‘shilgan 8 ta kitob (UZ: so‘nggi kitoblar)
+        return Book.objects.select_related("author").order_by("-id")[:caching.HOME_SIZE]
+
 
+@query_budget(5)
 class BookListView(ListView):
     model = Book
+    template_name = "catalog/book_list.html"
+    context_object_name = "books"
+    paginate_by = 12  # (UZ: sahifalash)
+    # browse sorts, each ending with the pk so keyset cursors are unique
+    sort_orderings = {
+        "new": ("-id",),
+        "title": ("title", "id"),
+        "rating": ("-rating_avg", "-id"),
+    }
+    min_ratings = ("4", "3", "2")
 
+    def get_sort(self):
+        sort = self.request.GET.get("sort", "new")
+        return sort if sort in self.sort_orderings else "new"
 
-template_name = "catalog/book_list.html"
-context_object_name = "books"
-paginate_by = 12  # (UZ: sahifalash)
+    def get_min_rating(self):
+        rating = self.request.GET.get("rating", "")
+        return rating if rating in self.min_ratings else ""
 
+    def get_queryset(self):
+        # cards read the copy counters, so nothing per-row is prefetched
+        qs = Book.objects.select_related("author")
+        q = self.request.GET.get("q", "").strip()
+        category = self.request.GET.get("category")
+        if self.get_min_rating():
+            # range scan on the rating index, no aggregate over reviews
+            qs = qs.filter(rating_avg__gte=int(self.get_min_rating()))
+        if category:
+            # id subquery instead of a join, so no .distinct() is needed
+            qs = qs.filter(pk__in=Book.categories.through.objects.filter(
+                category__name__iexact=category).values("book_id"))
+        if q:
+            # ranked full-text match (UZ: relevantlik bo‘yicha)
+            return search_books(qs, q)
+        return qs
 
-def get_queryset(self):
-    qs = Book.objects.select_related("author").prefetch_related("categories", "copies")
-    q = self.request.GET.get("q")
-    category = self.request.GET.get("category")
-    if q:
-        qs = qs.filter(title__icontains=q)
-    if category:
-        qs = qs.filter(categories__name__iexact=category)
-    return qs.distinct()
+    def get_paginate_by(self, queryset):
+        # Ranked search results keep page numbers; browsing uses keyset
+        # cursors so deep pages cost the same as the first one.
+        return self.paginate_by if self.request.GET.get("q", "").strip() else None
 
+    def get_filters(self):
+        return {
+            "q": self.request.GET.get("q", ""),
+            "category": self.request.GET.get("category", ""),
+            "sort": self.get_sort(),
+            "rating": self.get_min_rating(),
+        }
 
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx.update(self.get_filters())
+        if not ctx["q"].strip():
+            page = keyset_paginate(
+                self.object_list,
+                ctx["sort"],
+                self.sort_orderings[ctx["sort"]],
+                after=self.request.GET.get("after"),
+                per_page=self.paginate_by,
+            )
+            ctx["books"] = ctx["object_list"] = page
+            ctx["keyset_page"] = page
+        return ctx
+
+
+@query_budget(7)
 class BookDetailView(DetailView):
     model = Book
     template_name = "catalog/book_detail.html"
     context_object_name = "book"
 
+    def get_queryset(self):
+        return Book.objects.select_related("author")
+
+    reviews_per_page = 10
+    review_ordering = ("-created_at", "-id")
+    also_borrowed_count = 4
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["review_form"] = ReviewForm()
+        ctx["reviews"] = self.get_review_page()
+        ctx["also_borrowed"] = self.get_also_borrowed()
+        ctx.update(self.get_hold_context(self.object, self.get_hold()))
+        return ctx
+
+    def get_also_borrowed(self):
+        """"Readers also borrowed", precomputed by catalog.recommendations: one
+        range scan of the (book, -score) index."""
+        return list(
+            Book.objects.filter(neighbor_of__book_id=self.kwargs[self.pk_url_kwarg])
+            .select_related("author").order_by("-neighbor_of__score")[:self.also_borrowed_count]
+        )
+
+    def get_hold(self):
+        """The visitor's active hold on this book, if any (one unique-index lookup)."""
+        if not self.request.user.is_authenticated:
+            return None
+        return Hold.objects.filter(
+            book_id=self.kwargs[self.pk_url_kwarg], user=self.request.user, status__in=Hold.ACTIVE
+        ).select_related("copy").first()
+
+    def get_hold_context(self, book, hold):
+        # queue position and estimate come from stored columns, no counting
+        position = hold.position if hold else book.holds_waiting + 1
+        return {"hold": hold, "hold_eta": services.estimated_ready(book, position)}
+
+    def get_reviews(self):
+        # one query for the reviewers instead of one per review; by the URL's
+        # pk so it can run before (or alongside) the book's own query
+        return Review.objects.filter(
+            book_id=self.kwargs[self.pk_url_kwarg]
+        ).select_related("user").order_by(*self.review_ordering)
+
+    def get_review_page(self):
+        """A bounded page of reviews, newest first; ``?reviews=<cursor>``
+        ("load more") continues after the last one shown. The first page is
+        cached per book version, which every review bumps."""
+        after = self.request.GET.get("reviews")
+
+        def fetch():
+            return keyset_paginate(
+                self.get_reviews(), "reviews", self.review_ordering,
+                after=after, per_page=self.reviews_per_page,
+            )
+
+        if after:
+            return fetch()
+        return caching.first_reviews(self.kwargs[self.pk_url_kwarg], fetch)
+
 
-def get_context_data(self, **kwargs):
-    ctx = super().get_context_data(**kwargs)
-    ctx["review_form"] = ReviewForm()
-    return ctx
+@query_budget(2)
+def book_reviews(request, pk):
+    """The next page of a book's reviews as an HTML fragment, appended in
+    place by the detail page's "load more" link."""
+    view = BookDetailView()
+    view.setup(request, pk=pk)
+    return render(request, "catalog/_reviews.html", {
+        "book_id": pk, "reviews": view.get_review_page(),
+    })
 
 
+@query_budget(3)
 class SignUpView(CreateView):
     form_class = SignUpForm
     template_name = "registration/signup.html"
@@ -69,36 +212,69 @@ class SignUpView(CreateView):
         return redirect("catalog:home")
 
 
+@query_budget(8)
 @login_required
 def borrow_copy(request, copy_id):
-    copy = get_object_or_404(BookCopy, pk=copy_id)
-    if copy.status == BookCopy.BORROWED:
+    try:
+        services.borrow_copy(request.user, copy_id)
+    except services.CopyUnavailable:
+        # lost the race (or it was never free); only now is the copy read
+        book_id = BookCopy.objects.filter(pk=copy_id).values_list("book_id", flat=True).first()
+        if book_id is None:
+            raise Http404("No such copy.")
         messages.error(request, "This copy is already borrowed.")
-        return redirect(copy.book.get_absolute_url())
-    # Simple 14-day loan
-    Borrow.objects.create(user=request.user, copy=copy, due_date=date.today() + timedelta(days=14))
-    copy.status = BookCopy.BORROWED
-    copy.save(update_fields=["status"])
-    messages.success(request, "Borrowed successfully. Due in 14 days.")
+        return redirect("catalog:book_detail", pk=book_id)
+    messages.success(request, f"Borrowed successfully. Due in {services.LOAN_DAYS} days.")
     return redirect("catalog:profile")
 
 
+@query_budget(8)
+@login_required
+@require_POST
+def place_hold(request, book_id):
+    try:
+        hold = services.place_hold(request.user, book_id)
+    except services.CopyOnShelf:
+        if not Book.objects.filter(pk=book_id).exists():
+            raise Http404("No such book.")
+        messages.info(request, "A copy is available, no need to wait.")
+    except services.AlreadyOnHold:
+        messages.info(request, "You already have a hold on this book.")
+    else:
+        messages.success(request, f"Hold placed. You are #{hold.position} in the queue.")
+    return redirect("catalog:book_detail", pk=book_id)
+
+
+@query_budget(12)
+@login_required
+@require_POST
+def cancel_hold(request, hold_id):
+    try:
+        hold = services.cancel_hold(request.user, hold_id)
+    except services.HoldNotActive:
+        raise Http404("No active hold found.")
+    messages.success(request, "Hold cancelled.")
+    return redirect("catalog:book_detail", pk=hold.book_id)
+
+
+@query_budget(10)
 @login_required
 def return_copy(request, borrow_id):
-    br = get_object_or_404(Borrow, pk=borrow_id, user=request.user, returned_at__isnull=True)
-    br.returned_at = date.today()
-    br.save(update_fields=["returned_at"])
-    copy = br.copy
-    copy.status = BookCopy.AVAILABLE
-    copy.save(update_fields=["status"])
+    try:
+        services.return_copy(request.user, borrow_id)
+    except services.LoanNotOpen:
+        raise Http404("No open loan found.")
     messages.success(request, "Returned. Thank you!")
     return redirect("catalog:profile")
 
 
+@query_budget(5)
 @login_required
 def profile(request):
-    active_loans = Borrow.objects.select_related("copy__book").filter(user=request.user, returned_at__isnull=True)
-    history = Borrow.objects.select_related("copy__book").filter(user=request.user, returned_at__isnull=False)[:20]
+    active_loans, history = loans_of(request.user)
+    include_archive = request.GET.get("archive") == "1"
+    if include_archive:
+        history = archive.merge(list(history), list(archive.returns_of(request.user)), "-borrowed_at", archive.HISTORY)
 
 
     # Handle review submit from detail page
@@ -111,4 +287,13 @@ def profile(request):
             review.save()
             messages.success(request, "Review added.")
             return redirect("catalog:profile")
-    return render(request, "catalog/profile.html", {"active_loans": active_loans, "history": history})
\ No newline at end of file
+    return render(request, "catalog/profile.html", {
+        "active_loans": active_loans, "history": history, "include_archive": include_archive,
+    })
+
+
+def loans_of(user):
+    """The profile's open loans and last 20 returns (the hot table only,
+    see catalog.archive)."""
+    loans = Borrow.objects.select_related("copy__book").filter(user=user)
+    return loans.filter(returned_at__isnull=True), loans.filter(returned_at__isnull=False)[:archive.HISTORY]
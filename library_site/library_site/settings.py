@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 
 
@@ -45,6 +46,10 @@ INSTALLED_APPS = [
 "catalog",
 ]
 MIDDLEWARE = [
+    # outermost so it sees every query, session and auth included
+    "catalog.querybudget.QueryBudgetMiddleware",
+    # above sessions: a session save pins the browser to the primary
+    "catalog.routers.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -108,6 +113,52 @@ else:
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            "OPTIONS": {
+                # writers wait for the lock instead of failing under load
+                "transaction_mode": "IMMEDIATE",
+                "timeout": 20,
+            },
+            # file-backed so concurrency tests get real locking (UZ: test bazasi)
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
+        }
+    }
+
+# Optional read replica (catalog.routers): safe requests read from it,
+# writers are pinned to the primary for REPLICA_PIN_SECONDS. Locally,
+# SQLITE_REPLICA=db_replica.sqlite3 uses a copy of db.sqlite3 as the
+# "replica" (refresh it with cp to simulate replication catching up).
+if env("DB_NAME") and env("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": env("DB_REPLICA_HOST"),
+        "PORT": env("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    }
+elif not env("DB_NAME") and env("SQLITE_REPLICA"):
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / env("SQLITE_REPLICA"),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["catalog.routers.PrimaryReplicaRouter"]
+REPLICA_PIN_SECONDS = int(env("REPLICA_PIN_SECONDS", "10"))
+
+# Fragment/page cache (catalog.caching). Several workers must share one
+# cache or their invalidations miss each other: set REDIS_URL in production.
+if env("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": env("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "catalog",
+            "OPTIONS": {"MAX_ENTRIES": 5000},
         }
     }
 
@@ -152,6 +203,38 @@ MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
 
+# Serve the read pages from catalog.async_views (asgi.py turns this on)
+ASYNC_VIEWS = env("ASYNC_VIEWS") == "1"
+
+
+# Snapshot file of the autocomplete index (catalog.autocomplete), memory-
+# mapped by every worker; unset, each worker builds a private copy
+AUTOCOMPLETE_SNAPSHOT = env("AUTOCOMPLETE_SNAPSHOT")
+
+
+# Loans returned more than this many days ago move to the archive table
+# (catalog.archive, manage.py archive_borrows)
+BORROW_ARCHIVE_AFTER_DAYS = int(env("BORROW_ARCHIVE_AFTER_DAYS", "180"))
+
+
+# Query accounting (catalog.querybudget): QUERY_LOG=1 in the environment
+# writes one JSON line per request; strict mode raises on an exceeded
+# budget instead of logging a warning; on for every test (manage.py test).
+QUERY_LOG = env("QUERY_LOG") == "1"
+QUERY_BUDGET_STRICT = "test" in sys.argv[1:2]
+QUERY_BUDGETS = {}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "catalog.queries": {"handlers": ["console"], "level": "INFO", "propagate": False},
+        "catalog.archive": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
+
 LOGIN_REDIRECT_URL = "catalog:home"
 LOGOUT_REDIRECT_URL = "catalog:home"
 
@@ -1,3 +1,174 @@
-from django.contrib import admin
+# books/admin.py
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count
+from django.http import HttpResponseRedirect
+from django.utils.html import format_html
+from .models import Category, Author, Publisher, Book, IncomingBooks, BorrowRecord, ArchivedBorrowRecord
+from .receiving import ReceivingError, receive
+from .templatetags.books_extras import cover_img
 
-# Register your models here.
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ['name', 'book_count', 'created_at']
+    search_fields = ['name']
+
+    def get_queryset(self, request):
+        # har qator uchun alohida COUNT o'rniga bitta GROUP BY
+        return super().get_queryset(request).annotate(num_books=Count('book'))
+
+    def book_count(self, obj):
+        return obj.num_books
+
+    book_count.short_description = 'Kitoblar soni'
+
+
+@admin.register(Author)
+class AuthorAdmin(admin.ModelAdmin):
+    list_display = ['first_name', 'last_name']
+    search_fields = ['first_name', 'last_name']
+
+
+@admin.register(Publisher)
+class PublisherAdmin(admin.ModelAdmin):
+    list_display = ['name', 'country']
+    search_fields = ['name']
+
+
+@admin.register(Book)
+class BookAdmin(admin.ModelAdmin):
+    # category null bo'la oladi, admin uni o'zi JOIN qilmaydi
+    list_select_related = ['category']
+    list_display = ['title', 'get_authors', 'category', 'inventory_number',
+                    'available_copies', 'total_copies', 'status', 'shelf_location']
+    list_filter = ['category', 'status', 'language', 'publication_year']
+    search_fields = ['title', 'isbn', 'inventory_number', 'authors__first_name', 'authors__last_name']
+    filter_horizontal = ['authors']
+    readonly_fields = ['added_date', 'updated_date', 'cover_preview']
+
+    fieldsets = (
+        ('Asosiy ma\'lumotlar', {
+            'fields': ('title', 'authors', 'category', 'publisher')
+        }),
+        ('Qo\'shimcha ma\'lumotlar', {
+            'fields': ('isbn', 'publication_year', 'pages', 'language', 'description')
+        }),
+        ('Muqova', {
+            'fields': ('cover_image', 'cover_preview')
+        }),
+        ('Inventarizatsiya', {
+            'fields': ('inventory_number', 'shelf_location', 'total_copies',
+                       'available_copies', 'status')
+        }),
+        ('Tizim ma\'lumotlari', {
+            'fields': ('added_by', 'added_date', 'updated_date'),
+            'classes': ('collapse',)
+        }),
+    )
+
+    def get_queryset(self, request):
+        # get_authors_display har qatorda so'rov yubormasligi uchun
+        return super().get_queryset(request).prefetch_related('authors')
+
+    def get_authors(self, obj):
+        return obj.get_authors_display()
+
+    get_authors.short_description = 'Mualliflar'
+
+    def cover_preview(self, obj):
+        if obj.cover_image:
+            return cover_img(obj, sizes='150px', style='width: 150px')
+        return "Rasm yo'q"
+
+    cover_preview.short_description = 'Muqova'
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.added_by = request.user
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(IncomingBooks)
+class IncomingBooksAdmin(admin.ModelAdmin):
+    list_select_related = ['category']
+    list_display = ['title', 'category', 'quantity', 'expected_date',
+                    'is_arrived', 'status_badge']
+    list_filter = ['is_arrived', 'category', 'expected_date']
+    search_fields = ['title', 'supplier', 'isbn']
+    date_hierarchy = 'expected_date'
+    raw_id_fields = ['book']
+    # kelganini faqat qabul qilish amali belgilaydi (books.receiving)
+    readonly_fields = ['is_arrived', 'arrived_date']
+    actions = ['receive_shipments']
+
+    def changelist_view(self, request, extra_context=None):
+        # qabul qilish ro'yxat sahifasi (filtrlar, sanoqlar) qurilmasdan, o'z
+        # so'rovlar budjetida; "hammasini tanlash" odatdagi yo'l bilan
+        selected = request.POST.getlist(helpers.ACTION_CHECKBOX_NAME)
+        if (
+            request.method == 'POST' and request.POST.get('action') == 'receive_shipments'
+            and selected and request.POST.get('select_across') != '1'
+        ):
+            if not self.has_change_permission(request):
+                raise PermissionDenied
+            self.receive_shipments(request, self.get_queryset(request).filter(pk__in=selected))
+            return HttpResponseRedirect(request.get_full_path())
+        return super().changelist_view(request, extra_context)
+
+    @admin.action(description="Tanlangan yuklarni fondga qabul qilish")
+    def receive_shipments(self, request, queryset):
+        try:
+            created, refilled, copies = receive(queryset, user=request.user)
+        except ReceivingError as e:
+            self.message_user(request, str(e), messages.ERROR)
+            return
+        self.message_user(
+            request, f"{copies} nusxa qabul qilindi: {created} ta yangi kitob, {refilled} ta kitob to'ldirildi",
+            messages.SUCCESS,
+        )
+
+    def status_badge(self, obj):
+        if obj.is_arrived:
+            return format_html('<span style="color: green;">✓ Keldi</span>')
+        elif obj.is_overdue():
+            return format_html('<span style="color: red;">⚠ Kechikdi</span>')
+        else:
+            return format_html('<span style="color: orange;">⏳ Kutilmoqda</span>')
+
+    status_badge.short_description = 'Holat'
+
+
+@admin.register(BorrowRecord)
+class BorrowRecordAdmin(admin.ModelAdmin):
+    list_display = ['book', 'borrower_name', 'borrower_phone', 'borrow_date',
+                    'due_date', 'is_returned', 'status_badge', 'fine_amount']
+    list_filter = ['is_returned', 'borrow_date']
+    search_fields = ['book__title', 'borrower_name', 'borrower_phone']
+    date_hierarchy = 'borrow_date'
+
+    def status_badge(self, obj):
+        if obj.is_returned:
+            return format_html('<span style="color: green;">✓ Qaytarildi</span>')
+        elif obj.is_overdue():
+            return format_html('<span style="color: red;">⚠ Muddati o\'tgan</span>')
+        else:
+            return format_html('<span style="color: blue;">📖 O\'qilmoqda</span>')
+
+    status_badge.short_description = 'Holat'
+
+
+@admin.register(ArchivedBorrowRecord)
+class ArchivedBorrowRecordAdmin(admin.ModelAdmin):
+    """Arxiv faqat o'qish uchun (books.archive to'ldiradi)"""
+    list_display = ['book', 'borrower_name', 'borrower_phone', 'borrow_date', 'return_date', 'archived_at']
+    search_fields = ['borrower_name', 'borrower_phone']
+    date_hierarchy = 'return_date'
+    list_select_related = ['book']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
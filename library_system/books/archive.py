@@ -0,0 +1,106 @@
+# books/archive.py
+"""Issiq/sovuq bo'linish: eski yopilgan olish yozuvlari arxivga.
+
+``BorrowRecord`` faqat ochiq va yaqinda qaytarilgan yozuvlarni saqlaydi
+(sahifalar, sweep_overdue, statistika shu kichik jadvalni o'qiydi).
+``BORROW_ARCHIVE_AFTER_DAYS`` kundan oldin qaytarilganlari
+``ArchivedBorrowRecord`` ga o'sha id bilan ko'chiriladi.
+
+Arxiv o'sha bazadagi jadval: har partiya bitta tranzaksiyada nusxalanib
+o'chiriladi, shuning uchun buyruq to'xtatilsa ham yozuv yo'qolmaydi yoki
+ikki marta tushmaydi va qayta ishga tushirilganda qolgan joydan davom etadi.
+
+Tarix sahifalari ``?archive=1`` bilan ikkala jadvalni birga o'qiydi
+(``recent``); tavsiyalar (books.recommendations) ham ikkalasidan, butun
+tarix bo'yicha hisoblanadi.
+"""
+import heapq
+import logging
+import time
+from datetime import timedelta
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedBorrowRecord, BorrowRecord
+
+
+logger = logging.getLogger(__name__)
+
+# ko'chiriladigan ustunlar (id bilan); ikkala model bir xil BorrowFields dan
+FIELDS = [field.attname for field in BorrowRecord._meta.concrete_fields]
+
+
+def cutoff(days=None):
+    """Shu sanadan oldin qaytarilganlar arxivlanadi"""
+    if days is None:
+        days = settings.BORROW_ARCHIVE_AFTER_DAYS
+    return timezone.localdate() - timedelta(days=days)
+
+
+def archivable(before):
+    # books_borrow_returned_idx (qisman, faqat qaytarilganlar) bo'yicha
+    return BorrowRecord.objects.filter(is_returned=True, return_date__lt=before)
+
+
+def archive_batch(before, batch_size=1000):
+    """Eng eski ``batch_size`` ta yozuvni ko'chiradi; ko'chirilganlar soni"""
+    with transaction.atomic():
+        # faqat return_date bo'yicha: pk qo'shilsa indeks tartibi yetmaydi va har
+        # partiyada hamma arxivlanadiganlar saralanadi
+        rows = list(archivable(before).order_by('return_date').values(*FIELDS)[:batch_size])
+        if not rows:
+            return 0
+        now = timezone.now()
+        ArchivedBorrowRecord.objects.bulk_create(
+            [ArchivedBorrowRecord(archived_at=now, **row) for row in rows], batch_size=batch_size
+        )
+        # eslatmalar (Notification) ham o'chadi: yopilgan yozuvga kerak emas
+        BorrowRecord.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def run(before, batch_size=1000, sleep=0, max_batches=None):
+    """Partiyalab ko'chiradi; ``sleep`` — partiyalar orasidagi tanaffus (s)"""
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        n = archive_batch(before, batch_size)
+        if not n:
+            break
+        moved += n
+        batches += 1
+        logger.info("%d ta yozuv arxivlandi (jami %d)", n, moved)
+        if sleep:
+            time.sleep(sleep)
+    return moved
+
+
+def stats(before=None):
+    """Issiq jadval hajmi: jami, ochiq, arxivlanishi kerak bo'lganlar va arxiv"""
+    if before is None:
+        before = cutoff()
+    sizes = {
+        'hot': BorrowRecord.objects.count(),
+        'open': BorrowRecord.objects.filter(is_returned=False).count(),
+        'archivable': archivable(before).count(),
+        'archived': ArchivedBorrowRecord.objects.count(),
+    }
+    logger.info(
+        "olish yozuvlari: issiq %(hot)d (ochiq %(open)d, arxivlanadigan %(archivable)d), arxiv %(archived)d",
+        sizes,
+    )
+    return sizes
+
+
+def recent(filters, order, limit, include_archive=False):
+    """``filters`` bo'yicha ``order`` tartibida birinchi ``limit`` ta yozuv;
+    ``include_archive`` bo'lsa arxiv bilan birga (ikkala jadvaldan ``limit``
+    tadan olib, birlashtiriladi)"""
+    hot = list(BorrowRecord.objects.filter(**filters).select_related('book').order_by(order)[:limit])
+    if include_archive:
+        cold = ArchivedBorrowRecord.objects.filter(**filters).select_related('book').order_by(order)[:limit]
+        key = attrgetter(order.lstrip('-'))
+        hot = list(heapq.merge(hot, list(cold), key=key, reverse=order.startswith('-')))[:limit]
+    return hot
@@ -0,0 +1,87 @@
+# books/benchmarking.py
+"""Benchmark va sintetik ma'lumot buyruqlari uchun umumiy yordamchilar"""
+import logging
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+
+
+SYLLABLES = 'ba ki lo mu na ro si ta yu zo qa sh ch ng dar ur ol bek xon oy gul'.split()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def vocabulary(rnd, size=5000):
+    """Soxta so'zlar va Zipf og'irliklari: bir nechtasi juda ko'p, qolgani kam uchraydi"""
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rnd.choices(SYLLABLES, k=rnd.randint(2, 4))))
+    words = sorted(words)
+    rnd.shuffle(words)
+    return words, [1 / rank for rank in range(1, size + 1)]
+
+
+def summarize(latencies_ms, queries, statuses, elapsed):
+    return {
+        'requests': len(latencies_ms),
+        'throughput_rps': round(len(latencies_ms) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies_ms, 50), 2),
+        'p95_ms': round(percentile(latencies_ms, 95), 2),
+        'p99_ms': round(percentile(latencies_ms, 99), 2),
+        'mean_ms': round(statistics.fmean(latencies_ms), 2),
+        'queries_mean': round(statistics.fmean(queries), 1),
+        'queries_max': max(queries),
+        'statuses': {str(code): statuses.count(code) for code in sorted(set(statuses))},
+    }
+
+
+@contextmanager
+def rolled_back():
+    """Benchmark doim bekor qilinadigan tranzaksiyada ishlaydi (ma'lumot o'zgarmaydi)"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def run_targets(client, targets, requests=50, warmup=3):
+    """Har bir ``(nom, yo'l)`` ga ``requests`` marta GET yuborib natijani jamlash"""
+    results = {}
+    # kutilgan 404/403 lar har so'rovda logga yozilmasin
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    for name, path in targets:
+        for _ in range(warmup):
+            client.get(path)
+        latencies, queries, statuses = [], [], []
+        started = time.perf_counter()
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                response = client.get(path)
+                latencies.append((time.perf_counter() - t0) * 1000)
+            queries.append(len(ctx))
+            statuses.append(response.status_code)
+            reset_queries()
+        results[name] = {'path': path, **summarize(latencies, queries, statuses, time.perf_counter() - started)}
+    return results
+
+
+def compare(current, baseline):
+    """Oldingi natija bilan asosiy ko'rsatkichlarni solishtirish"""
+    rows = []
+    for name, now in current.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        rows.append({
+            'target': name,
+            'p95_ms': (before['p95_ms'], now['p95_ms']),
+            'throughput_rps': (before['throughput_rps'], now['throughput_rps']),
+            'queries_mean': (before['queries_mean'], now['queries_mean']),
+        })
+    return rows
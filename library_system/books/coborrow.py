@@ -0,0 +1,140 @@
+# books/coborrow.py
+""""Bu kitobni olganlar yana olgan": birga olishlar matritsasi va top-K ro'yxatlar.
+
+``books.recommendations`` olish tarixini o'qiydi va ro'yxatlarni saqlaydi,
+bu modulda faqat hisob. (library_site ning catalog ilovasida o'z nusxasi
+bor: catalog/coborrow.py.)
+
+O'quvchilar × kitoblar matritsasi X dan C = Xᵀ·X: C[a, b] ikkala kitobni
+olgan o'quvchilar soni. Tavsiyalar kosinus o'xshashligi bo'yicha,
+C[a, b] / √(n_a·n_b) (n: kitobni olgan o'quvchilar soni), shunda hamma
+oladigan kitoblar har ro'yxatni egallab olmaydi. C siyrak (CSR) matritsalar
+ko'paytmasi (NumPy, SciPy); testlar uni oddiy Python hisobi bilan
+solishtiradi.
+"""
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+
+# har kitobga saqlanadigan qo'shnilar
+TOP_K = 12
+# bitta umumiy o'quvchi tasodif bo'lishi mumkin
+MIN_TOGETHER = 2
+# o'quvchining faqat oxirgi olishlari hisobga olinadi: minglab olishli
+# xodim yoki sinf hisobi C ni zich qilib qo'ymasin
+MAX_BASKET = 500
+CHUNK = 500
+
+
+def baskets(rows):
+    """Har o'quvchining kitoblari (takrorsiz, eng yangisi birinchi);
+    ``(o'quvchi, kitob)`` qatorlari har o'quvchi uchun yangisidan eskisiga
+    keladi (o'quvchilar aralashishi mumkin, masalan jadval ketidan jadval)"""
+    result = {}
+    for reader, book_id in rows:
+        basket = result.setdefault(reader, {})
+        if len(basket) < MAX_BASKET:
+            basket[book_id] = None
+    return [list(basket) for basket in result.values()]
+
+
+def chunks(ids):
+    ids = list(ids)
+    for i in range(0, len(ids), CHUNK):
+        yield ids[i:i + CHUNK]
+
+
+def neighbors(baskets, reader_counts=None, book_ids=None, k=TOP_K):
+    """``{kitob: [(qo'shni, baho, birga olganlar), ...]}``, eng yaxshisi
+    birinchi, har kitobga ko'pi bilan ``k`` ta (``k=None``: ``MIN_TOGETHER``
+    dan kam bo'lmagan hamma juftliklar).
+
+    ``book_ids`` siz C ning hamma qatorlari, o'quvchilar soni savatlardan.
+    ``book_ids`` bilan faqat shu qatorlar: savatlar faqat ularni olgan
+    o'quvchilarniki, shuning uchun qo'shnilar o'quvchilarini
+    ``reader_counts(ids)`` boshqa joydan (bazadan) sanaydi.
+    """
+    if not baskets:
+        return {}
+    if book_ids is None:
+        n = Counter(b for basket in baskets for b in basket)
+
+        def reader_counts(ids):
+            return n
+    else:
+        book_ids = set(book_ids)
+    return neighbors_sparse(baskets, reader_counts, book_ids, k)
+
+
+def neighbors_sparse(baskets, reader_counts, book_ids, k=TOP_K):
+    columns = np.array(sorted({b for basket in baskets for b in basket}), dtype=np.int64)
+    position = {book_id: i for i, book_id in enumerate(columns.tolist())}
+    indptr = np.cumsum([0] + [len(basket) for basket in baskets], dtype=np.int64)
+    indices = np.fromiter((position[b] for basket in baskets for b in basket), dtype=np.int64, count=indptr[-1])
+    x = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.float32), indices, indptr), shape=(len(baskets), len(columns))
+    )
+    targets = columns if book_ids is None else np.array(sorted(book_ids & position.keys()), dtype=np.int64)
+    xt = x.T.tocsr()
+    if book_ids is not None:
+        xt = xt[[position[b] for b in targets.tolist()]]
+    together = (xt @ x).tocsr()
+    own = np.array([position[b] for b in targets.tolist()], dtype=np.int64)
+    row_of = np.repeat(np.arange(together.shape[0]), np.diff(together.indptr))
+    keep = (together.data >= MIN_TOGETHER) & (together.indices != own[row_of])
+    row_of, cols, counts = row_of[keep], together.indices[keep], together.data[keep]
+    needed = np.union1d(own[np.unique(row_of)], cols)
+    n = reader_counts(columns[needed].tolist())
+    readers = np.zeros(len(columns))
+    readers[needed] = [n[b] for b in columns[needed].tolist()]
+    scores = counts / np.sqrt(readers[own[row_of]] * readers[cols])
+
+    # qator ichida: avval eng yuqori baho, teng bo'lsa id; har qatordan birinchi k tasi
+    order = np.lexsort((columns[cols], -scores, row_of))
+    row_of, cols, counts, scores = row_of[order], cols[order], counts[order], scores[order]
+    rank = np.arange(len(row_of)) - np.searchsorted(row_of, row_of)
+    best = rank < (len(rank) if k is None else k)
+    result = {}
+    for r, c, score, together_count in zip(
+        targets[row_of[best]].tolist(), columns[cols[best]].tolist(), scores[best].tolist(), counts[best].tolist()
+    ):
+        result.setdefault(r, []).append((c, score, int(together_count)))
+    return result
+
+
+def merge(neighbors, borrowed, stored):
+    """Qisman hisob (joyida): ``neighbors`` da ``borrowed`` kitoblarning
+    qayta hisoblangan qatorlari to'liq (``k=None``); ular ``TOP_K`` gacha
+    qisqartiriladi, baho simmetrik bo'lgani uchun esa ulardagi har (b, baho)
+    qo'shnining saqlangan ro'yxatida b ning eski bahosi o'rniga yoziladi.
+    ``stored(chunk)`` bu ro'yxatlarni ``(kitob, qo'shni, baho, birga)``
+    qatorlari sifatida o'qiydi; ulardan faqat o'zgarganlari qo'shiladi.
+    Saqlangan ro'yxatdan sal tashqarida qolgan juftlik bu yerda ma'lum emas:
+    bunday ro'yxat keyingi to'liq hisobgacha undan farq qilishi mumkin.
+    """
+    for book_id in borrowed:
+        neighbors.setdefault(book_id, [])
+    incoming = {}
+    for book_id in borrowed:
+        for other, score, together in neighbors[book_id]:
+            if other not in borrowed:
+                incoming.setdefault(other, {})[book_id] = (score, together)
+        neighbors[book_id] = neighbors[book_id][:TOP_K]
+    for chunk in chunks(incoming):
+        merged = {book_id: {} for book_id in chunk}
+        for book_id, other, score, together in stored(chunk):
+            merged[book_id][other] = (score, together)
+        for book_id in chunk:
+            before = _best(merged[book_id])
+            merged[book_id].update(incoming[book_id])
+            best = _best(merged[book_id])
+            if best != before:
+                neighbors[book_id] = best
+    return neighbors
+
+
+def _best(row):
+    ranked = sorted(row.items(), key=lambda item: (-item[1][0], item[0]))[:TOP_K]
+    return [(other, score, together) for other, (score, together) in ranked]
@@ -0,0 +1,37 @@
+# books/management/commands/archive_borrows.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from books import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Har kecha: BORROW_ARCHIVE_AFTER_DAYS kundan oldin qaytarilgan olish yozuvlarini "
+        "partiyalab arxiv jadvaliga ko'chirish; to'xtatilsa qolgan joydan davom etadi"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--days', type=int, help="Standart: settings.BORROW_ARCHIVE_AFTER_DAYS")
+        parser.add_argument('--sleep', type=float, default=0, help="Partiyalar orasidagi tanaffus (s)")
+        parser.add_argument('--max-batches', type=int, help="Shuncha partiyadan keyin to'xtash")
+        parser.add_argument('--dry-run', action='store_true', help="Faqat jadval hajmlari, hech narsa ko'chirilmaydi")
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+        days = settings.BORROW_ARCHIVE_AFTER_DAYS if opts['days'] is None else opts['days']
+        before = archive.cutoff(days)
+        sizes = archive.stats(before)
+        self.stdout.write(
+            f"Issiq jadval: {sizes['hot']} ta yozuv ({sizes['open']} tasi ochiq), "
+            f"{before:%d.%m.%Y} dan oldin qaytarilgan: {sizes['archivable']} ta; arxivda: {sizes['archived']} ta"
+        )
+        if opts['dry_run']:
+            return
+        moved = archive.run(before, opts['batch_size'], opts['sleep'], opts['max_batches'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{moved} ta yozuv arxivga ko'chirildi, {time.perf_counter() - started:.1f}s"
+        ))
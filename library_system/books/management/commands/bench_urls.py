@@ -0,0 +1,96 @@
+# books/management/commands/bench_urls.py
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from books.benchmarking import compare, rolled_back, run_targets
+from books.models import Author, Book, BorrowRecord, Category
+from books.urls import urlpatterns
+
+
+# GET so'rovi ma'lumotni o'zgartiradi (baribir bekor qilinadi)
+UNSAFE = {'return_book'}
+
+
+class Command(BaseCommand):
+    help = (
+        "books/urls.py dagi har bir URL ni test client bilan o'lchash: so'rov/s, "
+        "p50/p95/p99 kechikish va SQL so'rovlar soni (JSON). Avval generate_dataset ishlating"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help="Har URL uchun o'lchanadigan so'rovlar")
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--only', nargs='+', metavar='NAME', help='Faqat shu URL nomlari')
+        parser.add_argument('--include-unsafe', action='store_true', help='return_book ni ham o\'lchash')
+        parser.add_argument('--output', help='JSON ni faylga ham yozish')
+        parser.add_argument('--compare', metavar='BASELINE', help='Oldingi natija (JSON) bilan solishtirish')
+
+    def handle(self, *args, **opts):
+        if not Book.objects.exists():
+            raise CommandError("Kitoblar yo'q, avval generate_dataset ishlating")
+        # xato beradigan view butun o'lchovni to'xtatmasin, 500 sifatida yoziladi;
+        # host ALLOWED_HOSTS dan o'tmasa har bir URL 400 qaytaradi
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+        client = Client(HTTP_HOST=host, raise_request_exception=False)
+        with rolled_back():
+            client.force_login(User.objects.create_user('bench-runner'))
+            targets = self._targets(opts)
+            results = run_targets(client, targets, opts['requests'], opts['warmup'])
+
+        report = json.dumps(results, indent=2)
+        self.stdout.write(report)
+        if opts['output']:
+            with open(opts['output'], 'w') as fh:
+                fh.write(report + '\n')
+        if opts['compare']:
+            with open(opts['compare']) as fh:
+                for row in compare(results, json.load(fh)):
+                    self.stdout.write(
+                        '{target:<28} p95 {p95_ms[0]:>8} -> {p95_ms[1]:<8} ms  '
+                        'rps {throughput_rps[0]:>7} -> {throughput_rps[1]:<7}  '
+                        'queries {queries_mean[0]:>5} -> {queries_mean[1]}'.format(**row)
+                    )
+
+    def _samples(self):
+        """URL parametrlari uchun namunalar: eng ko'p nusxali kitob, eng katta
+        kategoriya, eng ko'p kitobli muallif va ochiq olish yozuvi"""
+        book = Book.objects.order_by('-total_copies', 'id').first()
+        category = Category.objects.annotate(n=Count('book')).order_by('-n').first()
+        author = Author.objects.annotate(n=Count('book')).order_by('-n').first()
+        record = BorrowRecord.objects.filter(is_returned=False).values_list('pk', flat=True).first()
+        word = book.title.split()[0]
+        return {
+            'book_detail': book.pk,
+            'borrow_book': book.pk,
+            'category_detail': category and category.pk,
+            'author_detail': author and author.pk,
+            'return_book': record,
+        }, word
+
+    def _targets(self, opts):
+        samples, word = self._samples()
+        targets = []
+        for pattern in urlpatterns:
+            name = pattern.name
+            if name in UNSAFE and not opts['include_unsafe']:
+                continue
+            params = {key: samples.get(name) for key in pattern.pattern.converters}
+            if None in params.values():
+                self.stderr.write(f"{name} o'tkazib yuborildi: namuna yo'q")
+                continue
+            targets.append((name, reverse(name, kwargs=params)))
+            if name == 'book_list':
+                # ro'yxatning boshqa yo'llari: qidiruv va saralash
+                targets += [
+                    ('book_list?search', f'{targets[-1][1]}?search={word}'),
+                    ('book_list?sort=title', f'{targets[-1][1]}?sort=title'),
+                ]
+        if opts['only']:
+            targets = [t for t in targets if t[0] in opts['only']]
+        return targets
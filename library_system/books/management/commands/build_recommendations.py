@@ -0,0 +1,36 @@
+# books/management/commands/build_recommendations.py
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from books import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "\"Bu kitobni olganlar yana olgan\" tavsiyalarini (BookNeighbor) olish tarixidan qurish: "
+        "to'liq (haftada bir) yoki --days bilan faqat yangi olishlar bo'yicha (har kecha)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, help="Faqat oxirgi N kunda olingan kitoblar va ularning qo'shnilarini yangilash"
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+        if opts['days']:
+            since = timezone.now() - timedelta(days=opts['days'])
+            books, rows = recommendations.refresh(since, batch_size=opts['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{books} ta kitob tavsiyalari yangilandi ({rows} ta qator), "
+                f"{time.perf_counter() - started:.1f}s"
+            ))
+            return
+        rows = recommendations.rebuild(batch_size=opts['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{rows} ta tavsiya qayta hisoblandi, {time.perf_counter() - started:.1f}s"
+        ))
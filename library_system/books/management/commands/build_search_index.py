@@ -0,0 +1,42 @@
+# books/management/commands/build_search_index.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from books import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Qidiruv indeksini (SEARCH_INDEX_PATH) qurish; jarayonlar uni o'qiydi va fayl "
+        "yangilanganini sezib qayta yuklaydi. Hajmi va qidiruv vaqtini ko'rsatadi"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Indeks fayli (standart: settings.SEARCH_INDEX_PATH)")
+        parser.add_argument(
+            '--probe', nargs='*', default=['tarix', 'taarix', 'navoiy', "o'tkan kunlar"],
+            help="Qurilgandan keyin vaqti o'lchanadigan so'rovlar",
+        )
+
+    def handle(self, *args, **opts):
+        path = opts['output'] or settings.SEARCH_INDEX_PATH
+        if not path:
+            raise CommandError("SEARCH_INDEX_PATH sozlamasi yoki --output kerak")
+        started = time.perf_counter()
+        size = search.write_index(path)
+        with open(path, 'rb') as fh:
+            index = search.LocalIndex.from_bytes(fh.read())
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(index.words)} ta so'z, {len(index.postings)} ta bog'lanish: {size / 2**20:.1f} MiB, "
+            f"{time.perf_counter() - started:.1f}s"
+        ))
+        for query in opts['probe']:
+            words = search.normalize(query)[:search.MAX_QUERY_WORDS]
+            runs = 20
+            t0 = time.perf_counter()
+            for _ in range(runs):
+                results = index.search(words, search.SEARCH_LIMIT) if words else []
+            ms = (time.perf_counter() - t0) * 1000 / runs
+            self.stdout.write(f"  {query!r}: {len(results)} ta natija, {ms:.1f} ms")
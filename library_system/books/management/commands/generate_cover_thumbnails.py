@@ -0,0 +1,48 @@
+# books/management/commands/generate_cover_thumbnails.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from books import thumbnails
+from books.models import Book
+
+
+class Command(BaseCommand):
+    help = "Muqovasi bor, lekin kichik nusxalari yo'q kitoblar uchun WebP/JPEG nusxalar yaratish"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Jarayonlar soni (standart: CPU soni)')
+        parser.add_argument('--force', action='store_true', help='Hammasini qaytadan yaratish')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **opts):
+        books = Book.objects.exclude(cover_image='').exclude(cover_image__isnull=True)
+        if not opts['force']:
+            books = books.filter(cover_hash='')
+        pending = dict(books.values_list('cover_image', 'pk'))
+        self.stdout.write(f'{len(pending)} ta muqova navbatda')
+        if not pending:
+            return
+
+        # fork qilingan jarayonlar bu ulanishni bo'lishmasligi kerak
+        close_old_connections()
+        started, done, failed, batch = time.perf_counter(), 0, 0, []
+        for name, digest, error in thumbnails.render_many(pending, opts['workers'], opts['force']):
+            if error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+                continue
+            batch.append(Book(pk=pending[name], cover_hash=digest))
+            if len(batch) >= opts['batch_size']:
+                done += self._flush(batch)
+        done += self._flush(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'{done} ta muqova tayyor, {failed} ta xato, {time.perf_counter() - started:.1f}s'
+        ))
+
+    def _flush(self, batch):
+        n = len(batch)
+        Book.objects.bulk_update(batch, ['cover_hash'])
+        batch.clear()
+        return n
@@ -0,0 +1,166 @@
+# books/management/commands/generate_dataset.py
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from books import stats
+from books.benchmarking import vocabulary
+from books.models import Author, Book, BorrowRecord, Category, IncomingBooks, Publisher
+
+
+@contextmanager
+def historic_timestamps(*fields):
+    """bulk_create ``auto_now_add`` maydonlariga o'tgan sanalarni yozishi uchun"""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = "Benchmark uchun tasodifiy (seed bo'yicha qaytariladigan) kitoblar, mualliflar va olish tarixi yaratish"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=10_000)
+        parser.add_argument('--borrows', type=int, help='Standart: har kitobga 10 ta')
+        parser.add_argument('--authors', type=int, help="Standart: har 20 kitobga bitta (kamida 50)")
+        parser.add_argument('--categories', type=int, default=40)
+        parser.add_argument('--publishers', type=int, default=100)
+        parser.add_argument('--incoming', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        total = opts['books']
+        if total < 1:
+            raise CommandError('Kamida bitta kitob kerak')
+        self.batch_size = opts['batch_size']
+        self.rnd = random.Random(opts['seed'])
+        self.words, weights = vocabulary(self.rnd)
+        self.cum_weights = list(accumulate(weights))
+        self.now = timezone.now()
+        self.started = time.perf_counter()
+
+        categories = self._simple(Category, opts['categories'])
+        publishers = self._simple(Publisher, opts['publishers'])
+        authors = [
+            a.pk for a in Author.objects.bulk_create(
+                Author(first_name=self.rnd.choice(self.words).title(), last_name=self.rnd.choice(self.words).title())
+                for _ in range(opts['authors'] or max(50, total // 20))
+            )
+        ]
+        on_loan, book_ids = self._books(total, authors, categories, publishers)
+        borrows = opts['borrows'] if opts['borrows'] is not None else total * 10
+        self._borrows(max(borrows, len(on_loan)), on_loan, book_ids)
+        IncomingBooks.objects.bulk_create(
+            IncomingBooks(
+                title=self._phrase(2, 5).capitalize(),
+                category_id=self.rnd.choice(categories),
+                quantity=self.rnd.randint(1, 50),
+                expected_date=(self.now + timedelta(days=self.rnd.randint(-30, 90))).date(),
+                supplier=self._phrase(1, 2).title(),
+            )
+            for _ in range(opts['incoming'])
+        )
+        # bulk_create signal yubormaydi
+        stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Tayyor: {time.perf_counter() - self.started:.0f} soniya'))
+
+    def _phrase(self, low, high):
+        return ' '.join(self.rnd.choices(self.words, cum_weights=self.cum_weights, k=self.rnd.randint(low, high)))
+
+    def _popular(self, ids):
+        """Kichik indekslar ancha ko'p tanlanadi (mashhur kitoblar)"""
+        return ids[int(len(ids) * self.rnd.random() ** 3)]
+
+    def _batches(self, total):
+        done = 0
+        while done < total:
+            n = min(self.batch_size, total - done)
+            yield n
+            done += n
+
+    def _progress(self, label, done, total):
+        rate = done / max(time.perf_counter() - self.started, 1e-6)
+        self.stdout.write(f'{label}: {done}/{total} ({rate:.0f} qator/s)')
+
+    def _simple(self, model, count):
+        return [obj.pk for obj in model.objects.bulk_create(
+            model(name=self._phrase(1, 2).title()[:100]) for _ in range(count)
+        )]
+
+    def _books(self, total, authors, categories, publishers):
+        # takroriy ishga tushirishda ham inventar raqami/ISBN noyob bo'lsin
+        offset = (Book.objects.aggregate(m=Max('pk'))['m'] or 0) + 1
+        Through = Book.authors.through
+        on_loan, book_ids, made = [], [], 0
+        with historic_timestamps(Book._meta.get_field('added_date')):
+            for n in self._batches(total):
+                rows = []
+                for i in range(made, made + n):
+                    copies = 1 + int(6 * self.rnd.random() ** 2)
+                    borrowed = sum(self.rnd.random() < 0.1 for _ in range(copies))
+                    rows.append(Book(
+                        title=self._phrase(2, 5).capitalize()[:300],
+                        category_id=self.rnd.choice(categories),
+                        publisher_id=self.rnd.choice(publishers),
+                        isbn=f'{978_000_000_0000 + offset + i}',
+                        publication_year=self.rnd.randint(1900, 2025),
+                        pages=self.rnd.randint(40, 900),
+                        description=self._phrase(20, 60),
+                        inventory_number=f'INV-{offset + i:08}',
+                        shelf_location=f'{self.rnd.choice("ABCDEFGH")}-{self.rnd.randint(1, 40)}',
+                        total_copies=copies,
+                        available_copies=copies - borrowed,
+                        status='available' if borrowed < copies else 'borrowed',
+                        added_date=self.now - timedelta(days=self.rnd.uniform(0, 5 * 365)),
+                    ))
+                    on_loan.append(borrowed)
+                with transaction.atomic():
+                    books = Book.objects.bulk_create(rows)
+                    Through.objects.bulk_create([
+                        Through(book_id=b.pk, author_id=a)
+                        for b in books
+                        for a in {self._popular(authors) for _ in range(1 + (self.rnd.random() < 0.2))}
+                    ])
+                book_ids += [b.pk for b in books]
+                made += n
+                self._progress('kitoblar', made, total)
+        # har bir band nusxa uchun bitta ochiq yozuv
+        return [pk for pk, k in zip(book_ids, on_loan) for _ in range(k)], book_ids
+
+    def _borrows(self, total, on_loan, book_ids):
+        made = 0
+        for n in self._batches(total):
+            rows = []
+            for _ in range(n):
+                if made < len(on_loan):
+                    borrow_date = self.now - timedelta(days=self.rnd.uniform(0, 30))
+                    book_id, return_date = on_loan[made], None
+                else:
+                    borrow_date = self.now - timedelta(days=self.rnd.uniform(0, 3 * 365))
+                    book_id = self._popular(book_ids)
+                    return_date = min(self.now, borrow_date + timedelta(days=self.rnd.randint(1, 30))).date()
+                rows.append(BorrowRecord(
+                    book_id=book_id,
+                    borrower_name=self._phrase(2, 2).title(),
+                    borrower_phone=f'+998{self.rnd.randrange(10**8, 10**9)}',
+                    borrower_id=f'AA{self.rnd.randrange(10**6, 10**7)}',
+                    borrow_date=borrow_date,
+                    due_date=(borrow_date + timedelta(days=14)).date(),
+                    return_date=return_date,
+                    is_returned=return_date is not None,
+                ))
+                made += 1
+            BorrowRecord.objects.bulk_create(rows)
+            self._progress('olish tarixi', made, total)
@@ -0,0 +1,40 @@
+# books/management/commands/rebuild_statistics.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from books import stats
+from books.models import StatCounter
+
+
+class Command(BaseCommand):
+    help = (
+        "Statistika sanoqlarini (StatCounter) bazadan qaytadan hisoblash: bulk_create/update() "
+        "ishlatilgandan keyin yoki sanoqlar mos kelmay qolganda"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true', help="Faqat mos kelmagan qatorlarni ko'rsatish, hech narsa yozilmaydi"
+        )
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+        if not opts['dry_run']:
+            n = stats.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f"{n} ta qator qayta hisoblandi, {time.perf_counter() - started:.1f}s"
+            ))
+            return
+
+        fresh = {(row.kind, row.key): row.value for row in stats.compute()}
+        # 30 kundan eski "qo'shilgan kun" qatorlari sahifada o'qilmaydi
+        rows = StatCounter.objects.exclude(kind=StatCounter.ADDED, key__lt=stats.recent_start().isoformat())
+        stored = {(kind, key): value for kind, key, value in rows.values_list('kind', 'key', 'value')}
+        drift = 0
+        for kind, key in sorted(fresh.keys() | stored.keys()):
+            have, want = stored.get((kind, key), 0), fresh.get((kind, key), 0)
+            if have != want:
+                drift += 1
+                self.stdout.write(f"{kind}:{key or '-'}  {have} -> {want}")
+        self.stdout.write(f"{drift} ta qator mos kelmaydi")
@@ -0,0 +1,105 @@
+# books/management/commands/sweep_overdue.py
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from books.models import BorrowRecord, Notification
+from books.notifications import deliver_pending, get_backend
+
+
+# eslatma: muddatdan bir kun oldin, keyin 1-, 8-, 15-... kechikkan kunlari
+DUE_SOON_DAYS = 1
+REMIND_EVERY_DAYS = 7
+
+
+class Command(BaseCommand):
+    help = (
+        "Har kecha: qaytarilmagan kitoblarning kechikkan kunlari va jarimasini yangilash, "
+        "oluvchilarga eslatmalarni navbatga qo'yib yuborish"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true', help="Faqat hisobot, hech narsa yozilmaydi")
+        parser.add_argument('--date', type=date.fromisoformat, help="Bugun o'rniga shu sana (YYYY-MM-DD)")
+        parser.add_argument('--no-deliver', action='store_true', help="Eslatmalarni faqat navbatga yozish")
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+        self.today = opts['date'] or timezone.localdate()
+        self.batch_size = opts['batch_size']
+        self.dry_run = opts['dry_run']
+        self.rate = settings.OVERDUE_FINE_PER_DAY
+        open_records = BorrowRecord.objects.filter(is_returned=False)
+
+        # Qatorlar emas, muddat sanalari bo'yicha yuramiz: ular ko'pi bilan
+        # bir necha yuzta, har biriga bitta UPDATE (qisman indeks bo'yicha),
+        # shuning uchun xotira va so'rovlar soni yozuvlar soniga bog'liq emas
+        due_dates = open_records.filter(due_date__lt=self.today).order_by('due_date') \
+            .values_list('due_date', flat=True).distinct()
+        updated = queued = 0
+        for due_date in [*due_dates, self.today + timedelta(days=DUE_SOON_DAYS)]:
+            n, q = self._sweep_group(open_records.filter(due_date=due_date), due_date)
+            updated, queued = updated + n, queued + q
+
+        # muddati uzaytirilganlar: endi kechikmagan
+        cleared = open_records.filter(due_date__gte=self.today, overdue_days__gt=0)
+        cleared = cleared.count() if self.dry_run else cleared.update(overdue_days=0, fine_amount=0)
+
+        if self.dry_run:
+            self.stdout.write(
+                f"{updated} ta yozuv yangilanadi, {cleared} tasi tozalanadi, "
+                f"{queued} ta eslatma navbatga qo'shiladi"
+            )
+            return
+        sent = 0
+        if not opts['no_deliver']:
+            sent = deliver_pending(get_backend(stream=self.stdout), batch_size=self.batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"{updated} ta yozuv yangilandi, {cleared} tasi tozalandi, {queued} ta eslatma navbatga "
+            f"qo'shildi, {sent} tasi yuborildi, {time.perf_counter() - started:.1f}s"
+        ))
+
+    def _sweep_group(self, group, due_date):
+        """Bitta muddat sanasidagi yozuvlar; (yangilangan, navbatga qo'yilgan)"""
+        days = max((self.today - due_date).days, 0)
+        # bugun tekshirilganlar o'tkazib yuboriladi: qayta ishga tushirish xavfsiz
+        fresh = group.exclude(swept_on=self.today)
+        if days == 0:
+            kind = Notification.DUE_SOON
+        elif (days - 1) % REMIND_EVERY_DAYS == 0:
+            kind = Notification.OVERDUE
+        else:
+            kind = None
+        if self.dry_run:
+            n = fresh.count()
+            return (n if days else 0), (n if kind else 0)
+
+        with transaction.atomic():
+            queued = self._enqueue(fresh, kind, due_date, days) if kind else 0
+            updated = fresh.update(overdue_days=days, fine_amount=days * self.rate, swept_on=self.today)
+        return (updated if days else 0), queued
+
+    def _enqueue(self, records, kind, due_date, days):
+        """Eslatmalarni ``batch_size`` tadan yozadi; yozuvlar kursor bilan o'qiladi"""
+        rows = records.order_by().values_list('pk', 'borrower_name', 'borrower_phone', 'book__title')
+        batch, queued = [], 0
+        for pk, name, phone, title in rows.iterator(chunk_size=self.batch_size):
+            if kind == Notification.DUE_SOON:
+                text = f"Hurmatli {name}, «{title}» kitobini qaytarish muddati ertaga ({due_date:%d.%m.%Y})."
+            else:
+                text = (
+                    f"Hurmatli {name}, «{title}» kitobini qaytarish muddati {days} kun o'tdi. "
+                    f"Jarima: {days * self.rate} so'm."
+                )
+            batch.append(Notification(record_id=pk, kind=kind, recipient=phone, message=text))
+            if len(batch) >= self.batch_size:
+                queued += len(Notification.objects.bulk_create(batch))
+                batch.clear()
+        if batch:
+            queued += len(Notification.objects.bulk_create(batch))
+        return queued
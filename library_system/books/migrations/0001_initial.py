@@ -0,0 +1,126 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Author',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_name', models.CharField(max_length=100, verbose_name='Ism')),
+                ('last_name', models.CharField(max_length=100, verbose_name='Familiya')),
+                ('bio', models.TextField(blank=True, verbose_name='Biografiya')),
+            ],
+            options={
+                'verbose_name': 'Muallif',
+                'verbose_name_plural': 'Mualliflar',
+            },
+        ),
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Kategoriya nomi')),
+                ('description', models.TextField(blank=True, verbose_name="Ta'rif")),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Kategoriya',
+                'verbose_name_plural': 'Kategoriyalar',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Publisher',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Nashriyot nomi')),
+                ('country', models.CharField(blank=True, max_length=100, verbose_name='Mamlakat')),
+            ],
+            options={
+                'verbose_name': 'Nashriyot',
+                'verbose_name_plural': 'Nashriyotlar',
+            },
+        ),
+        migrations.CreateModel(
+            name='Book',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=300, verbose_name='Kitob nomi')),
+                ('isbn', models.CharField(blank=True, max_length=13, null=True, unique=True, verbose_name='ISBN')),
+                ('publication_year', models.IntegerField(verbose_name='Nashr yili')),
+                ('pages', models.IntegerField(blank=True, null=True, verbose_name='Sahifalar soni')),
+                ('language', models.CharField(default="O'zbek", max_length=50, verbose_name='Til')),
+                ('description', models.TextField(blank=True, verbose_name='Tavsif')),
+                ('cover_image', models.ImageField(blank=True, null=True, upload_to='covers/', verbose_name='Muqova rasmi')),
+                ('inventory_number', models.CharField(max_length=50, unique=True, verbose_name='Inventar raqami')),
+                ('shelf_location', models.CharField(max_length=100, verbose_name='Javon joylashuvi')),
+                ('total_copies', models.IntegerField(default=1, verbose_name='Jami nusxalar')),
+                ('available_copies', models.IntegerField(default=1, verbose_name='Mavjud nusxalar')),
+                ('status', models.CharField(choices=[('available', 'Mavjud'), ('borrowed', 'Olingan'), ('reserved', 'Band qilingan'), ('maintenance', "Ta'mirda")], default='available', max_length=20, verbose_name='Holat')),
+                ('added_date', models.DateTimeField(auto_now_add=True, verbose_name="Qo'shilgan sana")),
+                ('updated_date', models.DateTimeField(auto_now=True, verbose_name='Yangilangan sana')),
+                ('added_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name="Qo'shgan")),
+                ('authors', models.ManyToManyField(to='books.author', verbose_name='Mualliflar')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='books.category', verbose_name='Kategoriya')),
+                ('publisher', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='books.publisher', verbose_name='Nashriyot')),
+            ],
+            options={
+                'verbose_name': 'Kitob',
+                'verbose_name_plural': 'Kitoblar',
+                'ordering': ['-added_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BorrowRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('borrower_name', models.CharField(max_length=200, verbose_name='Oluvchi ismi')),
+                ('borrower_phone', models.CharField(max_length=20, verbose_name='Telefon')),
+                ('borrower_id', models.CharField(blank=True, max_length=50, verbose_name='ID/Passport')),
+                ('borrow_date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Olingan sana')),
+                ('due_date', models.DateField(verbose_name='Qaytarish muddati')),
+                ('return_date', models.DateField(blank=True, null=True, verbose_name='Qaytarilgan sana')),
+                ('is_returned', models.BooleanField(default=False, verbose_name='Qaytarildi')),
+                ('notes', models.TextField(blank=True, verbose_name='Izohlar')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='books.book', verbose_name='Kitob')),
+            ],
+            options={
+                'verbose_name': 'Olish tarixi',
+                'verbose_name_plural': 'Olish tarixi',
+                'ordering': ['-borrow_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='IncomingBooks',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=300, verbose_name='Kitob nomi')),
+                ('quantity', models.IntegerField(verbose_name='Miqdori')),
+                ('expected_date', models.DateField(verbose_name='Kutilayotgan sana')),
+                ('supplier', models.CharField(blank=True, max_length=200, verbose_name="Ta'minotchi")),
+                ('notes', models.TextField(blank=True, verbose_name='Izohlar')),
+                ('is_arrived', models.BooleanField(default=False, verbose_name='Keldi')),
+                ('arrived_date', models.DateField(blank=True, null=True, verbose_name='Kelgan sana')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='books.category', verbose_name='Kategoriya')),
+            ],
+            options={
+                'verbose_name': 'Keladigan kitob',
+                'verbose_name_plural': 'Keladigan kitoblar',
+                'ordering': ['expected_date'],
+            },
+        ),
+    ]
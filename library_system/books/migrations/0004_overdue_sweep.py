@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrowrecord',
+            name='fine_amount',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name="Jarima (so'm)"),
+        ),
+        migrations.AddField(
+            model_name='borrowrecord',
+            name='overdue_days',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Kechikkan kunlar'),
+        ),
+        migrations.AddField(
+            model_name='borrowrecord',
+            name='swept_on',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Oxirgi tekshiruv'),
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('due_soon', 'Muddat yaqinlashdi'), ('overdue', "Muddati o'tdi")], max_length=20, verbose_name='Turi')),
+                ('recipient', models.CharField(max_length=20, verbose_name='Telefon')),
+                ('message', models.TextField(verbose_name='Matn')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Yaratilgan')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Yuborilgan')),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='books.borrowrecord', verbose_name='Olish yozuvi')),
+            ],
+            options={
+                'verbose_name': 'Eslatma',
+                'verbose_name_plural': 'Eslatmalar',
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('sent_at', None)), fields=['id'], name='books_notify_pending_idx')],
+            },
+        ),
+    ]
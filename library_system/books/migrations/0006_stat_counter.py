@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:47
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_book_category_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('total', 'Jami'), ('category', 'Kategoriya'), ('language', 'Til'), ('due', 'Qaytarish muddati'), ('added', "Qo'shilgan kun")], max_length=20, verbose_name='Turi')),
+                ('key', models.CharField(blank=True, max_length=100, verbose_name='Kalit')),
+                ('label', models.CharField(blank=True, max_length=200, verbose_name='Nomi')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Qiymat')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Yangilangan')),
+            ],
+            options={
+                'verbose_name': 'Statistika hisoblagichi',
+                'verbose_name_plural': 'Statistika hisoblagichlari',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'key'), name='books_stat_uniq')],
+            },
+        ),
+    ]
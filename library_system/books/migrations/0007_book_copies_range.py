@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Greatest, Least
+
+
+def clamp_available_copies(apps, schema_editor):
+    # qo'lda kiritilgan noto'g'ri sonlar cheklovni qo'shishga to'sqinlik qilmasin
+    Book = apps.get_model('books', 'Book')
+    out_of_range = Book.objects.filter(
+        models.Q(available_copies__lt=0) | models.Q(available_copies__gt=models.F('total_copies'))
+    )
+    out_of_range.update(available_copies=Greatest(Least('available_copies', 'total_copies'), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_stat_counter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_available_copies, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.CheckConstraint(condition=models.Q(('available_copies__gte', 0), ('available_copies__lte', models.F('total_copies'))), name='books_book_copies_range', violation_error_message="Mavjud nusxalar 0 va jami nusxalar orasida bo'lishi kerak"),
+        ),
+    ]
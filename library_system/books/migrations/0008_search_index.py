@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# pg_trgm GIN indekslari, shu migratsiya holatida muzlatilgan (books.search
+# keyin o'zgarsa ham bu qadam o'zgarmaydi); SQLite'da books.search o'z
+# indeksini quradi
+CREATE_TRIGRAM_INDEXES = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX books_book_title_trgm ON books_book USING GIN (title gin_trgm_ops)',
+    'CREATE INDEX books_author_name_trgm ON books_author USING GIN (first_name gin_trgm_ops, last_name gin_trgm_ops)',
+]
+DROP_TRIGRAM_INDEXES = [
+    'DROP INDEX IF EXISTS books_book_title_trgm',
+    'DROP INDEX IF EXISTS books_author_name_trgm',
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in CREATE_TRIGRAM_INDEXES:
+            schema_editor.execute(sql)
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in DROP_TRIGRAM_INDEXES:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_book_copies_range'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['updated_date'], name='books_book_updated_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
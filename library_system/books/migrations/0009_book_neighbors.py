@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name="O'xshashlik")),
+                ('together', models.PositiveIntegerField(verbose_name='Birga olganlar')),
+            ],
+            options={
+                'verbose_name': 'Tavsiya',
+                'verbose_name_plural': 'Tavsiyalar',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(fields=['borrower_phone', '-borrow_date'], name='books_borrow_reader_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(fields=['borrow_date'], name='books_borrow_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='bookneighbor',
+            name='book',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='books.book', verbose_name='Kitob'),
+        ),
+        migrations.AddField(
+            model_name='bookneighbor',
+            name='neighbor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbor_of', to='books.book', verbose_name='Tavsiya'),
+        ),
+        migrations.AddIndex(
+            model_name='bookneighbor',
+            index=models.Index(fields=['book', '-score'], name='books_neighbor_book_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:16
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_book_neighbors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBorrowRecord',
+            fields=[
+                ('borrower_name', models.CharField(max_length=200, verbose_name='Oluvchi ismi')),
+                ('borrower_phone', models.CharField(max_length=20, verbose_name='Telefon')),
+                ('borrower_id', models.CharField(blank=True, max_length=50, verbose_name='ID/Passport')),
+                ('borrow_date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Olingan sana')),
+                ('due_date', models.DateField(verbose_name='Qaytarish muddati')),
+                ('return_date', models.DateField(blank=True, null=True, verbose_name='Qaytarilgan sana')),
+                ('is_returned', models.BooleanField(default=False, verbose_name='Qaytarildi')),
+                ('notes', models.TextField(blank=True, verbose_name='Izohlar')),
+                ('overdue_days', models.PositiveIntegerField(default=0, editable=False, verbose_name='Kechikkan kunlar')),
+                ('fine_amount', models.PositiveIntegerField(default=0, editable=False, verbose_name="Jarima (so'm)")),
+                ('swept_on', models.DateField(blank=True, editable=False, null=True, verbose_name='Oxirgi tekshiruv')),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Arxivlangan')),
+                ('book', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='books.book', verbose_name='Kitob')),
+            ],
+            options={
+                'verbose_name': 'Arxivdagi olish',
+                'verbose_name_plural': 'Olish arxivi',
+                'ordering': ['-borrow_date'],
+                'indexes': [models.Index(fields=['book', '-borrow_date'], name='books_archive_book_idx'), models.Index(fields=['-return_date'], name='books_archive_returned_idx')],
+            },
+        ),
+    ]
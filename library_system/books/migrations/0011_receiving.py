@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0010_borrow_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Nomi')),
+                ('value', models.PositiveBigIntegerField(default=0, verbose_name='Oxirgi qiymat')),
+            ],
+            options={
+                'verbose_name': 'Ketma-ketlik',
+                'verbose_name_plural': 'Ketma-ketliklar',
+            },
+        ),
+        migrations.AddField(
+            model_name='incomingbooks',
+            name='book',
+            field=models.ForeignKey(blank=True, help_text="Qayta buyurtma bo'lsa mavjud kitob; qabulda to'ldiriladi", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='receipts', to='books.book', verbose_name='Kitob'),
+        ),
+        migrations.AddField(
+            model_name='incomingbooks',
+            name='isbn',
+            field=models.CharField(blank=True, max_length=13, verbose_name='ISBN'),
+        ),
+        migrations.AddField(
+            model_name='incomingbooks',
+            name='publication_year',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Nashr yili'),
+        ),
+        migrations.AddField(
+            model_name='incomingbooks',
+            name='shelf_location',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Javon joylashuvi'),
+        ),
+    ]
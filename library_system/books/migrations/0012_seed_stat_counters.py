@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:05
+
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def seed_stat_counters(apps, schema_editor):
+    # books.stats.compute() ning shu migratsiyadagi nusxasi: sahifalar
+    # so'rov ichida jadvalni to'ldirmaydi, shuning uchun qatorlar shu yerda
+    Book = apps.get_model('books', 'Book')
+    Author = apps.get_model('books', 'Author')
+    Category = apps.get_model('books', 'Category')
+    BorrowRecord = apps.get_model('books', 'BorrowRecord')
+    StatCounter = apps.get_model('books', 'StatCounter')
+    if StatCounter.objects.filter(kind='total').exists():
+        return
+    now = timezone.now()
+    values = Counter({
+        ('total', 'books'): Book.objects.count(),
+        ('total', 'authors'): Author.objects.count(),
+        ('total', 'categories'): Category.objects.count(),
+        ('total', 'available'): Book.objects.filter(status='available').count(),
+        ('total', 'open_loans'): BorrowRecord.objects.filter(is_returned=False).count(),
+    })
+    labels = {}
+    for pk, name in Category.objects.values_list('pk', 'name'):
+        values['category', str(pk)] = 0
+        labels['category', str(pk)] = name
+    for category, n in Book.objects.order_by().values_list('category').annotate(n=Count('id')):
+        values['category', str(category or '')] = n
+    for language, n in Book.objects.order_by().values_list('language').annotate(n=Count('id')):
+        values['language', language] = n
+    open_records = BorrowRecord.objects.filter(is_returned=False).order_by()
+    for due_date, n in open_records.values_list('due_date').annotate(n=Count('id')):
+        values['due', due_date.isoformat()] = n
+    start = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=29), time.min))
+    added = Book.objects.filter(added_date__gte=start).order_by() \
+        .values_list(TruncDate('added_date')).annotate(n=Count('id'))
+    for day, n in added:
+        values['added', day.isoformat()] = n
+    StatCounter.objects.all().delete()
+    StatCounter.objects.bulk_create([
+        StatCounter(kind=kind, key=key, label=labels.get((kind, key), ''), value=n, updated_at=now)
+        for (kind, key), n in values.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0011_receiving'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_stat_counters, migrations.RunPython.noop),
+    ]
@@ -50,6 +50,10 @@ class Author(models.Model):
         return f"{self.first_name} {self.last_name}"
 
 
+# Book.stats_state() o'qiydigan maydonlar
+STAT_FIELDS = {'category_id', 'language', 'status', 'added_date'}
+
+
 class Book(models.Model):
     """Asosiy kitob modeli"""
 
@@ -76,6 +80,7 @@ class Book(models.Model):
 
     # Rasm
     cover_image = models.ImageField(upload_to='covers/', blank=True, null=True, verbose_name="Muqova rasmi")
+    cover_hash = models.CharField(max_length=12, blank=True, editable=False)  # kichik nusxalar xeshi
 
     # Inventarizatsiya
     inventory_number = models.CharField(max_length=50, unique=True, verbose_name="Inventar raqami")
@@ -93,10 +98,43 @@ class Book(models.Model):
         verbose_name = "Kitob"
         verbose_name_plural = "Kitoblar"
         ordering = ['-added_date']
+        indexes = [
+            # book_list saralashlari (kursor bilan sahifalash, BOOK_SORTS)
+            models.Index(fields=['-added_date', '-id'], name='books_book_added_idx'),
+            models.Index(fields=['title', 'id'], name='books_book_title_idx'),
+            models.Index(fields=['publication_year', 'id'], name='books_book_year_idx'),
+            # holat / til filtri standart saralash bilan; statistika sanoqlari
+            models.Index(fields=['status', '-added_date', '-id'], name='books_book_status_idx'),
+            models.Index(fields=['language', '-added_date', '-id'], name='books_book_language_idx'),
+            models.Index(fields=['category', '-added_date', '-id'], name='books_book_category_idx'),
+            # qidiruv indeksidan keyin o'zgargan kitoblar (books.search)
+            models.Index(fields=['updated_date'], name='books_book_updated_idx'),
+        ]
+        constraints = [
+            # books.services shartli UPDATE'lari shu oraliqda qoladi
+            models.CheckConstraint(
+                condition=models.Q(available_copies__gte=0, available_copies__lte=models.F('total_copies')),
+                name='books_book_copies_range',
+                violation_error_message="Mavjud nusxalar 0 va jami nusxalar orasida bo'lishi kerak",
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'cover_image' in field_names:
+            instance._loaded_cover = instance.cover_image.name or ''
+        if STAT_FIELDS.issubset(field_names):
+            instance._loaded_stats = instance.stats_state()
+        return instance
+
+    def stats_state(self):
+        """StatCounter dagi o'rni: (kategoriya, til, holat, qo'shilgan kun)"""
+        return (self.category_id, self.language, self.status, timezone.localdate(self.added_date))
+
     def is_available(self):
         """Kitob mavjudligini tekshirish"""
         return self.available_copies > 0
@@ -107,10 +145,18 @@ class Book(models.Model):
 
 
 class IncomingBooks(models.Model):
-    """Yangi keladigan kitoblar"""
+    """Yangi keladigan kitoblar; kelganda books.receiving fondga qabul qiladi"""
     title = models.CharField(max_length=300, verbose_name="Kitob nomi")
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, verbose_name="Kategoriya")
     quantity = models.IntegerField(verbose_name="Miqdori")
+    # qabulda mavjud kitob shu ISBN (yoki tanlangan ``book``) bo'yicha topiladi
+    isbn = models.CharField(max_length=13, blank=True, verbose_name="ISBN")
+    publication_year = models.IntegerField(blank=True, null=True, verbose_name="Nashr yili")
+    shelf_location = models.CharField(max_length=100, blank=True, verbose_name="Javon joylashuvi")
+    book = models.ForeignKey(
+        Book, on_delete=models.SET_NULL, null=True, blank=True, related_name='receipts',
+        verbose_name="Kitob", help_text="Qayta buyurtma bo'lsa mavjud kitob; qabulda to'ldiriladi",
+    )
     expected_date = models.DateField(verbose_name="Kutilayotgan sana")
     supplier = models.CharField(max_length=200, blank=True, verbose_name="Ta'minotchi")
     notes = models.TextField(blank=True, verbose_name="Izohlar")
@@ -131,9 +177,10 @@ class IncomingBooks(models.Model):
         return not self.is_arrived and self.expected_date < timezone.now().date()
 
 
-class BorrowRecord(models.Model):
-    """Kitob olish tarixi"""
-    book = models.ForeignKey(Book, on_delete=models.CASCADE, verbose_name="Kitob")
+class BorrowFields(models.Model):
+    """Olish yozuvi maydonlari: ``BorrowRecord`` (issiq) va ``ArchivedBorrowRecord`` (sovuq)"""
+    # (book, -borrow_date) indekslarining boshi sifatida indekslangan
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, db_index=False, verbose_name="Kitob")
     borrower_name = models.CharField(max_length=200, verbose_name="Oluvchi ismi")
     borrower_phone = models.CharField(max_length=20, verbose_name="Telefon")
     borrower_id = models.CharField(max_length=50, blank=True, verbose_name="ID/Passport")
@@ -145,10 +192,13 @@ class BorrowRecord(models.Model):
     is_returned = models.BooleanField(default=False, verbose_name="Qaytarildi")
     notes = models.TextField(blank=True, verbose_name="Izohlar")
 
+    # sweep_overdue buyrug'i har kecha yangilaydi (sahifalar hisoblamaydi)
+    overdue_days = models.PositiveIntegerField(default=0, editable=False, verbose_name="Kechikkan kunlar")
+    fine_amount = models.PositiveIntegerField(default=0, editable=False, verbose_name="Jarima (so'm)")
+    swept_on = models.DateField(blank=True, null=True, editable=False, verbose_name="Oxirgi tekshiruv")
+
     class Meta:
-        verbose_name = "Olish tarixi"
-        verbose_name_plural = "Olish tarixi"
-        ordering = ['-borrow_date']
+        abstract = True
 
     def __str__(self):
         return f"{self.borrower_name} - {self.book.title}"
@@ -157,4 +207,160 @@ class BorrowRecord(models.Model):
         """Muddati o'tganmi?"""
         if not self.is_returned:
             return timezone.now().date() > self.due_date
-        return False
\ No newline at end of file
+        return False
+
+
+class BorrowRecord(BorrowFields):
+    """Kitob olish tarixi; eski yopilganlari ``ArchivedBorrowRecord`` da (books.archive)"""
+
+    class Meta:
+        verbose_name = "Olish tarixi"
+        verbose_name_plural = "Olish tarixi"
+        ordering = ['-borrow_date']
+        indexes = [
+            # kitob sahifasidagi oxirgi olishlar
+            models.Index(fields=['book', '-borrow_date'], name='books_borrow_book_idx'),
+            # faqat qaytarilmaganlar (borrow_history, statistika): muddat bo'yicha
+            models.Index(
+                fields=['due_date'], name='books_borrow_open_due_idx',
+                condition=models.Q(is_returned=False),
+            ),
+            # faqat qaytarilganlar: oxirgi qaytarishlar; arxivga ko'chiriladiganlar
+            models.Index(
+                fields=['-return_date'], name='books_borrow_returned_idx',
+                condition=models.Q(is_returned=True),
+            ),
+            # tavsiyalar (books.recommendations): o'quvchi olgan kitoblar, kun yangilari
+            models.Index(fields=['borrower_phone', '-borrow_date'], name='books_borrow_reader_idx'),
+            models.Index(fields=['borrow_date'], name='books_borrow_date_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'is_returned' in field_names and 'due_date' in field_names:
+            instance._loaded_stats = instance.stats_state()
+        return instance
+
+    def stats_state(self):
+        """Ochiq bo'lsa qaytarish muddati, yopiq bo'lsa None"""
+        if self.is_returned:
+            return None
+        # view'lar sanani POST dan satr holida beradi
+        return self._meta.get_field('due_date').to_python(self.due_date)
+
+
+class ArchivedBorrowRecord(BorrowFields):
+    """Arxivga ko'chirilgan (eski, yopilgan) olish yozuvi; id asl yozuvniki"""
+    id = models.BigIntegerField(primary_key=True)
+    archived_at = models.DateTimeField(default=timezone.now, verbose_name="Arxivlangan")
+
+    class Meta:
+        verbose_name = "Arxivdagi olish"
+        verbose_name_plural = "Olish arxivi"
+        ordering = ['-borrow_date']
+        indexes = [
+            # tarixni arxiv bilan birga ko'rsatish (books.archive.recent_returns)
+            models.Index(fields=['book', '-borrow_date'], name='books_archive_book_idx'),
+            models.Index(fields=['-return_date'], name='books_archive_returned_idx'),
+        ]
+
+
+class Notification(models.Model):
+    """Oluvchilarga yuboriladigan eslatmalar navbati (books.notifications yuboradi)"""
+    DUE_SOON = 'due_soon'
+    OVERDUE = 'overdue'
+    KIND_CHOICES = [
+        (DUE_SOON, 'Muddat yaqinlashdi'),
+        (OVERDUE, "Muddati o'tdi"),
+    ]
+
+    record = models.ForeignKey(BorrowRecord, on_delete=models.CASCADE, related_name='notifications',
+                               verbose_name="Olish yozuvi")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Turi")
+    recipient = models.CharField(max_length=20, verbose_name="Telefon")
+    message = models.TextField(verbose_name="Matn")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Yaratilgan")
+    sent_at = models.DateTimeField(blank=True, null=True, verbose_name="Yuborilgan")
+
+    class Meta:
+        verbose_name = "Eslatma"
+        verbose_name_plural = "Eslatmalar"
+        ordering = ['id']
+        indexes = [
+            # faqat yuborilmaganlar: yuboruvchi navbatni shu indeks bo'yicha o'qiydi
+            models.Index(fields=['id'], name='books_notify_pending_idx', condition=models.Q(sent_at=None)),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient}: {self.get_kind_display()}"
+
+
+class StatCounter(models.Model):
+    """Statistika sahifalari uchun tayyor sanoqlar (books.stats yuritadi)"""
+    TOTAL = 'total'
+    CATEGORY = 'category'
+    LANGUAGE = 'language'
+    DUE = 'due'
+    ADDED = 'added'
+    KIND_CHOICES = [
+        (TOTAL, 'Jami'),
+        (CATEGORY, 'Kategoriya'),
+        (LANGUAGE, 'Til'),
+        (DUE, 'Qaytarish muddati'),
+        (ADDED, "Qo'shilgan kun"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Turi")
+    # total: nom; category: id ('' = kategoriyasiz); language: til; due/added: ISO sana
+    key = models.CharField(max_length=100, blank=True, verbose_name="Kalit")
+    label = models.CharField(max_length=200, blank=True, verbose_name="Nomi")
+    value = models.BigIntegerField(default=0, verbose_name="Qiymat")
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name="Yangilangan")
+
+    class Meta:
+        verbose_name = "Statistika hisoblagichi"
+        verbose_name_plural = "Statistika hisoblagichlari"
+        constraints = [
+            # oshirish (kind, key) bo'yicha, sahifalar shu indeksni o'qiydi
+            models.UniqueConstraint(fields=['kind', 'key'], name='books_stat_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.key} = {self.value}"
+
+
+class Sequence(models.Model):
+    """Nomli raqamlar ketma-ketligi (inventar raqamlari, books.receiving)"""
+    name = models.CharField(max_length=50, unique=True, verbose_name="Nomi")
+    value = models.PositiveBigIntegerField(default=0, verbose_name="Oxirgi qiymat")
+
+    class Meta:
+        verbose_name = "Ketma-ketlik"
+        verbose_name_plural = "Ketma-ketliklar"
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class BookNeighbor(models.Model):
+    """"Bu kitobni olganlar yana olgan": har kitobga eng yaxshi qo'shnilar
+    (books.recommendations hisoblaydi)"""
+    book = models.ForeignKey(
+        Book, on_delete=models.CASCADE, related_name='neighbors', db_index=False, verbose_name="Kitob"
+    )
+    neighbor = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='neighbor_of', verbose_name="Tavsiya")
+    score = models.FloatField(verbose_name="O'xshashlik")
+    # ikkala kitobni ham olgan o'quvchilar
+    together = models.PositiveIntegerField(verbose_name="Birga olganlar")
+
+    class Meta:
+        verbose_name = "Tavsiya"
+        verbose_name_plural = "Tavsiyalar"
+        indexes = [
+            # kitob sahifasi: bitta so'rov, eng o'xshashi birinchi
+            models.Index(fields=['book', '-score'], name='books_neighbor_book_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} -> {self.neighbor_id} ({self.score:.2f})"
@@ -0,0 +1,87 @@
+# books/notifications.py
+"""Eslatmalarni to'plab yuborish.
+
+``sweep_overdue`` eslatmalarni ``Notification`` jadvaliga (navbatga) yozadi,
+``deliver_pending`` esa ularni ``batch_size`` tadan o'qib
+``settings.NOTIFICATION_BACKEND`` orqali yuboradi va yuborilganlarini bitta
+UPDATE bilan belgilaydi. Yuborish to'xtab qolsa, keyingi ishga tushirish
+qolganidan davom etadi.
+
+Backend ``django.core.mail`` backendlari kabi: ``send_messages(notifications)``
+yuborilganlar sonini qaytaradi. Mahalliy sinov uchun ``ConsoleBackend`` va
+``FileBackend`` (JSON qatorlar) bor; SMS shlyuzi uchun shu interfeysdagi klass
+yoziladi.
+"""
+import json
+import sys
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Notification
+
+
+class BaseBackend:
+    def __init__(self, **kwargs):
+        pass
+
+    def send_messages(self, notifications):
+        raise NotImplementedError
+
+
+class ConsoleBackend(BaseBackend):
+    """Eslatmalarni stdout ga chiqaradi"""
+
+    def __init__(self, stream=None, **kwargs):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def send_messages(self, notifications):
+        with self._lock:
+            for n in notifications:
+                self.stream.write(f'[{n.kind}] {n.recipient}: {n.message}\n')
+            self.stream.flush()
+        return len(notifications)
+
+
+class FileBackend(BaseBackend):
+    """Eslatmalarni ``NOTIFICATION_FILE_PATH`` fayliga JSON qatorlar qilib qo'shadi"""
+
+    def __init__(self, file_path=None, **kwargs):
+        self.file_path = file_path or settings.NOTIFICATION_FILE_PATH
+
+    def send_messages(self, notifications):
+        with open(self.file_path, 'a', encoding='utf-8') as fh:
+            for n in notifications:
+                fh.write(json.dumps({
+                    'id': n.pk, 'kind': n.kind, 'recipient': n.recipient, 'message': n.message,
+                }, ensure_ascii=False) + '\n')
+        return len(notifications)
+
+
+def get_backend(backend=None, **kwargs):
+    return import_string(backend or settings.NOTIFICATION_BACKEND)(**kwargs)
+
+
+def deliver_pending(backend=None, batch_size=500):
+    """Navbatdagi barcha eslatmalarni yuboradi; yuborilganlar sonini qaytaradi.
+
+    Xotirada bir vaqtda faqat bitta to'plam turadi. Backend to'plamning
+    faqat boshini yuborsa (qaytargan soni kam bo'lsa), qolgani navbatda
+    qoladi va yuborish to'xtaydi.
+    """
+    backend = backend or get_backend()
+    pending = Notification.objects.filter(sent_at=None).order_by('id')
+    sent, last = 0, 0
+    while True:
+        batch = list(pending.filter(id__gt=last)[:batch_size])
+        if not batch:
+            return sent
+        done = backend.send_messages(batch)
+        Notification.objects.filter(id__in=[n.pk for n in batch[:done]]).update(sent_at=timezone.now())
+        sent += done
+        if done < len(batch):
+            return sent
+        last = batch[-1].pk
@@ -0,0 +1,89 @@
+# books/pagination.py
+"""Kursor (keyset) bo'yicha sahifalash.
+
+OFFSET o'rniga keyingi sahifa ``WHERE (saralash, pk) > (oxirgi ko'rilgan)``
+sharti bilan olinadi: 5000-sahifa ham 1-sahifa kabi tez ishlaydi, yangi
+qo'shilgan kitoblar sahifalarni siljitmaydi.
+"""
+from django.core import signing
+from django.db.models import Q
+
+
+SALT = 'books.pagination'
+
+
+class KeysetPage:
+    """Bitta sahifa: kitoblar va keyingi sahifa kursori"""
+
+    def __init__(self, object_list, next_cursor='', has_next=False):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(sort, values):
+    return signing.dumps([sort, values], salt=SALT, compress=True)
+
+
+def decode_cursor(token, sort):
+    """Kursordagi qiymatlar; yaroqsiz yoki boshqa saralashniki bo'lsa None"""
+    if not token:
+        return None
+    try:
+        token_sort, values = signing.loads(token, salt=SALT)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+    return values if token_sort == sort else None
+
+
+def after_q(ordering, values):
+    """``(f1, f2, ...) > (v1, v2, ...)`` sharti, har bir maydon yo'nalishi bilan"""
+    condition = Q()
+    for i, name in enumerate(ordering):
+        attr = name.lstrip('-')
+        op = 'lt' if name.startswith('-') else 'gt'
+        step = Q(**{f'{attr}__{op}': values[i]})
+        for prev, value in zip(ordering[:i], values):
+            step &= Q(**{prev.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def keyset_paginate(qs, sort, ordering, after=None, per_page=24):
+    """``ordering`` bo'yicha bitta sahifa (oxirgi maydon pk bo'lishi shart)"""
+    ordering = tuple(ordering)
+    values = decode_cursor(after, sort)
+    if values is not None and len(values) == len(ordering):
+        qs = qs.filter(after_q(ordering, values))
+    rows = list(qs.order_by(*ordering)[:per_page + 1])
+    page = KeysetPage(rows[:per_page], has_next=len(rows) > per_page)
+    if page.has_next:
+        last = page.object_list[-1]
+        page.next_cursor = encode_cursor(
+            sort, [_serializable(getattr(last, name.lstrip('-'))) for name in ordering]
+        )
+    return page
+
+
+def ranked_paginate(qs, ids, sort, after=None, per_page=24):
+    """Tayyor tartibdagi ``ids`` (masalan, qidiruv o'xshashligi) bo'yicha sahifa;
+    ro'yxat qisqa, shuning uchun kursorda o'rni saqlanadi"""
+    values = decode_cursor(after, sort)
+    start = values[0] if values and isinstance(values[0], int) and values[0] > 0 else 0
+    page_ids = ids[start:start + per_page]
+    found = qs.in_bulk(page_ids) if page_ids else {}
+    page = KeysetPage([found[pk] for pk in page_ids if pk in found], has_next=start + per_page < len(ids))
+    if page.has_next:
+        page.next_cursor = encode_cursor(sort, [start + per_page])
+    return page
+
+
+def _serializable(value):
+    # sana/vaqt JSON'da ISO satr ko'rinishida saqlanadi
+    return value.isoformat() if hasattr(value, 'isoformat') else value
@@ -0,0 +1,136 @@
+# books/querybudget.py
+"""Har so'rov uchun SQL hisobi va view bo'yicha so'rovlar chegarasi.
+
+``QueryBudgetMiddleware`` so'rovlar sonini, umumiy DB vaqtini va takrorlangan
+so'rovlarni (N+1 belgisi) sanaydi, ``Server-Timing`` sarlavhasiga yozadi,
+``QUERY_LOG`` yoqilgan bo'lsa bitta JSON log qatori chiqaradi.
+
+Chegara ``settings.QUERY_BUDGETS`` dan (URL nomi bo'yicha, masalan admin
+sahifalari uchun) yoki view ustidagi ``@query_budget(n)`` dan olinadi.
+Oshib ketsa ogohlantirish yoziladi, ``QUERY_BUDGET_STRICT`` da esa
+(testlarda) ``QueryBudgetExceeded`` ko'tariladi.
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger('books.queries')
+
+# 'IN (%s, %s, %s)' faqat uzunligi bilan farq qiladi; bitta so'rov deb sanaymiz
+IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+SPACES = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    return IN_LIST.sub('(%s, ...)', SPACES.sub(' ', sql.strip()))
+
+
+class QueryStats:
+    '''Ko'rgan so'rovlarini sanaydigan ``execute_wrapper``'''
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        '''Bir necha marta bajarilgan so'rovlar, eng ko'pi birinchi'''
+        return [(sql, n) for sql, n in self.fingerprints.most_common() if n > 1]
+
+
+@contextmanager
+def record_queries():
+    '''Blok ichida barcha bazalardagi so'rovlarni sanash'''
+    stats = QueryStats()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(stats))
+        yield stats
+
+
+def query_budget(limit):
+    '''View bitta so'rovda bajarishi mumkin bo'lgan eng ko'p SQL soni'''
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def budget_for(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    if match.view_name in budgets:
+        return budgets[match.view_name]
+    for owner in (match.func, getattr(match.func, 'view_class', None)):
+        limit = getattr(owner, 'query_budget', None)
+        if limit is not None:
+            return limit
+    return None
+
+
+def server_timing(stats, total):
+    repeated = sum(n - 1 for _, n in stats.duplicates)
+    return (
+        f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries, {repeated} repeated", '
+        f'total;dur={total * 1000:.2f}'
+    )
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with record_queries() as stats:
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        response['Server-Timing'] = server_timing(stats, total)
+
+        limit = budget_for(request)
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else None
+        if getattr(settings, 'QUERY_LOG', False):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': view,
+                'status': response.status_code,
+                'queries': stats.count,
+                'db_ms': round(stats.duration * 1000, 2),
+                'total_ms': round(total * 1000, 2),
+                'budget': limit,
+                'repeated': [{'sql': sql[:300], 'count': n} for sql, n in stats.duplicates[:5]],
+            }))
+        if limit is not None and stats.count > limit:
+            message = f'{view} ran {stats.count} queries (budget {limit}) for {request.path}'
+            if stats.duplicates:
+                sql, n = stats.duplicates[0]
+                message += f'; repeated {n}x: {sql[:300]}'
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
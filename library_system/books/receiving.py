@@ -0,0 +1,170 @@
+# books/receiving.py
+"""Kelgan yuklarni (``IncomingBooks``) fondga qabul qilish.
+
+Bitta yoki bir nechta yuk bitta tranzaksiyada qabul qilinadi: har qator
+uchun mavjud kitob (tanlangan ``book`` yoki ISBN bo'yicha) topilsa uning
+nusxalari ko'paytiriladi, topilmasa yangi ``Book`` yaratiladi va unga
+``Sequence`` dan keyingi inventar raqami beriladi. Yangi kitoblar
+``bulk_create`` bilan, to'ldiriladigan kitoblar va yuklar esa
+guruhlangan ``update()`` (qolganlari ``bulk_update``) bilan yoziladi:
+so'rovlar soni qatorlar soniga emas, partiyalar soniga bog'liq.
+
+Nusxalar soni ``F()`` bilan oshiriladi (books.services dagi kabi), shu
+vaqtda berilgan kitoblar hisobi yo'qolmaydi. ``bulk_*`` signal yubormaydi:
+statistika (books.stats) shu yerda yangilanadi, qidiruv indeksi esa
+``updated_date`` bo'yicha o'zi ko'radi.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, OuterRef, QuerySet, Subquery, Value, When
+from django.utils import timezone
+
+from . import stats
+from .models import Book, IncomingBooks, Sequence
+
+
+# INV-00000001: generate_dataset bilan bir xil ko'rinish
+INVENTORY_SEQUENCE = 'inventory_number'
+INVENTORY_WIDTH = 8
+BATCH_SIZE = 1000
+
+
+class ReceivingError(Exception):
+    """Yukni qabul qilib bo'lmaydi (hech narsa yozilmaydi)"""
+
+
+def inventory_numbers(count):
+    """Keyingi ``count`` ta inventar raqami; tranzaksiya ichida chaqiriladi
+    (ketma-ketlik qatori tranzaksiya oxirigacha qulflanadi)"""
+    if not count:
+        return []
+    prefix = settings.INVENTORY_NUMBER_PREFIX
+    last = _advance(count)
+    if last is None:
+        Sequence.objects.get_or_create(name=INVENTORY_SEQUENCE, defaults={'value': _last_number(prefix)})
+        last = _advance(count)
+    return [f'{prefix}{n:0{INVENTORY_WIDTH}}' for n in range(last - count + 1, last + 1)]
+
+
+def _advance(count):
+    """Ketma-ketlikni ``count`` ga oshirib yangi qiymatini qaytaradi (bitta
+    ``UPDATE ... RETURNING``, SQLite 3.35+ va PostgreSQL); qator yo'q bo'lsa None"""
+    table = connection.ops.quote_name(Sequence._meta.db_table)
+    with connection.cursor() as cur:
+        cur.execute(
+            f'UPDATE {table} SET value = value + %s WHERE name = %s RETURNING value', [count, INVENTORY_SEQUENCE]
+        )
+        row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _last_number(prefix):
+    # ketma-ketlik birinchi marta yaratilganda: qo'lda yoki import bilan
+    # kiritilgan shu ko'rinishdagi raqamlardan keyin davom etadi
+    last = Book.objects.filter(inventory_number__regex=rf'^{prefix}[0-9]{{{INVENTORY_WIDTH}}}$') \
+        .order_by('-inventory_number').values_list('inventory_number', flat=True).first()
+    return int(last[len(prefix):]) if last else 0
+
+
+def receive(shipments, user=None, batch_size=BATCH_SIZE):
+    """``shipments`` (``IncomingBooks`` so'rovi yoki id lar) dan hali
+    kelmaganlarini qabul qiladi; ``(yangi kitoblar, to'ldirilgan kitoblar,
+    nusxalar)`` ni qaytaradi. Xato bo'lsa ``ReceivingError``, hech narsa
+    yozilmaydi."""
+    ids = shipments.values('pk') if isinstance(shipments, QuerySet) else list(shipments)
+    today = timezone.localdate()
+    with transaction.atomic():
+        items = list(
+            IncomingBooks.objects.select_for_update().filter(pk__in=ids, is_arrived=False).order_by('pk')
+        )
+        problems = [item.title for item in items if item.quantity < 1]
+        if problems:
+            raise ReceivingError(f"Miqdori noto'g'ri: {', '.join(problems)}")
+
+        existing = _existing_books(items)
+        created, added = {}, Counter()
+        for item in items:
+            book = existing.get(('id', item.book_id)) or existing.get(('isbn', item.isbn)) \
+                or created.get(item.isbn or item.pk)
+            if book is None:
+                book = created[item.isbn or item.pk] = Book(
+                    title=item.title, category_id=item.category_id, isbn=item.isbn or None,
+                    publication_year=item.publication_year, shelf_location=item.shelf_location,
+                    total_copies=0, available_copies=0, added_by=user,
+                )
+            if book.pk is None:
+                book.total_copies += item.quantity
+                book.available_copies += item.quantity
+            else:
+                added[book.pk] += item.quantity
+            item.book = book
+
+        problems = [book.title for book in created.values() if book.publication_year is None]
+        if problems:
+            raise ReceivingError(f"Yangi kitob uchun nashr yili kerak: {', '.join(problems)}")
+        for book, number in zip(created.values(), inventory_numbers(len(created))):
+            book.inventory_number = number
+        Book.objects.bulk_create(created.values(), batch_size=batch_size)
+
+        changes = Counter()
+        for book in created.values():
+            changes.update(stats.book_changes(None, book.stats_state()))
+        refilled = [book for book in {b.pk: b for b in existing.values()}.values() if book.pk in added]
+        for book in refilled:
+            if book.status == 'borrowed':
+                # oxirgi nusxa berilgan edi, endi bo'sh nusxa bor
+                category, language, status, added_on = old = book.stats_state()
+                changes.update(stats.book_changes(old, (category, language, 'available', added_on)))
+        # bulk_update har qator uchun CASE WHEN yozadi va minglab qatorda
+        # sekinlashadi; bu yerda har xil miqdorlar soni bo'yicha bittadan UPDATE
+        by_quantity = {}
+        for book_id, quantity in added.items():
+            by_quantity.setdefault(quantity, []).append(book_id)
+        now = timezone.now()
+        for quantity, book_ids in by_quantity.items():
+            for chunk in _chunks(book_ids, batch_size):
+                Book.objects.filter(pk__in=chunk).update(
+                    total_copies=F('total_copies') + quantity,
+                    available_copies=F('available_copies') + quantity,
+                    status=Case(When(status='borrowed', then=Value('available')), default=F('status')),
+                    updated_date=now,
+                )
+        stats.apply(changes)
+
+        # bulk_update har qator uchun CASE ni Python'da quradi (5000 qatorda
+        # soniyalar); ISBN li yuklar kitobga bitta UPDATE bilan ISBN bo'yicha
+        # bog'lanadi, qolganlari (odatda oz) bulk_update bilan
+        by_isbn = [item.pk for item in items if item.isbn and not item.book_id]
+        for chunk in _chunks(by_isbn, batch_size):
+            IncomingBooks.objects.filter(pk__in=chunk).update(
+                book=Subquery(Book.objects.filter(isbn=OuterRef('isbn')).values('pk')),
+                is_arrived=True, arrived_date=today,
+            )
+        others = [item for item in items if not item.isbn or item.book_id]
+        for item in others:
+            item.book_id = item.book.pk
+            item.is_arrived = True
+            item.arrived_date = today
+        IncomingBooks.objects.bulk_update(others, ['book', 'is_arrived', 'arrived_date'], batch_size=batch_size)
+    return len(created), len(refilled), sum(item.quantity for item in items)
+
+
+def _existing_books(items):
+    """Qabul qilinadigan qatorlarga mos mavjud kitoblar, qulflangan:
+    ``{('id', pk): book, ('isbn', isbn): book}``"""
+    ids = {item.book_id for item in items if item.book_id}
+    isbns = {item.isbn for item in items if item.isbn and not item.book_id}
+    fields = ('title', 'isbn', 'status', 'category', 'language', 'added_date')
+    books = {}
+    for chunk in _chunks(sorted(ids)):
+        books.update({('id', b.pk): b for b in Book.objects.select_for_update().only(*fields).filter(pk__in=chunk)})
+    for chunk in _chunks(sorted(isbns)):
+        books.update({('isbn', b.isbn): b for b in Book.objects.select_for_update().only(*fields).filter(isbn__in=chunk)})
+    return books
+
+
+def _chunks(values, size=BATCH_SIZE):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
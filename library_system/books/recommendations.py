@@ -0,0 +1,113 @@
+# books/recommendations.py
+""""Bu kitobni olganlar yana olgan" tavsiyalari.
+
+Birga olishlar matritsasi va har kitobning eng yaxshi TOP_K qo'shnisi
+``books.coborrow`` modulida: bu yerda faqat o'quvchilar (telefon raqami) savatlari olish tarixidan
+o'qiladi va natija ``BookNeighbor`` jadvaliga yoziladi. Kitob sahifasi
+qo'shnilarni (book, -score) indeksi bo'yicha bitta so'rov bilan o'qiydi.
+
+``manage.py build_recommendations`` jadvalni qaytadan quradi (haftada bir
+marta), ``--days 1`` esa faqat oxirgi kunda olingan kitoblar qatorlarini
+hisoblaydi: yangi olish C ning faqat shu kitob qatori va ustunini
+o'zgartiradi. Baho simmetrik, shuning uchun yangi baholar qo'shni
+kitoblarning saqlangan ro'yxatlaridagi eskilari o'rniga yoziladi.
+
+Savatlar butun tarixdan: issiq ``BorrowRecord`` va arxivga ko'chirilgan
+(books.archive) ``ArchivedBorrowRecord`` birga o'qiladi, shuning uchun
+arxivlash tavsiyalarni o'zgartirmaydi.
+"""
+from collections import Counter
+from itertools import chain
+
+from django.db import transaction
+
+from . import coborrow
+from .models import ArchivedBorrowRecord, BookNeighbor, BorrowRecord
+
+
+# olish tarixi: issiq jadval va arxiv (ustunlari bir xil)
+HISTORY = (BorrowRecord, ArchivedBorrowRecord)
+
+
+def _baskets(**filters):
+    """Har o'quvchi olgan kitoblar (takrorsiz, eng yangisi birinchi: issiq
+    jadval, keyin arxiv)"""
+    rows = chain.from_iterable(
+        model.objects.filter(**filters).order_by('borrower_phone', '-borrow_date')
+        .values_list('borrower_phone', 'book_id').iterator(chunk_size=5000)
+        for model in HISTORY
+    )
+    return coborrow.baskets(rows)
+
+
+def _pairs(**filters):
+    """Ikkala jadvaldan takrorsiz (o'quvchi, kitob) juftliklari, bitta so'rov"""
+    hot, archived = (
+        model.objects.filter(**filters).order_by().values_list('borrower_phone', 'book_id') for model in HISTORY
+    )
+    return hot.union(archived)
+
+
+def _reader_counts(book_ids):
+    """Kitobni olgan o'quvchilar soni, bazadan (qisman hisob uchun)"""
+    counts = Counter()
+    for chunk in coborrow.chunks(book_ids):
+        counts.update(book_id for _, book_id in _pairs(book_id__in=chunk))
+    return counts
+
+
+def compute(book_ids=None, k=coborrow.TOP_K):
+    """``{kitob: [(qo'shni, baho, birga olganlar), ...]}``; ``book_ids`` berilsa
+    faqat shu kitoblar qatorlari (ularni olgan o'quvchilar tarixidan)"""
+    if book_ids is None:
+        return coborrow.neighbors(_baskets(), k=k)
+    readers = set()
+    for chunk in coborrow.chunks(book_ids):
+        readers.update(phone for phone, _ in _pairs(book_id__in=chunk))
+    baskets = []
+    for chunk in coborrow.chunks(readers):
+        baskets.extend(_baskets(borrower_phone__in=chunk))
+    # qo'shnilarning boshqa o'quvchilari bu savatlarda yo'q: bazadan,
+    # faqat baholanadigan juftliklar uchun
+    return coborrow.neighbors(baskets, _reader_counts, book_ids, k)
+
+
+def _rows(neighbors):
+    return [
+        BookNeighbor(book_id=book_id, neighbor_id=other, score=score, together=together)
+        for book_id, row in neighbors.items()
+        for other, score, together in row
+    ]
+
+
+def rebuild(batch_size=5000):
+    """Jadvalni to'liq qayta hisoblaydi; saqlangan qatorlar sonini qaytaradi"""
+    rows = _rows(compute())
+    with transaction.atomic():
+        BookNeighbor.objects.all().delete()
+        BookNeighbor.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def _stored(book_ids):
+    return BookNeighbor.objects.filter(book_id__in=book_ids) \
+        .values_list('book_id', 'neighbor_id', 'score', 'together')
+
+
+def refresh(since, batch_size=5000):
+    """``since`` dan keyin olingan kitoblar qatorlarini qayta hisoblab, qo'shnilar
+    ro'yxatlariga qo'shadi; ``(yangilangan kitoblar, qatorlar)`` ni qaytaradi"""
+    borrowed = set(
+        BorrowRecord.objects.filter(borrow_date__gte=since).order_by().values_list('book_id', flat=True).distinct()
+    )
+    if not borrowed:
+        return 0, 0
+    # to'liq qatorlar: qatorning top K idan tushgan qo'shniga ham yangi baho kerak
+    neighbors = coborrow.merge(compute(borrowed, k=None), borrowed, _stored)
+
+    rows = _rows(neighbors)
+    with transaction.atomic():
+        for chunk in coborrow.chunks(neighbors):
+            BookNeighbor.objects.filter(book_id__in=chunk).delete()
+        BookNeighbor.objects.bulk_create(rows, batch_size=batch_size)
+    return len(neighbors), len(rows)
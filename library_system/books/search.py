@@ -0,0 +1,372 @@
+# books/search.py
+"""Kitob nomi, mualliflar va ISBN bo'yicha xatoga chidamli (trigram) qidiruv.
+
+ISBN yoki inventar raqami to'liq yozilsa, kitob noyob indeks bo'yicha
+darhol topiladi. Qolgan so'rovlar o'xshashlik bo'yicha saralanadi:
+
+* Postgres: ``pg_trgm`` (``%>`` operatori, 0008 migratsiyasidagi GIN
+  indekslar), o'rin ``word_similarity`` bo'yicha;
+* boshqa bazalar (SQLite): har jarayonda ikki qavatli n-gram indeks
+  (``LocalIndex``). Trigramlar lug'atdagi so'zlarga olib boradi (xato yozilgan
+  so'z ham o'xshashlari bilan topiladi), so'zlar esa kitob id lari ro'yxatiga.
+  Indeks bir marta quriladi yoki ``SEARCH_INDEX_PATH`` faylidan o'qiladi
+  (``manage.py build_search_index``); undan keyin o'zgargan kitoblar
+  ``updated_date`` indeksi bo'yicha olinib, alohida baholanadi.
+
+O'xshashlik ``pg_trgm`` dagidek: ikki so'z trigramlari kesishmasi /
+birlashmasi. Kitob bahosi har bir so'rov so'ziga eng o'xshash so'zi
+bahosining o'rtachasi, shuning uchun hamma so'zlari mos kelganlar yuqorida.
+"""
+import heapq
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Author, Book
+
+
+# qidiruv natijalari shundan ko'p saralanmaydi (10 sahifa)
+SEARCH_LIMIT = 240
+# so'zlar o'xshashligi chegarasi (pg_trgm.similarity_threshold kabi)
+THRESHOLD = 0.3
+# har so'rov so'zi uchun ko'rib chiqiladigan eng o'xshash so'zlar
+MAX_EXPANSIONS = 16
+MAX_QUERY_WORDS = 8
+# juda ko'p uchraydigan so'z yangi nomzod qo'shmaydi, faqat bahoni aniqlaydi
+RECRUIT_LIMIT = 50_000
+# indeksdan keyin shuncha kitob o'zgarsa, indeks qayta quriladi
+MAX_TAIL = 2000
+SYNC_INTERVAL = 1.0
+
+APOSTROPHES = dict.fromkeys(map(ord, "'`´ʹʻʼʽ‘’′"), None)
+ISBN_RE = re.compile(r'^(?:\d{9}[\dX]|\d{13})$')
+MAGIC = b'BKSRCH\x01\x00'
+# magic, qurilgan vaqt, so'zlar, so'zlar matni hajmi, id lar soni
+HEADER = struct.Struct('<8sdIII')
+
+
+def normalize(text):
+    """Kichik harf, diakritika va apostroflarsiz so'zlar"""
+    text = unicodedata.normalize('NFKD', (text or '').translate(APOSTROPHES)).casefold()
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.findall(r'\w+', text)
+
+
+def grams(word):
+    """pg_trgm dagidek: boshida ikki, oxirida bitta bo'sh joy"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared) if shared else 0.0
+
+
+def is_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def exact_match(query):
+    """To'liq ISBN yoki inventar raqami bo'yicha kitob id si (noyob indekslar)"""
+    token = query.strip()
+    if not token or ' ' in token or not any(ch.isdigit() for ch in token):
+        return None
+    isbn = token.replace('-', '').upper()
+    condition = Q(inventory_number=token)
+    if ISBN_RE.match(isbn):
+        condition |= Q(isbn=isbn)
+    return Book.objects.filter(condition).values_list('pk', flat=True).first()
+
+
+def search(query, limit=SEARCH_LIMIT):
+    """``query`` ga mos kitoblar: ``[(id, baho), ...]``, eng o'xshashi birinchi"""
+    pk = exact_match(query)
+    if pk is not None:
+        return [(pk, 1.0)]
+    if is_postgres():
+        return _postgres_search(query, limit)
+    words = list(dict.fromkeys(normalize(query)))[:MAX_QUERY_WORDS]
+    if not words:
+        return []
+    return get_index().search(words, limit)
+
+
+# --- Postgres ---
+
+def _postgres_search(query, limit):
+    # django.contrib.postgres faqat Postgres sozlamasida o'rnatiladi
+    from django.contrib.postgres.search import TrigramWordSimilarity
+    from django.db.models import FloatField, OuterRef, Subquery, Value
+    from django.db.models.functions import Coalesce, Greatest
+
+    similar_authors = Q(first_name__trigram_word_similar=query) | Q(last_name__trigram_word_similar=query)
+    by_author = Book.authors.through.objects.filter(
+        author__in=Author.objects.filter(similar_authors)
+    ).values('book_id')
+    author_rank = Author.objects.filter(book=OuterRef('pk')).annotate(
+        rank=Greatest(TrigramWordSimilarity(query, 'first_name'), TrigramWordSimilarity(query, 'last_name'))
+    ).order_by('-rank').values('rank')[:1]
+    rows = Book.objects.filter(Q(title__trigram_word_similar=query) | Q(pk__in=by_author)).annotate(
+        rank=Greatest(
+            TrigramWordSimilarity(query, 'title'),
+            Coalesce(Subquery(author_rank, output_field=FloatField()), Value(0.0)),
+        )
+    ).order_by('-rank', '-pk').values_list('pk', 'rank')
+    return list(rows[:limit])
+
+
+# --- mahalliy indeks ---
+
+def book_words(rows):
+    """``(id, nom, [muallif ismlari])`` dan ``(id, so'zlar to'plami)``"""
+    for pk, title, names in rows:
+        words = set(normalize(title))
+        for name in names:
+            words.update(normalize(name))
+        yield pk, words
+
+
+def _db_rows(book_ids=None):
+    """Kitoblar id tartibida, mualliflari bilan"""
+    books = Book.objects.order_by('pk')
+    through = Book.authors.through.objects.order_by('book_id', 'author_id')
+    authors = Author.objects.order_by()
+    if book_ids is not None:
+        books, through = books.filter(pk__in=book_ids), through.filter(book_id__in=book_ids)
+        authors = authors.filter(pk__in=through.values('author_id'))
+    names = {
+        pk: f'{first} {last}'
+        for pk, first, last in authors.values_list('pk', 'first_name', 'last_name').iterator()
+    }
+    links = iter(through.values_list('book_id', 'author_id').iterator(chunk_size=5000))
+    link = next(links, None)
+    for pk, title in books.values_list('pk', 'title').iterator(chunk_size=5000):
+        authors = []
+        while link is not None and link[0] <= pk:
+            if link[0] == pk:
+                authors.append(names.get(link[1], ''))
+            link = next(links, None)
+        yield pk, title, authors
+
+
+class LocalIndex:
+    """So'zlar lug'ati, trigram -> so'zlar va so'z -> kitob id lari (o'sish tartibida)"""
+
+    def __init__(self, words, offsets, postings, built_at):
+        self.words = words
+        self.offsets = offsets
+        self.postings = postings
+        self.built_at = built_at
+        self.tail = {}  # indeksdan keyin o'zgargan kitoblar: id -> so'zlar trigramlari
+        self.checked = time.monotonic()
+        self.gram_words = {}
+        self.gram_counts = array('H')
+        for wid, word in enumerate(words):
+            word_grams = grams(word)
+            self.gram_counts.append(len(word_grams))
+            for gram in word_grams:
+                self.gram_words.setdefault(gram, array('I')).append(wid)
+
+    @classmethod
+    def build(cls, rows, built_at):
+        """``book_words`` natijasidan (kitoblar id o'sish tartibida)"""
+        by_word = {}
+        for pk, words in rows:
+            for word in words:
+                by_word.setdefault(word, array('I')).append(pk)
+        words = sorted(by_word)
+        offsets, postings = array('I', [0]), array('I')
+        for word in words:
+            postings.extend(by_word.pop(word))
+            offsets.append(len(postings))
+        return cls(words, offsets, postings, built_at)
+
+    def to_bytes(self):
+        blob = '\n'.join(self.words).encode()
+        header = HEADER.pack(MAGIC, self.built_at.timestamp(), len(self.words), len(blob), len(self.postings))
+        offsets, postings = array('I', self.offsets), array('I', self.postings)
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+            postings.byteswap()
+        return b''.join([header, blob, offsets.tobytes(), postings.tobytes()])
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, built_at, n_words, blob_len, n_postings = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("qidiruv indeksi fayli emas")
+        at = HEADER.size
+        words = data[at:at + blob_len].decode().split('\n') if n_words else []
+        at += blob_len
+        offsets = array('I')
+        offsets.frombytes(data[at:at + (n_words + 1) * 4])
+        at += (n_words + 1) * 4
+        postings = array('I')
+        postings.frombytes(data[at:at + n_postings * 4])
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+            postings.byteswap()
+        return cls(words, offsets, postings, datetime.fromtimestamp(built_at, tz=dt_timezone.utc))
+
+    def expand(self, word):
+        """``word`` ga o'xshash lug'at so'zlari: ``[(so'z id, o'xshashlik), ...]``"""
+        query_grams = grams(word)
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self.gram_words.get(gram, ()))
+        need = THRESHOLD * len(query_grams)
+        found = []
+        for wid, n in shared.items():
+            if n >= need:
+                sim = n / (len(query_grams) + self.gram_counts[wid] - n)
+                if sim >= THRESHOLD:
+                    found.append((sim, wid))
+        return [(wid, sim) for sim, wid in heapq.nlargest(MAX_EXPANSIONS, found)]
+
+    def _books(self, wid):
+        return self.postings[self.offsets[wid]:self.offsets[wid + 1]]
+
+    def search(self, words, limit):
+        expansions = [self.expand(word) for word in words]
+        sizes = [sum(self.offsets[w + 1] - self.offsets[w] for w, _ in ex) for ex in expansions]
+        if len(words) == 1 and not self.tail:
+            return self._top(expansions[0], limit)
+
+        scores = Counter()
+        for size, ex in sorted(zip(sizes, expansions), key=lambda item: item[0]):
+            best = {}
+            if not scores or size <= RECRUIT_LIMIT:
+                for wid, sim in ex:  # o'xshashlik kamayish tartibida
+                    for pk in self._books(wid):
+                        best.setdefault(pk, sim)
+            elif len(scores) * len(ex) * 16 < size:
+                # kam nomzod, uzun ro'yxat: ikkilik qidiruv
+                for wid, sim in ex:
+                    books, hi = self._books(wid), self.offsets[wid + 1] - self.offsets[wid]
+                    for pk in scores:
+                        if pk not in best:
+                            i = bisect_left(books, pk, 0, hi)
+                            if i < hi and books[i] == pk:
+                                best[pk] = sim
+            else:
+                for wid, sim in ex:
+                    for pk in self._books(wid):
+                        if pk in scores:
+                            best.setdefault(pk, sim)
+            scores.update(best)
+
+        for pk in self.tail:
+            scores.pop(pk, None)
+        query_grams = [grams(word) for word in words]
+        for pk, book_grams in self.tail.items():
+            score = sum(max((similarity(q, b) for b in book_grams), default=0) for q in query_grams)
+            if score >= THRESHOLD:
+                scores[pk] = score
+        n = len(words)
+        return [(pk, score / n) for score, pk in heapq.nlargest(limit, ((s, pk) for pk, s in scores.items()))]
+
+    def _top(self, expansions, limit):
+        """Bitta so'z: eng o'xshash so'zlar kitoblari, har birida eng yangisi birinchi"""
+        results, seen = [], set()
+        groups = {}
+        for wid, sim in expansions:
+            groups.setdefault(sim, []).append(wid)
+        for sim in sorted(groups, reverse=True):
+            need = limit - len(results)
+            if need <= 0:
+                break
+            tails = [self._books(wid)[-need - len(seen):] for wid in groups[sim]]
+            for pk in heapq.nlargest(need + len(seen), (pk for tail in tails for pk in tail)):
+                if pk not in seen:
+                    seen.add(pk)
+                    results.append((pk, sim))
+                    if len(results) >= limit:
+                        break
+        return results
+
+    def refresh_tail(self):
+        """``built_at`` dan keyin o'zgargan kitoblar; ko'p bo'lsa False"""
+        changed = list(
+            Book.objects.filter(updated_date__gt=self.built_at).order_by().values_list('pk', flat=True)[:MAX_TAIL + 1]
+        )
+        if len(changed) > MAX_TAIL:
+            return False
+        self.tail = {
+            pk: [grams(word) for word in words]
+            for pk, words in book_words(_db_rows(changed))
+        } if changed else {}
+        return True
+
+
+_index = None
+_loading = threading.Lock()
+
+
+def build_index():
+    built_at = timezone.now()  # o'qishdan oldin: keyingi o'zgarishlar "tail" ga tushadi
+    return LocalIndex.build(book_words(_db_rows()), built_at)
+
+
+def write_index(path):
+    """Indeksni qurib ``path`` ga atomar yozadi; hajmini qaytaradi"""
+    data = build_index().to_bytes()
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as fh:
+        fh.write(data)
+    os.replace(fh.name, path)
+    return len(data)
+
+
+def _load(rebuild=False):
+    path = getattr(settings, 'SEARCH_INDEX_PATH', None)
+    if not path:
+        index = build_index()
+    else:
+        if rebuild or not os.path.exists(path):
+            write_index(path)
+        with open(path, 'rb') as fh:
+            index = LocalIndex.from_bytes(fh.read())
+        index.mtime = os.path.getmtime(path)
+    if not index.refresh_tail() and not rebuild:
+        return _load(rebuild=True)  # fayl juda eski
+    return index
+
+
+def get_index():
+    """Shu jarayonning indeksi; har ``SYNC_INTERVAL`` da o'zgarganlar qayta o'qiladi"""
+    global _index
+    if _index is None:
+        with _loading:
+            if _index is None:
+                _index = _load()
+    index = _index
+    if time.monotonic() - index.checked >= SYNC_INTERVAL:
+        index.checked = time.monotonic()
+        path = getattr(settings, 'SEARCH_INDEX_PATH', None)
+        if path and os.path.exists(path) and os.path.getmtime(path) != getattr(index, 'mtime', None):
+            index = _index = _load()  # build_search_index qayta yozgan
+        elif not index.refresh_tail():
+            index = _index = _load(rebuild=True)
+    return index
+
+
+def reset():
+    """Jarayon indeksini unutish (testlar, baza tiklangandan keyin)"""
+    global _index
+    _index = None
@@ -0,0 +1,65 @@
+# books/services.py
+"""Kitob berish va qaytarish.
+
+Har bir amal bitta qisqa tranzaksiya: nusxalar soni Python'da emas,
+``UPDATE ... SET available_copies = available_copies - 1 WHERE
+available_copies > 0`` sharti bilan o'zgartiriladi. Ikki kutubxonachi
+oxirgi nusxani bir vaqtda bersa, ikkinchisining UPDATE'i hech bir qatorga
+tegmaydi va ``BookUnavailable`` bo'ladi; yangilanishlar yo'qolmaydi.
+
+``update()`` signal yubormaydi, shuning uchun holat o'zgarishi va yopilgan
+yozuv ``books.stats`` ga shu yerda yoziladi.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import stats
+from .models import Book, BorrowRecord
+
+
+class CirculationError(Exception):
+    """Kitob yoki yozuv amal uchun kerakli holatda emas"""
+
+
+class BookUnavailable(CirculationError):
+    pass
+
+
+class RecordNotOpen(CirculationError):
+    pass
+
+
+def borrow_book(book_id, **record):
+    """``book_id`` dan bitta nusxa berib, ``BorrowRecord`` ni qaytaradi;
+    bo'sh nusxa qolmagan bo'lsa ``BookUnavailable``"""
+    with transaction.atomic():
+        taken = Book.objects.filter(pk=book_id, available_copies__gt=0).update(
+            available_copies=F('available_copies') - 1
+        )
+        if not taken:
+            raise BookUnavailable(book_id)
+        borrowed = BorrowRecord.objects.create(book_id=book_id, **record)
+        # oxirgi nusxa ketdi
+        if Book.objects.filter(pk=book_id, available_copies=0, status='available').update(status='borrowed'):
+            stats.apply({(stats.TOTAL, 'available'): -1})
+    return borrowed
+
+
+def return_book(record_id):
+    """Ochiq yozuvni yopib, kitob id sini qaytaradi; yopiq bo'lsa ``RecordNotOpen``"""
+    with transaction.atomic():
+        closed = BorrowRecord.objects.filter(pk=record_id, is_returned=False).update(
+            is_returned=True, return_date=timezone.localdate()
+        )
+        if not closed:
+            raise RecordNotOpen(record_id)
+        book_id, due_date = BorrowRecord.objects.filter(pk=record_id).values_list('book_id', 'due_date').get()
+        stats.apply(stats.loan_changes(due_date, None))
+        # hisob buzilgan bo'lsa ham jami nusxadan oshmaydi (books_book_copies_range)
+        Book.objects.filter(pk=book_id, available_copies__lt=F('total_copies')).update(
+            available_copies=F('available_copies') + 1
+        )
+        if Book.objects.filter(pk=book_id, available_copies__gt=0, status='borrowed').update(status='available'):
+            stats.apply({(stats.TOTAL, 'available'): 1})
+    return book_id
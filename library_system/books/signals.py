@@ -0,0 +1,122 @@
+# books/signals.py
+import logging
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import stats, thumbnails
+from .models import Author, Book, BorrowRecord, Category
+
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Book)
+def refresh_cover_thumbnails(sender, instance, raw=False, **kwargs):
+    """Yangi muqova yuklanganda kichik nusxalarni yaratish"""
+    name = instance.cover_image.name if instance.cover_image else ''
+    unchanged = name == getattr(instance, '_loaded_cover', None)
+    if raw or (unchanged and (instance.cover_hash or not name)):
+        return
+    instance._loaded_cover = name
+    if not name:
+        Book.objects.filter(pk=instance.pk).update(cover_hash='')
+        return
+    # fayl saqlangandan keyin; xesh update() bilan yoziladi, signal qaytalanmaydi
+    transaction.on_commit(lambda: render_cover(instance.pk, name))
+
+
+def render_cover(book_id, name):
+    try:
+        digest = thumbnails.render_derivatives(name)
+    except OSError:
+        logger.exception("Muqova nusxalarini yaratib bo'lmadi: %s", name)
+        return
+    Book.objects.filter(pk=book_id, cover_image=name).update(cover_hash=digest)
+
+
+# --- StatCounter (books.stats) ---
+
+@receiver(pre_save, sender=Book)
+@receiver(pre_save, sender=BorrowRecord)
+def remember_stats_state(sender, instance, raw=False, **kwargs):
+    """only()/defer() bilan o'qilgan obyektning eski holati bazadan olinadi"""
+    if raw or instance._state.adding or hasattr(instance, '_loaded_stats'):
+        return
+    old = sender.objects.filter(pk=instance.pk).first()
+    instance._loaded_stats = old.stats_state() if old is not None else None
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=BorrowRecord)
+def count_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = None if created else instance._loaded_stats
+    new = instance.stats_state()
+    changes = stats.book_changes if sender is Book else stats.loan_changes
+    stats.apply(changes(old, new))
+    instance._loaded_stats = new
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=BorrowRecord)
+def count_deleted(sender, instance, **kwargs):
+    old = instance._loaded_stats if hasattr(instance, '_loaded_stats') else instance.stats_state()
+    changes = stats.book_changes if sender is Book else stats.loan_changes
+    stats.apply(changes(old, None))
+
+
+@receiver(post_save, sender=Category)
+def count_category(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        stats.category_saved(instance, created)
+
+
+@receiver(post_delete, sender=Category)
+def uncount_category(sender, instance, **kwargs):
+    stats.category_deleted(instance)
+
+
+@receiver(post_save, sender=Author)
+def count_author(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.apply({(stats.TOTAL, 'authors'): 1})
+
+
+@receiver(post_delete, sender=Author)
+def uncount_author(sender, instance, **kwargs):
+    stats.apply({(stats.TOTAL, 'authors'): -1})
+
+
+# --- qidiruv indeksi (books.search) ---
+# Indeks updated_date bo'yicha o'zgargan kitoblarni qayta o'qiydi; muallif
+# ismi yoki ro'yxati o'zgarsa kitobning o'zi saqlanmaydi, shuning uchun
+# updated_date shu yerda yangilanadi.
+
+def touch_books(books):
+    books.update(updated_date=timezone.now())
+
+
+@receiver(post_save, sender=Author)
+def touch_author_books(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        touch_books(Book.objects.filter(authors=instance))
+
+
+@receiver(pre_delete, sender=Author)
+def touch_orphaned_books(sender, instance, **kwargs):
+    touch_books(Book.objects.filter(authors=instance))
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def touch_relinked_books(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        touch_books(Book.objects.filter(pk=instance.pk))
+    elif reverse and action in ('post_add', 'post_remove'):
+        touch_books(Book.objects.filter(pk__in=pk_set))
+    elif reverse and action == 'pre_clear':
+        # tozalangandan keyin qaysi kitoblar bo'lgani noma'lum
+        touch_books(Book.objects.filter(authors=instance))
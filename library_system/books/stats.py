@@ -0,0 +1,225 @@
+# books/stats.py
+"""Bosh sahifa va statistika sahifasi uchun tayyor sanoqlar.
+
+Har bir ko'rsatkich ``StatCounter`` jadvalida bitta qator: jami sonlar,
+har kategoriya va til bo'yicha kitoblar, ochiq olishlar qaytarish muddati
+bo'yicha va oxirgi kunlarda qo'shilgan kitoblar kun bo'yicha. Sahifalar
+hammasini bitta so'rov bilan o'qiydi (``snapshot``).
+
+Qatorlarni ``books.signals`` kitob, olish yozuvi, kategoriya va muallif
+saqlanganda/o'chirilganda shu tranzaksiya ichida ``F()`` bilan oshiradi
+yoki kamaytiradi. Muddati o'tganlar muddat sanasi bugundan oldingi
+qatorlar yig'indisi, shuning uchun kunlar o'tishi bilan qayta hisoblash
+kerak emas.
+
+``bulk_create``/``update()`` signal yubormaydi: ularni ishlatgan kod
+(generate_dataset, ommaviy import) oxirida ``rebuild()`` chaqiradi yoki
+``manage.py rebuild_statistics`` ishga tushiriladi. Jami qatorlarni
+0012 migratsiyasi va ``rebuild()`` yaratadi; ular yo'q bo'lsa (jadval
+qo'lda tozalangan) ``snapshot()`` nollarni qaytaradi, so'rov ichida
+qayta hisoblamaydi.
+
+Har berish/qaytarish bir xil jami qatorlarni (``available``,
+``open_loans``) oshiradi: qator qulfi tranzaksiya oxirigacha turadi,
+shuning uchun hamma olish tranzaksiyalari shu qatorlarda navbatma-navbat
+o'tadi. Yuklama oshsa, jami qatorlarni bir nechta bo'lakka (kalit
+bo'yicha shard) bo'lish kerak bo'ladi.
+"""
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Author, Book, BorrowRecord, Category, StatCounter
+
+
+# "Oxirgi 30 kunda qo'shilgan": bugun va undan oldingi 29 kun
+RECENT_DAYS = 30
+
+TOTAL, CATEGORY, LANGUAGE, DUE, ADDED = (
+    StatCounter.TOTAL, StatCounter.CATEGORY, StatCounter.LANGUAGE, StatCounter.DUE, StatCounter.ADDED,
+)
+
+
+def recent_start(today=None):
+    return (today or timezone.localdate()) - timedelta(days=RECENT_DAYS - 1)
+
+
+def book_changes(old, new):
+    """Kitob ``stats_state()`` holati o'zgarganda qatorlarga qo'shiladigan sonlar"""
+    changes = Counter()
+    start = recent_start()
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None:
+            continue
+        category, language, status, added_on = state
+        changes[TOTAL, 'books'] += sign
+        changes[CATEGORY, str(category or '')] += sign
+        changes[LANGUAGE, language] += sign
+        if status == 'available':
+            changes[TOTAL, 'available'] += sign
+        if added_on >= start:
+            changes[ADDED, added_on.isoformat()] += sign
+    return changes
+
+
+def loan_changes(old, new):
+    """Olish yozuvi ochilganda/yopilganda yoki muddati o'zgarganda"""
+    changes = Counter()
+    for due_date, sign in ((old, -1), (new, 1)):
+        if due_date is not None:
+            changes[TOTAL, 'open_loans'] += sign
+            changes[DUE, due_date.isoformat()] += sign
+    return changes
+
+
+def apply(changes):
+    """Qatorlarni ``changes`` bo'yicha o'zgartiradi; yo'q qatorni yaratadi.
+
+    Hamma o'zgarish bitta ``UPDATE ... SET value = value + CASE ... END``
+    bilan; yangi qatorlar bo'lsagina qo'shimcha so'rovlar.
+    """
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes:
+        return
+    now = timezone.now()
+    if _increment(changes, now) == len(changes):
+        return
+    found = set(StatCounter.objects.filter(_matching(changes)).values_list('kind', 'key'))
+    # jami qatorlarni faqat migratsiya va rebuild() yaratadi: qisman son yozilmasin
+    missing = [(kind, key) for kind, key in changes if (kind, key) not in found and kind != TOTAL]
+    if not missing:
+        return
+    if any(kind == ADDED for kind, _ in missing):
+        # yangi kun qatori kuniga bir marta: sahifa o'qimaydigan eskilarini shu yerda o'chiramiz
+        StatCounter.objects.filter(kind=ADDED, key__lt=recent_start().isoformat()).delete()
+    category_ids = [key for kind, key in missing if kind == CATEGORY and key]
+    labels = {
+        str(pk): name for pk, name in Category.objects.filter(pk__in=category_ids).values_list('pk', 'name')
+    } if category_ids else {}
+    # parallel tranzaksiya qatorni birinchi yaratgan bo'lsa ham: 0 bilan
+    # yaratilib (mavjudi o'tkazib yuboriladi), keyin oshiriladi
+    StatCounter.objects.bulk_create([
+        StatCounter(kind=kind, key=key, label=labels.get(key, '') if kind == CATEGORY else '', value=0, updated_at=now)
+        for kind, key in missing
+    ], ignore_conflicts=True)
+    _increment({key: changes[key] for key in missing}, now)
+
+
+def _matching(changes):
+    condition = Q()
+    for kind, key in changes:
+        condition |= Q(kind=kind, key=key)
+    return condition
+
+
+def _increment(changes, now):
+    """Bitta UPDATE; topilgan qatorlar sonini qaytaradi"""
+    delta = Case(
+        *(When(kind=kind, key=key, then=Value(n)) for (kind, key), n in changes.items()),
+        default=Value(0),
+    )
+    return StatCounter.objects.filter(_matching(changes)).update(value=F('value') + delta, updated_at=now)
+
+
+def category_saved(category, created):
+    """Kitobsiz kategoriya ham ro'yxatda bo'lsin; nomi o'zgarsa yangilanadi"""
+    if created:
+        StatCounter.objects.get_or_create(kind=CATEGORY, key=str(category.pk), defaults={'label': category.name})
+        apply({(TOTAL, 'categories'): 1})
+    else:
+        StatCounter.objects.filter(kind=CATEGORY, key=str(category.pk)).update(label=category.name)
+
+
+def category_deleted(category):
+    """Kitoblari kategoriyasiz (SET_NULL) qoldi: sanog'i '' qatoriga o'tadi"""
+    row = StatCounter.objects.filter(kind=CATEGORY, key=str(category.pk)).first()
+    changes = Counter({(TOTAL, 'categories'): -1})
+    if row is not None:
+        changes[CATEGORY, ''] += row.value
+        row.delete()
+    apply(changes)
+
+
+def compute():
+    """Barcha qatorlarni bazadan qaytadan hisoblaydi (saqlamaydi)"""
+    now = timezone.now()
+    values = Counter({
+        (TOTAL, 'books'): Book.objects.count(),
+        (TOTAL, 'authors'): Author.objects.count(),
+        (TOTAL, 'categories'): Category.objects.count(),
+        (TOTAL, 'available'): Book.objects.filter(status='available').count(),
+        (TOTAL, 'open_loans'): BorrowRecord.objects.filter(is_returned=False).count(),
+    })
+    labels = {}
+    for pk, name in Category.objects.values_list('pk', 'name'):
+        values[CATEGORY, str(pk)] = 0
+        labels[CATEGORY, str(pk)] = name
+    for category, n in Book.objects.order_by().values_list('category').annotate(n=Count('id')):
+        values[CATEGORY, str(category or '')] = n
+    for language, n in Book.objects.order_by().values_list('language').annotate(n=Count('id')):
+        values[LANGUAGE, language] = n
+    open_records = BorrowRecord.objects.filter(is_returned=False).order_by()
+    for due_date, n in open_records.values_list('due_date').annotate(n=Count('id')):
+        values[DUE, due_date.isoformat()] = n
+    start = timezone.make_aware(datetime.combine(recent_start(), time.min))
+    added = Book.objects.filter(added_date__gte=start).order_by() \
+        .values_list(TruncDate('added_date')).annotate(n=Count('id'))
+    for day, n in added:
+        values[ADDED, day.isoformat()] = n
+    return [
+        StatCounter(kind=kind, key=key, label=labels.get((kind, key), ''), value=n, updated_at=now)
+        for (kind, key), n in values.items()
+    ]
+
+
+def rebuild():
+    """Jadvalni ``compute()`` natijasi bilan almashtiradi; qatorlar sonini qaytaradi"""
+    with transaction.atomic():
+        rows = compute()
+        StatCounter.objects.all().delete()
+        StatCounter.objects.bulk_create(rows)
+    return len(rows)
+
+
+def snapshot(today=None):
+    """Sahifalar uchun barcha ko'rsatkichlar, bitta so'rov bilan.
+
+    Yo'q qatorlar nol: bo'sh jadvalni ``manage.py rebuild_statistics``
+    to'ldiradi.
+    """
+    today = today or timezone.localdate()
+    rows = list(StatCounter.objects.exclude(kind=ADDED, key__lt=recent_start(today).isoformat()))
+    totals, categories, languages = Counter(), [], []
+    overdue = recent = 0
+    updated_at = None
+    for row in rows:
+        if updated_at is None or row.updated_at > updated_at:
+            updated_at = row.updated_at
+        if row.kind == TOTAL:
+            totals[row.key] = row.value
+        elif row.kind == CATEGORY and row.key:
+            categories.append({'id': int(row.key), 'name': row.label, 'book_count': row.value})
+        elif row.kind == LANGUAGE and row.value:
+            languages.append({'language': row.key, 'count': row.value})
+        elif row.kind == DUE and row.key < today.isoformat():
+            overdue += row.value
+        elif row.kind == ADDED:
+            recent += row.value
+    categories.sort(key=lambda c: (-c['book_count'], c['name']))
+    languages.sort(key=lambda lang: (-lang['count'], lang['language']))
+    return {
+        'total_books': totals['books'],
+        'total_authors': totals['authors'],
+        'total_categories': totals['categories'],
+        'available_books': totals['available'],
+        'borrowed_books': totals['open_loans'],
+        'overdue_books': overdue,
+        'recent_additions': recent,
+        'category_stats': categories,
+        'language_stats': languages,
+        'updated_at': updated_at,
+    }
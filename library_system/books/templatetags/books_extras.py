@@ -0,0 +1,31 @@
+# books/templatetags/books_extras.py
+from django import template
+from django.utils.html import format_html
+
+from books import thumbnails
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def cover_img(book, css_class='', sizes='(max-width: 768px) 100vw, 320px', style=''):
+    """Muqova nusxalari bilan <picture> (WebP + JPEG srcset).
+
+    Nusxalar hali tayyor bo'lmasa, asl rasm ko'rsatiladi.
+    """
+    if not book.cover_image:
+        return ''
+    if not book.cover_hash:
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" style="{}" loading="lazy">',
+            book.cover_image.url, css_class, book.title, style,
+        )
+    name, digest = book.cover_image.name, book.cover_hash
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" style="{}" loading="lazy"></picture>',
+        thumbnails.srcset(name, digest, 'webp'), sizes,
+        thumbnails.derivative_url(name, digest, thumbnails.WIDTHS[1], 'jpg'),
+        thumbnails.srcset(name, digest, 'jpg'), sizes, css_class, book.title, style,
+    )
@@ -1,3 +1,928 @@
-from django.test import TestCase
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    ArchivedBorrowRecord, Author, Book, BookNeighbor, BorrowRecord, Category, IncomingBooks, Notification, StatCounter,
+)
+from . import archive, coborrow, pagination, receiving, recommendations, search, services, stats
+from .notifications import BaseBackend, deliver_pending, get_backend
+from .querybudget import QueryBudgetExceeded
+from .views import BOOK_SORTS
+
+
+# parallel testlar o'tkazuvchanligi (logging sozlanmasa ko'rinmaydi)
+logger = logging.getLogger(__name__)
+
+
+def rounded(neighbors):
+    # float32 (SciPy) va float (Python) baholari oxirgi xonalarda farq qiladi
+    return {book: [(other, round(score, 6), together) for other, score, together in row]
+            for book, row in neighbors.items()}
+
+
+def neighbors_python(baskets, reader_counts, book_ids, k=coborrow.TOP_K):
+    """coborrow.neighbors_sparse oddiy Pythonda: u shu bilan solishtiriladi"""
+    rows = {}
+    for basket in baskets:
+        if len(basket) < 2:
+            continue
+        for book_id in basket if book_ids is None else (b for b in basket if b in book_ids):
+            rows.setdefault(book_id, Counter()).update(basket)
+    needed = set(rows)
+    for row in rows.values():
+        needed.update(other for other, together in row.items() if together >= coborrow.MIN_TOGETHER)
+    n = reader_counts(needed)
+    result = {}
+    for book_id, row in rows.items():
+        scored = sorted(
+            (-together / math.sqrt(n[book_id] * n[other]), other, together)
+            for other, together in row.items()
+            if together >= coborrow.MIN_TOGETHER and other != book_id
+        )
+        if scored:
+            result[book_id] = [(other, -score, together) for score, other, together in scored[:k]]
+    return result
+
+
+def make_book(n, category, authors, copies=2):
+    book = Book.objects.create(
+        title=f'Kitob {n}',
+        category=category,
+        isbn=f'978000000{n:04}',
+        publication_year=2000 + n,
+        inventory_number=f'INV-{n}',
+        shelf_location='A-1',
+        total_copies=copies,
+        available_copies=copies,
+    )
+    book.authors.set(authors)
+    return book
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    """Sahifalar ma'lumot soniga qaramay o'z @query_budget chegarasida qoladi"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('kutubxonachi')
+        today = timezone.now().date()
+        categories = [Category.objects.create(name=f'Kategoriya {i}') for i in range(3)]
+        authors = [Author.objects.create(first_name=f'Ism{i}', last_name=f'Familiya{i}') for i in range(4)]
+        cls.books = [
+            make_book(n, categories[n % 3], authors[n % 4:n % 4 + 2])
+            for n in range(8)
+        ]
+        for n, book in enumerate(cls.books):
+            BorrowRecord.objects.create(
+                book=book, borrower_name=f'Oluvchi {n}', borrower_phone='+998900000000',
+                due_date=today - timedelta(days=n - 3),
+                is_returned=n % 2 == 0, return_date=today if n % 2 == 0 else None,
+            )
+        for n in range(4):
+            IncomingBooks.objects.create(
+                title=f'Yangi {n}', category=categories[n % 3], quantity=5,
+                expected_date=today + timedelta(days=n - 2), is_arrived=n == 0,
+                arrived_date=today if n == 0 else None,
+            )
+        # TransactionTestCase'lar jadvalni tozalaydi: migratsiya qatorlariga tayanmaymiz
+        stats.rebuild()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        # qidiruv indeksini qurish ham (birinchi qidiruvda bir marta)
+        search.reset()
+        search.get_index()
+
+    def test_pages_stay_within_budget(self):
+        book = self.books[0]
+        record = BorrowRecord.objects.filter(is_returned=False).first()
+        urls = [
+            reverse('home'),
+            reverse('book_list'),
+            reverse('book_list') + '?search=Kitob&sort=title',
+            reverse('book_detail', args=[book.pk]),
+            reverse('book_detail', args=[book.pk]) + '?archive=1',
+            reverse('incoming_books'),
+            reverse('statistics'),
+            reverse('borrow_book', args=[book.pk]),
+            reverse('borrow_history'),
+            reverse('borrow_history') + '?archive=1',
+            reverse('admin:books_book_changelist'),
+            reverse('admin:books_category_changelist'),
+            reverse('admin:books_borrowrecord_changelist'),
+            reverse('admin:books_incomingbooks_changelist'),
+            reverse('return_book', args=[record.pk]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn(response.status_code, (200, 302))
+                self.assertIn('desc="', response['Server-Timing'])
+
+    @override_settings(QUERY_BUDGETS={'book_list': 1})
+    def test_exceeded_budget_raises(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'book_list ran'):
+            self.client.get(reverse('book_list'))
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class BookListTests(TestCase):
+    """book_list: yengil kartochkalar, chegaralangan sanoq, yaroqsiz filtrlar"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Roman')
+        cls.author = Author.objects.create(first_name='Abdulla', last_name='Qodiriy', bio='x' * 1000)
+        other = Author.objects.create(first_name='Cho\'lpon', last_name='Sulaymon')
+        cls.books = [make_book(n, category, [cls.author if n % 2 else other]) for n in range(6)]
+
+    def setUp(self):
+        search.reset()
+
+    def test_cards_skip_large_fields(self):
+        response = self.client.get(reverse('book_list'))
+        books = list(response.context['books'])
+        self.assertEqual(len(books), 6)
+        self.assertIn('description', books[0].get_deferred_fields())
+        self.assertIn('bio', books[0].authors.all()[0].get_deferred_fields())
+
+    def test_search_matches_authors_without_duplicates(self):
+        self.books[1].authors.add(Author.objects.create(first_name='Abdulla', last_name='Oripov'))
+        response = self.client.get(reverse('book_list'), {'search': 'abdulla'})
+        self.assertEqual(response.context['total_count'], 3)
+        self.assertEqual(len(response.context['books']), 3)
+
+    def test_count_is_capped(self):
+        with patch('books.views.BOOK_COUNT_LIMIT', 4):
+            response = self.client.get(reverse('book_list'))
+        self.assertEqual(response.context['total_count'], 5)
+        self.assertContains(response, '4 tadan ortiq')
+
+    def test_invalid_filters_are_ignored(self):
+        response = self.client.get(reverse('book_list'), {'category': 'abc', 'status': 'x', 'sort': 'description'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['books']), 6)
+        self.assertEqual(response.context['selected_sort'], '-added_date')
+
+
+class KeysetPaginationTests(TestCase):
+    """Kursor bo'yicha sahifalar: har saralashda har kitob bir marta, tenglari ham"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Roman')
+        cls.books = [make_book(n, category, []) for n in range(7)]
+        # takroriy nomlar, yillar va qo'shilgan vaqt: ularni faqat pk ajratadi
+        for book in cls.books:
+            Book.objects.filter(pk=book.pk).update(title=f'Kitob {book.pk % 3}', publication_year=2000 + book.pk % 2)
+        Book.objects.update(added_date=cls.books[0].added_date)
+
+    def walk(self, sort):
+        seen, params = [], {'sort': sort}
+        with patch('books.views.BOOKS_PER_PAGE', 2):
+            while True:
+                page = self.client.get(reverse('book_list'), params).context['page']
+                seen += [b.pk for b in page]
+                if not page.has_next:
+                    return seen
+                params['after'] = page.next_cursor
+
+    def test_each_sort_walks_every_book_once(self):
+        for sort, ordering in BOOK_SORTS.items():
+            with self.subTest(sort=sort):
+                self.assertEqual(self.walk(sort), list(Book.objects.order_by(*ordering).values_list('pk', flat=True)))
+
+    def test_ties_are_broken_by_pk(self):
+        ids = sorted(b.pk for b in self.books)
+        self.assertEqual(self.walk('-added_date'), ids[::-1])
+        same_title = [pk for pk in ids if pk % 3 == 0]
+        self.assertEqual([pk for pk in self.walk('title') if pk in same_title], same_title)
+        self.assertEqual([pk for pk in self.walk('-title') if pk in same_title], same_title[::-1])
+
+    def test_forged_or_stale_cursor_restarts(self):
+        first = pagination.keyset_paginate(Book.objects.all(), 'title', BOOK_SORTS['title'], per_page=2)
+        # boshqa kalit bilan imzolangan: imzo tekshirilmasa qiymatlari qabul qilinardi
+        forged = signing.dumps(['title', ['Kitob 2', self.books[-1].pk]], salt=pagination.SALT, key='boshqa')
+        stale = pagination.encode_cursor('title', ['Kitob 0'])  # eski, qisqaroq tartib kaliti
+        for after in ('garbage', forged, stale):
+            with self.subTest(after=after):
+                page = pagination.keyset_paginate(
+                    Book.objects.all(), 'title', BOOK_SORTS['title'], after=after, per_page=2
+                )
+                self.assertEqual(list(page), list(first))
+        response = self.client.get(reverse('book_list'), {'sort': 'title', 'after': forged})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page']), len(self.books))
+
+    def test_cursor_of_another_sort_restarts(self):
+        title_cursor = pagination.keyset_paginate(
+            Book.objects.all(), 'title', BOOK_SORTS['title'], per_page=2
+        ).next_cursor
+        response = self.client.get(reverse('book_list'), {'sort': '-publication_year', 'after': title_cursor})
+        self.assertEqual(
+            [b.pk for b in response.context['page']],
+            list(Book.objects.order_by(*BOOK_SORTS['-publication_year']).values_list('pk', flat=True)),
+        )
+
+
+@override_settings(SEARCH_INDEX_PATH=None)
+class SearchTests(TestCase):
+    """books.search: xatoga chidamli qidiruv, aniq ISBN/inventar raqami, yangilanishlar"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Roman')
+        cls.qodiriy = Author.objects.create(first_name='Abdulla', last_name='Qodiriy')
+        navoiy = Author.objects.create(first_name='Alisher', last_name='Navoiy')
+        cls.days = make_book(1, category, [cls.qodiriy])
+        cls.days.title = "O'tkan kunlar"
+        cls.days.save()
+        cls.scorpion = make_book(2, category, [cls.qodiriy])
+        cls.scorpion.title = 'Mehrobdan chayon'
+        cls.scorpion.save()
+        cls.khamsa = make_book(3, category, [navoiy])
+        cls.khamsa.title = 'Xamsa'
+        cls.khamsa.save()
+
+    def setUp(self):
+        search.reset()
+
+    def ids(self, query):
+        return [pk for pk, _ in search.search(query)]
+
+    def test_typos_and_apostrophes(self):
+        self.assertEqual(self.ids('otkan kunlr'), [self.days.pk])
+        self.assertEqual(self.ids('O‘tkan'), [self.days.pk])
+        self.assertEqual(set(self.ids('Qodiri')), {self.days.pk, self.scorpion.pk})
+        self.assertEqual(self.ids('qwzx'), [])
+
+    def test_all_words_rank_first(self):
+        self.assertEqual(self.ids('qodiriy chayon')[0], self.scorpion.pk)
+
+    def test_exact_isbn_and_inventory_number(self):
+        self.assertEqual(search.search('978-0000000-003'), [(self.khamsa.pk, 1.0)])
+        self.assertEqual(search.search('INV-2'), [(self.scorpion.pk, 1.0)])
+
+    def test_changes_after_build_are_found(self):
+        search.get_index()
+        self.khamsa.title = 'Hayrat ul-abror'
+        self.khamsa.save()
+        self.qodiriy.last_name = 'Julqunboy'
+        self.qodiriy.save()
+        with patch('books.search.SYNC_INTERVAL', 0):
+            self.assertEqual(self.ids('hayrat'), [self.khamsa.pk])
+            self.assertEqual(self.ids('xamsa'), [])
+            self.assertEqual(set(self.ids('julqunboy')), {self.days.pk, self.scorpion.pk})
+            self.khamsa.authors.add(self.qodiriy)
+            self.assertEqual(len(self.ids('julqunboy')), 3)
+
+    def test_index_file_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'search.idx')
+            with override_settings(SEARCH_INDEX_PATH=path):
+                self.assertEqual(self.ids('xamsa'), [self.khamsa.pk])
+                self.assertTrue(os.path.exists(path))
+                with open(path, 'rb') as fh:
+                    loaded = search.LocalIndex.from_bytes(fh.read())
+                built = search.build_index()
+                self.assertEqual(loaded.words, built.words)
+                self.assertEqual(loaded.postings, built.postings)
+                out = StringIO()
+                call_command('build_search_index', '--probe', 'kunlar', stdout=out)
+                self.assertIn("'kunlar': 1 ta natija", out.getvalue())
+
+    def test_book_list_pages_by_relevance(self):
+        with patch('books.views.BOOKS_PER_PAGE', 1):
+            response = self.client.get(reverse('book_list'), {'search': 'qodiriy mehrob'})
+            self.assertEqual(response.context['selected_sort'], 'relevance')
+            self.assertEqual(response.context['total_count'], 2)
+            self.assertEqual([b.pk for b in response.context['books']], [self.scorpion.pk])
+            response = self.client.get(reverse('book_list'), {
+                'search': 'qodiriy mehrob', 'after': response.context['page'].next_cursor,
+            })
+        self.assertEqual([b.pk for b in response.context['books']], [self.days.pk])
+        self.assertFalse(response.context['page'].has_next)
+
+
+class RecommendationTests(TestCase):
+    """books.recommendations: birga olishlardan qo'shnilar, kunlik yangilash"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Roman')
+        author = Author.objects.create(first_name='Abdulla', last_name='Qodiriy')
+        cls.a, cls.b, cls.c, cls.d = [make_book(n, category, [author]) for n in range(4)]
+        week_ago = timezone.now() - timedelta(days=7)
+        for phone, books in [
+            ('+998901', [cls.a, cls.b, cls.c]),
+            ('+998902', [cls.a, cls.b]),
+            ('+998903', [cls.a, cls.c, cls.d]),
+            ('+998904', [cls.d]),
+        ]:
+            for book in books:
+                cls.borrow(phone, book, borrow_date=week_ago)
+
+    @staticmethod
+    def borrow(phone, book, **fields):
+        return BorrowRecord.objects.create(
+            book=book, borrower_name='Oluvchi', borrower_phone=phone,
+            due_date=timezone.localdate() + timedelta(days=14), **fields
+        )
+
+    def table(self):
+        return {
+            (row.book_id, row.neighbor_id): (round(row.score, 4), row.together)
+            for row in BookNeighbor.objects.all()
+        }
+
+    def test_rebuild_scores_co_borrowed_books(self):
+        recommendations.rebuild()
+        score = round(2 / 6 ** 0.5, 4)
+        self.assertEqual(self.table(), {
+            (self.a.pk, self.b.pk): (score, 2), (self.a.pk, self.c.pk): (score, 2),
+            (self.b.pk, self.a.pk): (score, 2), (self.c.pk, self.a.pk): (score, 2),
+        })
+
+    def test_refresh_matches_rebuild(self):
+        recommendations.rebuild()
+        self.borrow('+998902', self.c)
+        books, rows = recommendations.refresh(timezone.now() - timedelta(days=1))
+        self.assertEqual(books, 3)  # c va uning qo'shnilari a, b
+        refreshed = self.table()
+        recommendations.rebuild()
+        self.assertEqual(refreshed, self.table())
+        self.assertEqual(refreshed[self.c.pk, self.a.pk], (1.0, 3))
+
+    def test_archived_records_still_count(self):
+        recommendations.rebuild()
+        rebuilt = self.table()
+        BorrowRecord.objects.update(is_returned=True, return_date=timezone.now() - timedelta(days=365))
+        with self.assertLogs('books.archive', 'INFO'):
+            archive.run(archive.cutoff(180))
+        self.assertFalse(BorrowRecord.objects.exists())
+        recommendations.rebuild()
+        self.assertEqual(self.table(), rebuilt)
+        # kunlik yangilash ham arxivdagi tarixni o'qiydi
+        self.borrow('+998902', self.c)
+        recommendations.refresh(timezone.now() - timedelta(days=1))
+        refreshed = self.table()
+        recommendations.rebuild()
+        self.assertEqual(refreshed, self.table())
+        self.assertEqual(refreshed[self.c.pk, self.a.pk], (1.0, 3))
+
+    def test_sparse_and_python_agree(self):
+        self.borrow('+998902', self.c)
+        sparse_result = recommendations.compute()
+        with patch.object(coborrow, 'neighbors_sparse', neighbors_python):
+            python_result = recommendations.compute()
+        self.assertEqual(rounded(sparse_result), rounded(python_result))
+        self.assertEqual(recommendations.compute({self.c.pk}), {self.c.pk: sparse_result[self.c.pk]})
+
+    def test_merge_replaces_scores_that_left_the_top_k(self):
+        # 2-kitobning yangi qatorida 1-kitob 4-kitobdan past: 1-kitobning
+        # saqlangan ro'yxatida eski baho qolmasligi kerak
+        stored = {1: [(1, 2, 0.9, 5), (1, 3, 0.5, 2)], 4: []}
+        with patch.object(coborrow, 'TOP_K', 1):
+            neighbors = coborrow.merge(
+                {2: [(4, 0.8, 4), (1, 0.4, 2)]}, {2},
+                lambda chunk: [row for book_id in chunk for row in stored[book_id]],
+            )
+        self.assertEqual(neighbors, {2: [(4, 0.8, 4)], 1: [(3, 0.5, 2)], 4: [(2, 0.8, 4)]})
+
+    def test_detail_page_reads_neighbors(self):
+        call_command('build_recommendations', stdout=StringIO())
+        response = self.client.get(reverse('book_detail', args=[self.a.pk]))
+        self.assertEqual([book.pk for book in response.context['related_books']], [self.b.pk, self.c.pk])
+        self.assertContains(response, 'Bu kitobni olganlar yana olgan')
+        # tavsiyasi yo'q kitob: o'sha kategoriyadagilar
+        response = self.client.get(reverse('book_detail', args=[self.d.pk]))
+        self.assertFalse(response.context['also_borrowed'])
+        self.assertEqual(len(response.context['related_books']), 3)
+
+
+class ArchiveTests(TestCase):
+    """books.archive: eski yopilgan yozuvlar arxivga, tarix ikkala jadvaldan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Roman')
+        author = Author.objects.create(first_name='Abdulla', last_name='Qodiriy')
+        cls.book = make_book(1, category, [author])
+        today = timezone.localdate()
+        cls.old = [cls.borrow(today - timedelta(days=400 - n), returned=today - timedelta(days=300 - n))
+                   for n in range(5)]
+        cls.recent = cls.borrow(today - timedelta(days=20), returned=today - timedelta(days=5))
+        cls.open = cls.borrow(today - timedelta(days=3))
+
+    @classmethod
+    def borrow(cls, day, returned=None):
+        return BorrowRecord.objects.create(
+            book=cls.book, borrower_name='Oluvchi', borrower_phone='+998901',
+            borrow_date=timezone.make_aware(datetime.combine(day, datetime.min.time())),
+            due_date=day + timedelta(days=14), is_returned=returned is not None, return_date=returned,
+        )
+
+    def setUp(self):
+        # jarayon books.archive logiga yoziladi, test chiqishiga tushmasin
+        self.logs = self.enterContext(self.assertLogs('books.archive', 'INFO'))
+
+    def test_moves_old_closed_records_in_batches(self):
+        Notification.objects.create(record=self.old[0], kind=Notification.OVERDUE, recipient='+998901', message='.')
+        before = archive.cutoff(180)
+        self.assertEqual(archive.run(before, batch_size=2, max_batches=1), 2)
+        self.assertEqual(archive.run(before, batch_size=2), 3)
+        self.assertEqual(archive.run(before, batch_size=2), 0)
+        self.assertEqual(
+            [r.getMessage() for r in self.logs.records],
+            ['2 ta yozuv arxivlandi (jami 2)', '2 ta yozuv arxivlandi (jami 2)', '1 ta yozuv arxivlandi (jami 3)'],
+        )
+        self.assertEqual(
+            set(BorrowRecord.objects.values_list('pk', flat=True)), {self.recent.pk, self.open.pk}
+        )
+        moved = ArchivedBorrowRecord.objects.get(pk=self.old[0].pk)
+        self.assertEqual((moved.return_date, moved.borrower_phone), (self.old[0].return_date, '+998901'))
+        self.assertFalse(Notification.objects.exists())
+
+    def test_stats_and_command(self):
+        self.assertEqual(archive.stats(archive.cutoff(180)), {'hot': 7, 'open': 1, 'archivable': 5, 'archived': 0})
+        out = StringIO()
+        call_command('archive_borrows', '--dry-run', stdout=out)
+        self.assertEqual(BorrowRecord.objects.count(), 7)
+        call_command('archive_borrows', '--days', '1', stdout=out)
+        self.assertEqual(archive.stats(archive.cutoff(1)), {'hot': 1, 'open': 1, 'archivable': 0, 'archived': 6})
+        self.assertIn("6 ta yozuv arxivga ko'chirildi", out.getvalue())
+
+    def test_history_reads_archive_when_asked(self):
+        archive.run(archive.cutoff(180))
+        response = self.client.get(reverse('borrow_history'))
+        self.assertEqual([r.pk for r in response.context['returned_borrows']], [self.recent.pk])
+        response = self.client.get(reverse('borrow_history') + '?archive=1')
+        self.assertEqual(
+            [r.pk for r in response.context['returned_borrows']],
+            [self.recent.pk] + [record.pk for record in reversed(self.old)],
+        )
+        response = self.client.get(reverse('book_detail', args=[self.book.pk]) + '?archive=1')
+        self.assertEqual(
+            [r.pk for r in response.context['borrow_history']],
+            [self.open.pk, self.recent.pk] + [record.pk for record in reversed(self.old)][:3],
+        )
+
+
+class ReceivingTests(TestCase):
+    """books.receiving: kelgan yuklar fondga bitta tranzaksiyada"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Roman')
+        author = Author.objects.create(first_name='Abdulla', last_name='Qodiriy')
+        self.book = make_book(1, self.category, [author], copies=1)
+        Book.objects.filter(pk=self.book.pk).update(inventory_number='INV-00000041')
+        stats.rebuild()
+
+    def shipment(self, title, quantity=3, **fields):
+        return IncomingBooks.objects.create(
+            title=title, category=self.category, quantity=quantity,
+            expected_date=timezone.localdate(), **fields
+        )
+
+    def test_creates_and_refills_books(self):
+        services.borrow_book(self.book.pk, borrower_name='Oluvchi', borrower_phone='+998901',
+                             due_date=timezone.localdate() + timedelta(days=14))
+        refill = self.shipment('Kitob 1', isbn=self.book.isbn)
+        first = self.shipment('Yangi', isbn='9781111111111', publication_year=2024, shelf_location='B-2')
+        again = self.shipment('Yangi', quantity=2, isbn='9781111111111', publication_year=2024)
+        plain = self.shipment('ISBN siz', quantity=1, publication_year=2023)
+
+        self.assertEqual(receiving.receive(IncomingBooks.objects.all()), (2, 1, 9))
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.total_copies, self.book.available_copies, self.book.status), (4, 3, 'available'))
+        new = Book.objects.get(isbn='9781111111111')
+        self.assertEqual((new.total_copies, new.available_copies, new.shelf_location), (5, 5, 'B-2'))
+        self.assertEqual(
+            sorted(Book.objects.exclude(pk=self.book.pk).values_list('inventory_number', flat=True)),
+            ['INV-00000042', 'INV-00000043'],
+        )
+        for item, book in [(refill, self.book), (first, new), (again, new)]:
+            item.refresh_from_db()
+            self.assertEqual((item.book_id, item.is_arrived, item.arrived_date), (book.pk, True, timezone.localdate()))
+        plain.refresh_from_db()
+        self.assertEqual(plain.book.title, 'ISBN siz')
+
+        # statistika qayta hisoblanganiga teng
+        counters = set(StatCounter.objects.filter(value__gt=0).values_list('kind', 'key', 'value'))
+        stats.rebuild()
+        self.assertEqual(counters, set(StatCounter.objects.filter(value__gt=0).values_list('kind', 'key', 'value')))
+        # qayta qabul qilinmaydi
+        self.assertEqual(receiving.receive([refill.pk]), (0, 0, 0))
+
+    def test_invalid_batch_writes_nothing(self):
+        ok = self.shipment('Yangi', publication_year=2024)
+        no_year = self.shipment('Yilsiz')
+        with self.assertRaisesMessage(receiving.ReceivingError, 'Yilsiz'):
+            receiving.receive([ok.pk, no_year.pk])
+        self.assertEqual(Book.objects.count(), 1)
+        self.assertFalse(IncomingBooks.objects.filter(is_arrived=True).exists())
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_admin_action(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'parol')
+        self.client.force_login(admin)
+        item = self.shipment('Yangi', publication_year=2024)
+        # ketma-ketlik qatorini birinchi yaratish (bir martalik) budjetga kirmasin
+        with transaction.atomic():
+            receiving.inventory_numbers(1)
+        response = self.client.post(reverse('admin:books_incomingbooks_changelist'), {
+            'action': 'receive_shipments', '_selected_action': [item.pk],
+        }, follow=True)
+        self.assertContains(response, '3 nusxa qabul qilindi')
+        self.assertEqual(Book.objects.get(title='Yangi').added_by, admin)
+
+
+class StatCounterTests(TestCase):
+    """StatCounter signallar bilan to'g'ri yuritiladi va qayta hisoblash bilan bir xil"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Roman')
+        self.author = Author.objects.create(first_name='Abdulla', last_name='Qodiriy')
+        self.books = [make_book(n, self.category, [self.author]) for n in range(3)]
+        stats.rebuild()
+
+    def assertMatchesRebuild(self):
+        stored = {(r.kind, r.key): r.value for r in StatCounter.objects.all() if r.value}
+        fresh = {(r.kind, r.key): r.value for r in stats.compute() if r.value}
+        self.assertEqual(stored, fresh)
+
+    def borrow(self, book, due_date):
+        return BorrowRecord.objects.create(
+            book=book, borrower_name='Oluvchi', borrower_phone='+998900000000', due_date=due_date,
+        )
+
+    def test_incremental_changes_match_rebuild(self):
+        today = timezone.localdate()
+        late = self.borrow(self.books[0], today - timedelta(days=2))
+        self.borrow(self.books[1], str(today + timedelta(days=5)))  # view'dagi kabi satr
+        record = self.borrow(self.books[2], today)
+        record.is_returned, record.return_date = True, today
+        record.save()
+        late.due_date = today - timedelta(days=3)
+        late.save()
+
+        other = Category.objects.create(name='Tarix')
+        book = Book.objects.only('id', 'title').get(pk=self.books[1].pk)
+        book.category, book.status, book.language = other, 'borrowed', 'Rus'
+        book.save()
+        other.name = 'Tarixiy'
+        other.save()
+        self.books[0].delete()  # olish yozuvlari ham (CASCADE)
+        Author.objects.create(first_name='Cho\'lpon', last_name='Sulaymon')
+        self.assertMatchesRebuild()
+
+        snap = stats.snapshot()
+        self.assertEqual(snap['total_books'], 2)
+        self.assertEqual(snap['total_authors'], 2)
+        self.assertEqual(snap['available_books'], 1)
+        self.assertEqual(snap['borrowed_books'], 1)
+        self.assertEqual(snap['overdue_books'], 0)
+        self.assertEqual(snap['recent_additions'], 2)
+        self.assertEqual(
+            snap['category_stats'],
+            [{'id': self.category.pk, 'name': 'Roman', 'book_count': 1},
+             {'id': other.pk, 'name': 'Tarixiy', 'book_count': 1}],
+        )
+        self.assertEqual(
+            snap['language_stats'], [{'language': "O'zbek", 'count': 1}, {'language': 'Rus', 'count': 1}]
+        )
+
+        other.delete()  # kitobi kategoriyasiz qoladi
+        self.assertMatchesRebuild()
+        self.assertEqual(len(stats.snapshot()['category_stats']), 1)
+
+    def test_overdue_follows_the_date(self):
+        today = timezone.localdate()
+        self.borrow(self.books[0], today)
+        self.assertEqual(stats.snapshot(today)['overdue_books'], 0)
+        self.assertEqual(stats.snapshot(today + timedelta(days=1))['overdue_books'], 1)
+
+    def test_pages_read_one_row_set(self):
+        with self.assertNumQueries(1):
+            stats.snapshot()
+        response = self.client.get(reverse('statistics'))
+        self.assertEqual(response.context['stats']['total_books'], 3)
+        self.assertContains(response, 'holatiga')
+
+    def test_empty_table_reads_zeros(self):
+        StatCounter.objects.all().delete()
+        self.borrow(self.books[0], timezone.localdate())
+        with self.assertNumQueries(1):
+            snap = stats.snapshot()
+        self.assertEqual((snap['total_books'], snap['borrowed_books']), (0, 0))
+        call_command('rebuild_statistics', stdout=StringIO())
+        self.assertEqual(stats.snapshot()['borrowed_books'], 1)
+
+    def test_old_added_days_are_pruned(self):
+        old = (stats.recent_start() - timedelta(days=1)).isoformat()
+        StatCounter.objects.create(kind=StatCounter.ADDED, key=old, value=4)
+        book = self.books[0]
+        book.added_date -= timedelta(days=1)  # kechagi kun qatori yangidan yaratiladi
+        book.save()
+        self.assertFalse(StatCounter.objects.filter(kind=StatCounter.ADDED, key=old).exists())
+        self.assertMatchesRebuild()
+
+    def test_rebuild_command_reports_drift(self):
+        Book.objects.filter(pk=self.books[0].pk).update(status='maintenance')
+        out = StringIO()
+        call_command('rebuild_statistics', '--dry-run', stdout=out)
+        self.assertIn('total:available  3 -> 2', out.getvalue())
+        call_command('rebuild_statistics', stdout=StringIO())
+        self.assertMatchesRebuild()
+
+
+class CirculationTests(TestCase):
+    """Berish/qaytarish shartli UPDATE'lar bilan (books.services)"""
+
+    def setUp(self):
+        self.book = make_book(1, Category.objects.create(name='Roman'), [], copies=2)
+        stats.rebuild()
+
+    def borrow(self):
+        return services.borrow_book(
+            self.book.pk, borrower_name='Oluvchi', borrower_phone='+998900000000',
+            due_date=timezone.localdate() + timedelta(days=14),
+        )
+
+    def test_last_copy_flips_status(self):
+        self.borrow()
+        record = self.borrow()
+        with self.assertRaises(services.BookUnavailable):
+            self.borrow()
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.available_copies, self.book.status), (0, 'borrowed'))
+        self.assertEqual(BorrowRecord.objects.count(), 2)
+
+        self.assertEqual(services.return_book(record.pk), self.book.pk)
+        with self.assertRaises(services.RecordNotOpen):
+            services.return_book(record.pk)
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.available_copies, self.book.status), (1, 'available'))
+        snap = stats.snapshot()
+        self.assertEqual((snap['available_books'], snap['borrowed_books']), (1, 1))
+
+    def test_borrow_statement_count(self):
+        self.borrow()  # muddat sanasi qatori yaratildi
+        # savepoint, UPDATE kitob, INSERT yozuv, statistika (bitta UPDATE), holat + statistika, release
+        with self.assertNumQueries(7):
+            self.borrow()
+
+    def test_check_constraint(self):
+        for available in (-1, 3):
+            with self.subTest(available=available), self.assertRaises(IntegrityError):
+                with transaction.atomic():
+                    Book.objects.filter(pk=self.book.pk).update(available_copies=available)
+
+    def test_views(self):
+        self.client.force_login(User.objects.create_user('kutubxonachi'))
+        url = reverse('borrow_book', args=[self.book.pk])
+        data = {'borrower_name': 'Oluvchi', 'borrower_phone': '+998900000000', 'due_date': '2030-01-01'}
+        for _ in range(2):
+            self.assertRedirects(self.client.post(url, data), reverse('book_detail', args=[self.book.pk]))
+        response = self.client.post(url, data)
+        self.assertContains(response, 'hozir mavjud emas')
+        record = BorrowRecord.objects.first()
+        for _ in range(2):  # ikkinchi marta hech narsa o'zgarmaydi
+            self.client.get(reverse('return_book', args=[record.pk]))
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 1)
+
+
+class ConcurrentBorrowTests(TransactionTestCase):
+    """Ko'p kutubxonachi bir kitobning oxirgi nusxalarini bir vaqtda beradi"""
+
+    librarians = 40
+    copies = 5
+
+    def test_no_lost_updates(self):
+        book = make_book(1, Category.objects.create(name='Roman'), [], copies=self.copies)
+        start = threading.Barrier(self.librarians)
+        due = timezone.localdate() + timedelta(days=14)
+
+        def attempt(n):
+            start.wait()
+            try:
+                services.borrow_book(book.pk, borrower_name=f'Oluvchi {n}', borrower_phone='+998900000000', due_date=due)
+                return 1
+            except services.BookUnavailable:
+                return 0
+            finally:
+                connection.close()
+
+        def give_back(record_id):
+            start.wait()
+            try:
+                services.return_book(record_id)
+                return 1
+            except services.RecordNotOpen:
+                return 0
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.librarians) as pool:
+            wins = sum(pool.map(attempt, range(self.librarians)))
+        borrowed = time.perf_counter() - started
+        # yo'qolgan yangilanish yo'q: hisoblagich ochiq yozuvlar soniga teng
+        self.assertEqual(wins, self.copies)
+        self.assertEqual(BorrowRecord.objects.count(), self.copies)
+        self.assertCountersMatch(book)
+        self.assertEqual((book.available_copies, book.status), (0, 'borrowed'))
+
+        # har bir yozuvni 8 tadan oqim bir vaqtda qaytarishga urinadi
+        record_ids = list(BorrowRecord.objects.values_list('pk', flat=True)) * (self.librarians // self.copies)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.librarians) as pool:
+            returned = sum(pool.map(give_back, record_ids))
+        returning = time.perf_counter() - started
+        self.assertEqual(returned, self.copies)
+        self.assertFalse(BorrowRecord.objects.filter(is_returned=False).exists())
+        self.assertCountersMatch(book)
+        self.assertEqual((book.available_copies, book.status), (self.copies, 'available'))
+        logger.info(
+            "%d ta oqim, %d nusxa: berish %.0f urinish/s, qaytarish %.0f urinish/s",
+            self.librarians, self.copies, self.librarians / borrowed, len(record_ids) / returning,
+        )
+
+    def assertCountersMatch(self, book):
+        book.refresh_from_db()
+        open_records = BorrowRecord.objects.filter(book=book, is_returned=False).count()
+        self.assertEqual(book.available_copies, book.total_copies - open_records)
+        self.assertGreaterEqual(book.available_copies, 0)
+
+
+@skipUnless(connection.vendor == 'sqlite', "SQLite EXPLAIN QUERY PLAN matni tekshiriladi")
+class IndexUsageTests(TestCase):
+    """Asosiy so'rovlar 0003 indekslaridan foydalanadi (SQLite EXPLAIN bo'yicha)"""
+
+    def assertUsesIndex(self, qs, name):
+        plan = qs.explain()
+        self.assertIn(name, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_book_list_sorts(self):
+        for sort, index in [
+            ('-added_date', 'books_book_added_idx'),
+            ('title', 'books_book_title_idx'),
+            ('-publication_year', 'books_book_year_idx'),
+        ]:
+            with self.subTest(sort=sort):
+                self.assertUsesIndex(Book.objects.order_by(*BOOK_SORTS[sort])[:24], index)
+
+    def test_book_list_status_filter(self):
+        qs = Book.objects.filter(status='available').order_by(*BOOK_SORTS['-added_date'])[:24]
+        self.assertUsesIndex(qs, 'books_book_status_idx')
+        qs = Book.objects.filter(category_id=1).order_by(*BOOK_SORTS['-added_date'])[:24]
+        self.assertUsesIndex(qs, 'books_book_category_idx')
+
+    def test_open_and_returned_records(self):
+        today = timezone.now().date()
+        open_records = BorrowRecord.objects.filter(is_returned=False).order_by('due_date')
+        self.assertUsesIndex(open_records, 'books_borrow_open_due_idx')
+        self.assertUsesIndex(open_records.filter(due_date__lt=today), 'books_borrow_open_due_idx')
+        returned = BorrowRecord.objects.filter(is_returned=True).order_by('-return_date')[:20]
+        self.assertUsesIndex(returned, 'books_borrow_returned_idx')
+
+    def test_recent_records_of_book(self):
+        qs = BorrowRecord.objects.filter(book_id=1).order_by('-borrow_date')[:5]
+        self.assertUsesIndex(qs, 'books_borrow_book_idx')
+
+
+class DatasetCommandTests(TestCase):
+    """generate_dataset izchil ma'lumot qoldiradi, bench_urls har bir URL ni o'lchaydi"""
+
+    def generate(self, **opts):
+        call_command(
+            'generate_dataset', books=30, borrows=100, authors=5, categories=3, publishers=3, incoming=5,
+            stdout=StringIO(), **opts,
+        )
+
+    def test_generated_rows_are_consistent(self):
+        self.generate()
+        self.assertEqual((Book.objects.count(), BorrowRecord.objects.count()), (30, 100))
+        open_loans = Counter(BorrowRecord.objects.filter(is_returned=False).values_list('book_id', flat=True))
+        for book in Book.objects.all():
+            self.assertEqual(book.total_copies - book.available_copies, open_loans[book.pk])
+        # bulk_create signal yubormaydi: hisoblagichlar oxirida qayta quriladi
+        self.assertEqual(stats.snapshot()['total_books'], 30)
+
+    def test_same_seed_same_catalogue(self):
+        with transaction.atomic():
+            self.generate(seed=7)
+            first = list(Book.objects.order_by('pk').values_list('title', 'publication_year'))
+            transaction.set_rollback(True)
+        self.generate(seed=7)
+        self.assertEqual(list(Book.objects.order_by('pk').values_list('title', 'publication_year')), first)
+
+    def test_bench_urls_reports_every_url(self):
+        with self.assertRaises(CommandError):
+            call_command('bench_urls', stdout=StringIO())
+        self.generate()
+        books, records = Book.objects.count(), BorrowRecord.objects.count()
+        out = StringIO()
+        call_command('bench_urls', '--requests', '2', '--warmup', '0', stdout=out, stderr=StringIO())
+        results = json.loads(out.getvalue())
+        for name, result in results.items():
+            with self.subTest(name=name):
+                self.assertEqual(result['requests'], 2)
+                # host ALLOWED_HOSTS dan o'tadi; kategoriya/muallif shablonlari hali yo'q (500)
+                self.assertNotIn('400', result['statuses'], result['path'])
+        for name in ('home', 'book_list', 'book_detail', 'statistics', 'borrow_history'):
+            self.assertEqual(set(results[name]['statuses']), {'200'}, name)
+        # o'lchov bekor qilinadi
+        self.assertEqual((Book.objects.count(), BorrowRecord.objects.count()), (books, records))
+
+
+@override_settings(OVERDUE_FINE_PER_DAY=1000, NOTIFICATION_BACKEND='books.notifications.ConsoleBackend')
+class SweepOverdueTests(TestCase):
+    """sweep_overdue jarimalarni yangilaydi va eslatmalarni bir marta yuboradi"""
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        book = make_book(1, Category.objects.create(name='Kategoriya'), [])
+        self.records = {
+            days: BorrowRecord.objects.create(
+                book=book, borrower_name=f'Oluvchi {days}', borrower_phone=f'+99890{days + 10:07}',
+                due_date=self.today - timedelta(days=days),
+            )
+            for days in (-1, 0, 1, 3, 8)
+        }
+        BorrowRecord.objects.create(
+            book=book, borrower_name='Qaytargan', borrower_phone='+998900000000',
+            due_date=self.today - timedelta(days=5), is_returned=True, return_date=self.today,
+        )
+
+    def sweep(self, *args):
+        out = StringIO()
+        call_command('sweep_overdue', '--batch-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_marks_fines_and_sends_reminders_once(self):
+        out = self.sweep()
+        fines = dict(BorrowRecord.objects.values_list('borrower_name', 'fine_amount'))
+        self.assertEqual(fines, {
+            'Oluvchi -1': 0, 'Oluvchi 0': 0, 'Oluvchi 1': 1000, 'Oluvchi 3': 3000,
+            'Oluvchi 8': 8000, 'Qaytargan': 0,
+        })
+        # ertaga muddati tugaydigan, 1- va 8-kun kechikkanlar
+        self.assertEqual(
+            sorted(Notification.objects.values_list('record__borrower_name', 'kind')),
+            [('Oluvchi -1', 'due_soon'), ('Oluvchi 1', 'overdue'), ('Oluvchi 8', 'overdue')],
+        )
+        self.assertFalse(Notification.objects.filter(sent_at=None).exists())
+        self.assertIn("Jarima: 8000 so'm", out)
+
+        self.sweep()
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_next_day_and_extended_due_date(self):
+        self.sweep()
+        record = self.records[8]
+        record.due_date = self.today + timedelta(days=7)
+        record.save()
+        tomorrow = (self.today + timedelta(days=1)).isoformat()
+        self.sweep('--date', tomorrow)
+        self.records[3].refresh_from_db()
+        record.refresh_from_db()
+        self.assertEqual((self.records[3].overdue_days, self.records[3].fine_amount), (4, 4000))
+        self.assertEqual(record.fine_amount, 0)
+
+    def test_dry_run_writes_nothing(self):
+        self.assertIn("3 ta yozuv yangilanadi", self.sweep('--dry-run'))
+        self.assertFalse(BorrowRecord.objects.filter(fine_amount__gt=0).exists())
+        self.assertFalse(Notification.objects.exists())
+
+    def test_failed_delivery_stays_queued(self):
+        class Flaky(BaseBackend):
+            def send_messages(self, notifications):
+                return 1
+
+        self.sweep('--no-deliver')
+        self.assertEqual(deliver_pending(Flaky(), batch_size=2), 1)
+        self.assertEqual(Notification.objects.filter(sent_at=None).count(), 2)
+        self.assertEqual(deliver_pending(get_backend(stream=StringIO())), 2)
@@ -0,0 +1,78 @@
+# books/thumbnails.py
+"""Muqova rasmlarining kichik nusxalari.
+
+Har bir yuklangan muqova uchun belgilangan kenglikdagi WebP va JPEG nusxalar
+asl fayl yonida ``<nom>.<kontent xeshi>.<kenglik>w.<kengaytma>`` nomi bilan
+saqlanadi. Xesh ``Book.cover_hash`` da turadi: shablon ``srcset`` ni
+xotiraga murojaat qilmasdan quradi, yangi rasm esa yangi URL oladi.
+"""
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+WIDTHS = (160, 320, 640)
+FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+QUALITY = 80
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def derivative_name(name, digest, width, ext):
+    stem, _ = os.path.splitext(name)
+    return f'{stem}.{digest}.{width}w.{ext}'
+
+
+def derivative_url(name, digest, width, ext):
+    return default_storage.url(derivative_name(name, digest, width, ext))
+
+
+def srcset(name, digest, ext):
+    return ', '.join(f'{derivative_url(name, digest, w, ext)} {w}w' for w in WIDTHS)
+
+
+def render_derivatives(name, force=False):
+    """Asl rasmdan barcha nusxalarni yaratadi va kontent xeshini qaytaradi.
+
+    Bazaga murojaat qilmaydi, shuning uchun alohida jarayonda ishlay oladi.
+    """
+    with default_storage.open(name, 'rb') as fh:
+        data = fh.read()
+    digest = content_hash(data)
+    with Image.open(BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+    for width in WIDTHS:
+        # thumbnail() kattalashtirmaydi
+        resized = image.copy()
+        resized.thumbnail((width, width * 4), Image.LANCZOS)
+        for ext, fmt in FORMATS:
+            target = derivative_name(name, digest, width, ext)
+            if default_storage.exists(target):
+                if not force:
+                    continue
+                default_storage.delete(target)
+            buf = BytesIO()
+            resized.save(buf, fmt, quality=QUALITY, optimize=True)
+            default_storage.save(target, ContentFile(buf.getvalue()))
+    return digest
+
+
+def _render_safely(args):
+    name, force = args
+    try:
+        return name, render_derivatives(name, force), None
+    except Exception as exc:  # bitta buzuq fayl butun jarayonni to'xtatmasin
+        return name, None, f'{type(exc).__name__}: {exc}'
+
+
+def render_many(names, workers=None, force=False):
+    """Nusxalarni jarayonlar hovuzida yaratadi; ``(nom, xesh, xato)`` qaytaradi"""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_render_safely, [(n, force) for n in names], chunksize=4)
@@ -1,70 +1,88 @@
 # books/views.py
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Count
+from django.db.models import Count, Prefetch, prefetch_related_objects
 from django.contrib import messages
 from django.utils import timezone
 from datetime import timedelta
 from .models import Book, Category, Author, IncomingBooks, BorrowRecord
-
-
-def home(self):
+from . import archive, search, services, stats
+from .pagination import KeysetPage, keyset_paginate, ranked_paginate
+from .querybudget import query_budget
+
+# Ruxsat etilgan saralashlar; har biri pk bilan tugaydi (kursor uchun)
+BOOK_SORTS = {
+    '-added_date': ('-added_date', '-id'),
+    'title': ('title', 'id'),
+    '-title': ('-title', '-id'),
+    'publication_year': ('publication_year', 'id'),
+    '-publication_year': ('-publication_year', '-id'),
+}
+BOOKS_PER_PAGE = 24
+# "Jami N ta" shundan ko'pini sanamaydi (500k kitobda COUNT ham qimmat)
+BOOK_COUNT_LIMIT = 1000
+# kartochkada ko'rsatiladigan maydonlar; description kabi kattalari o'qilmaydi
+BOOK_CARD_FIELDS = (
+    'id', 'title', 'publication_year', 'cover_image', 'cover_hash', 'shelf_location',
+    'total_copies', 'available_copies', 'added_date', 'category__name',
+)
+
+
+@query_budget(7)
+def home(request):
     """Bosh sahifa"""
-    # Statistika
-    total_books = Book.objects.count()
-    total_categories = Category.objects.count()
-    available_books = Book.objects.filter(status='available').count()
-    borrowed_books = BorrowRecord.objects.filter(is_returned=False).count()
-
-    # Eng ko'p kitoblar bo'lgan kategoriyalar
-    top_categories = Category.objects.annotate(
-        book_count=Count('book')
-    ).order_by('-book_count')[:6]
+    # Statistika va eng ko'p kitoblar bo'lgan kategoriyalar: bitta so'rov
+    snapshot = stats.snapshot()
 
     # Yangi qo'shilgan kitoblar
-    recent_books = Book.objects.all()[:8]
+    recent_books = Book.objects.select_related('category').only(*BOOK_CARD_FIELDS).prefetch_related(
+        Prefetch('authors', queryset=Author.objects.only('first_name', 'last_name'))
+    ).order_by(*BOOK_SORTS['-added_date'])[:8]
 
     # Keladigan kitoblar
     upcoming_books = IncomingBooks.objects.filter(
         is_arrived=False,
         expected_date__gte=timezone.now().date()
-    ).order_by('expected_date')[:5]
+    ).select_related('category').order_by('expected_date')[:5]
 
     context = {
-        'total_books': total_books,
-        'total_categories': total_categories,
-        'available_books': available_books,
-        'borrowed_books': borrowed_books,
-        'top_categories': top_categories,
+        'total_books': snapshot['total_books'],
+        'total_categories': snapshot['total_categories'],
+        'available_books': snapshot['available_books'],
+        'borrowed_books': snapshot['borrowed_books'],
+        'top_categories': snapshot['category_stats'][:6],
+        'stats_updated_at': snapshot['updated_at'],
         'recent_books': recent_books,
         'upcoming_books': upcoming_books,
     }
     return render(request, 'books/home.html', context)
 
 
+@query_budget(9)
 def book_list(request):
     """Barcha kitoblar ro'yxati"""
-    books = Book.objects.all()
-    categories = Category.objects.all()
+    # kartochkalar kategoriya va mualliflarni ko'rsatadi (N+1 bo'lmasin)
+    books = Book.objects.select_related('category').only(*BOOK_CARD_FIELDS).prefetch_related(
+        Prefetch('authors', queryset=Author.objects.only('first_name', 'last_name'))
+    )
+    categories = Category.objects.only('name')
 
-    # Qidiruv
-    search_query = request.GET.get('search', '')
+    # Qidiruv: ISBN/inventar raqami darhol, qolgani xatoga chidamli o'xshashlik
+    # bo'yicha (books.search); natija SEARCH_LIMIT ta id
+    search_query = request.GET.get('search', '').strip()
+    ranked = None
     if search_query:
-        books = books.filter(
-            Q(title__icontains=search_query) |
-            Q(authors__first_name__icontains=search_query) |
-            Q(authors__last_name__icontains=search_query) |
-            Q(isbn__icontains=search_query)
-        ).distinct()
+        ranked = [pk for pk, _ in search.search(search_query)]
+        books = books.filter(pk__in=ranked)
 
     # Kategoriya bo'yicha filter
-    category_id = request.GET.get('category')
-    if category_id:
+    category_id = request.GET.get('category', '')
+    if category_id.isdigit():
         books = books.filter(category_id=category_id)
 
     # Holat bo'yicha filter
     status = request.GET.get('status')
-    if status:
+    if status in dict(Book.STATUS_CHOICES):
         books = books.filter(status=status)
 
     # Til bo'yicha filter
@@ -72,12 +90,41 @@ def book_list(request):
     if language:
         books = books.filter(language=language)
 
-    # Saralash
-    sort_by = request.GET.get('sort', '-added_date')
-    books = books.order_by(sort_by)
+    # Saralash; qidiruvda standart bo'yicha o'xshashlik tartibi
+    sort_by = request.GET.get('sort', 'relevance' if ranked is not None else '-added_date')
+    if sort_by not in BOOK_SORTS and not (sort_by == 'relevance' and ranked is not None):
+        sort_by = '-added_date'
+
+    after = request.GET.get('after')
+    if ranked is not None:
+        # filtrlardan o'tgan natijalar; ro'yxat qisqa, to'liq sanaladi
+        matched = set(books.order_by().values_list('pk', flat=True))
+        ranked = [pk for pk in ranked if pk in matched]
+        total_count = len(ranked)
+        if not ranked:
+            page = KeysetPage([])
+        elif sort_by == 'relevance':
+            page = ranked_paginate(books, ranked, sort_by, after=after, per_page=BOOKS_PER_PAGE)
+        else:
+            page = keyset_paginate(books, sort_by, BOOK_SORTS[sort_by], after=after, per_page=BOOKS_PER_PAGE)
+    else:
+        # Sahifalash (kursor bo'yicha); umumiy son faqat birinchi sahifada va
+        # BOOK_COUNT_LIMIT gacha sanaladi
+        total_count = None if after else books.order_by().values('pk')[:BOOK_COUNT_LIMIT + 1].count()
+        if total_count == 0:
+            page = KeysetPage([])
+        else:
+            page = keyset_paginate(books, sort_by, BOOK_SORTS[sort_by], after=after, per_page=BOOKS_PER_PAGE)
+    params = request.GET.copy()
+    params.pop('after', None)
 
     context = {
-        'books': books,
+        'books': page,
+        'page': page,
+        'total_count': total_count,
+        'count_limit': BOOK_COUNT_LIMIT,
+        'base_query': params.urlencode(),
+        'selected_sort': sort_by,
         'categories': categories,
         'search_query': search_query,
         'selected_category': category_id,
@@ -87,24 +134,33 @@ def book_list(request):
     return render(request, 'books/book_list.html', context)
 
 
+@query_budget(9)
 def book_detail(request, pk):
     """Kitob tafsilotlari"""
-    book = get_object_or_404(Book, pk=pk)
+    book = get_object_or_404(Book.objects.select_related('category', 'publisher'), pk=pk)
 
-    # O'xshash kitoblar
-    related_books = Book.objects.filter(
-        category=book.category
-    ).exclude(pk=book.pk)[:4]
+    # "Bu kitobni olganlar yana olgan" (books.recommendations, bitta indeksli so'rov);
+    # olish tarixi bo'lmasa o'sha kategoriyadagilar
+    related_books = list(
+        Book.objects.filter(neighbor_of__book=book).order_by('-neighbor_of__score')
+        .prefetch_related('authors')[:4]
+    )
+    also_borrowed = bool(related_books)
+    if not related_books:
+        related_books = Book.objects.filter(
+            category=book.category
+        ).exclude(pk=book.pk).prefetch_related('authors')[:4]
 
-    # Olish tarixi
-    borrow_history = BorrowRecord.objects.filter(
-        book=book
-    ).order_by('-borrow_date')[:5]
+    # Olish tarixi (?archive=1 bo'lsa arxiv bilan)
+    include_archive = request.GET.get('archive') == '1'
+    borrow_history = archive.recent({'book': book}, '-borrow_date', 5, include_archive)
 
     context = {
         'book': book,
         'related_books': related_books,
+        'also_borrowed': also_borrowed,
         'borrow_history': borrow_history,
+        'include_archive': include_archive,
     }
     return render(request, 'books/book_detail.html', context)
 
@@ -161,17 +217,18 @@ def author_detail(request, pk):
     return render(request, 'books/author_detail.html', context)
 
 
+@query_budget(7)
 def incoming_books(request):
     """Keladigan kitoblar"""
     # Kelgan kitoblar
     arrived_books = IncomingBooks.objects.filter(
         is_arrived=True
-    ).order_by('-arrived_date')[:10]
+    ).select_related('category').order_by('-arrived_date')[:10]
 
     # Kutilayotgan kitoblar
     pending_books = IncomingBooks.objects.filter(
         is_arrived=False
-    ).order_by('expected_date')
+    ).select_related('category').order_by('expected_date')
 
     # Kechikkan kitoblar
     overdue_books = pending_books.filter(
@@ -186,79 +243,45 @@ def incoming_books(request):
     return render(request, 'books/incoming_books.html', context)
 
 
+@query_budget(4)
 def statistics(request):
     """Statistika sahifasi"""
-    # Umumiy statistika
-    stats = {
-        'total_books': Book.objects.count(),
-        'total_authors': Author.objects.count(),
-        'total_categories': Category.objects.count(),
-        'available_books': Book.objects.filter(status='available').count(),
-        'borrowed_books': BorrowRecord.objects.filter(is_returned=False).count(),
-        'overdue_books': BorrowRecord.objects.filter(
-            is_returned=False,
-            due_date__lt=timezone.now().date()
-        ).count(),
-    }
-
-    # Kategoriya bo'yicha kitoblar
-    category_stats = Category.objects.annotate(
-        book_count=Count('book')
-    ).order_by('-book_count')
-
-    # Til bo'yicha kitoblar
-    language_stats = Book.objects.values('language').annotate(
-        count=Count('id')
-    ).order_by('-count')
-
-    # Oxirgi 30 kunda qo'shilgan kitoblar
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    recent_additions = Book.objects.filter(
-        added_date__gte=thirty_days_ago
-    ).count()
+    # StatCounter dan bitta so'rov (books.stats)
+    snapshot = stats.snapshot()
 
     context = {
-        'stats': stats,
-        'category_stats': category_stats,
-        'language_stats': language_stats,
-        'recent_additions': recent_additions,
+        'stats': snapshot,
+        'category_stats': snapshot['category_stats'],
+        'language_stats': snapshot['language_stats'],
+        'recent_additions': snapshot['recent_additions'],
+        'stats_updated_at': snapshot['updated_at'],
     }
     return render(request, 'books/statistics.html', context)
 
 
+@query_budget(12)
 @login_required
 def borrow_book(request, pk):
     """Kitob olish"""
     book = get_object_or_404(Book, pk=pk)
 
     if request.method == 'POST':
-        if book.available_copies > 0:
-            borrower_name = request.POST.get('borrower_name')
-            borrower_phone = request.POST.get('borrower_phone')
-            borrower_id = request.POST.get('borrower_id')
-            due_date = request.POST.get('due_date')
-            notes = request.POST.get('notes', '')
-
-            # Kitob olish yozuvi yaratish
-            BorrowRecord.objects.create(
-                book=book,
-                borrower_name=borrower_name,
-                borrower_phone=borrower_phone,
-                borrower_id=borrower_id,
-                due_date=due_date,
-                notes=notes,
+        try:
+            # nusxa shartli UPDATE bilan olinadi, yozuv bilan bitta tranzaksiyada
+            services.borrow_book(
+                book.pk,
+                borrower_name=request.POST.get('borrower_name'),
+                borrower_phone=request.POST.get('borrower_phone'),
+                borrower_id=request.POST.get('borrower_id', ''),
+                due_date=request.POST.get('due_date'),
+                notes=request.POST.get('notes', ''),
             )
-
-            # Mavjud nusxalarni kamaytirish
-            book.available_copies -= 1
-            if book.available_copies == 0:
-                book.status = 'borrowed'
-            book.save()
-
+        except services.BookUnavailable:
+            messages.error(request, 'Bu kitob hozir mavjud emas!')
+            book.refresh_from_db(fields=['available_copies', 'status'])
+        else:
             messages.success(request, f'"{book.title}" kitobi muvaffaqiyatli berildi!')
             return redirect('book_detail', pk=book.pk)
-        else:
-            messages.error(request, 'Bu kitob hozir mavjud emas!')
 
     context = {
         'book': book,
@@ -267,49 +290,45 @@ def borrow_book(request, pk):
     return render(request, 'books/borrow_book.html', context)
 
 
+@query_budget(12)
 @login_required
 def return_book(request, record_id):
     """Kitobni qaytarish"""
-    record = get_object_or_404(BorrowRecord, pk=record_id)
-
-    if not record.is_returned:
-        record.is_returned = True
-        record.return_date = timezone.now().date()
-        record.save()
-
-        # Mavjud nusxalarni oshirish
-        book = record.book
-        book.available_copies += 1
-        if book.available_copies > 0:
-            book.status = 'available'
-        book.save()
+    record = get_object_or_404(BorrowRecord.objects.select_related('book').only('book__title'), pk=record_id)
 
-        messages.success(request, f'"{book.title}" kitobi qaytarildi!')
+    try:
+        services.return_book(record.pk)
+    except services.RecordNotOpen:
+        pass  # allaqachon qaytarilgan
+    else:
+        messages.success(request, f'"{record.book.title}" kitobi qaytarildi!')
 
-    return redirect('book_detail', pk=record.book.pk)
+    return redirect('book_detail', pk=record.book_id)
 
 
+@query_budget(10)
 def borrow_history(request):
     """Olish tarixi"""
     # Hozir olingan kitoblar
     current_borrows = BorrowRecord.objects.filter(
         is_returned=False
-    ).order_by('due_date')
+    ).select_related('book').prefetch_related('book__authors').order_by('due_date')
 
     # Muddati o'tgan kitoblar
     overdue_borrows = current_borrows.filter(
         due_date__lt=timezone.now().date()
     )
 
-    # Qaytarilgan kitoblar
-    returned_borrows = BorrowRecord.objects.filter(
-        is_returned=True
-    ).order_by('-return_date')[:20]
+    # Qaytarilgan kitoblar (?archive=1 bo'lsa arxiv bilan, books.archive)
+    include_archive = request.GET.get('archive') == '1'
+    returned_borrows = archive.recent({'is_returned': True}, '-return_date', 20, include_archive)
+    prefetch_related_objects([record.book for record in returned_borrows], 'authors')
 
     context = {
         'current_borrows': current_borrows,
         'overdue_borrows': overdue_borrows,
         'returned_borrows': returned_borrows,
+        'include_archive': include_archive,
     }
     return render(request, 'books/borrow_history.html', context)
 
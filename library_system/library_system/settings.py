@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -62,6 +64,8 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 
 
 MIDDLEWARE = [
+    # eng tashqarida: sessiya va auth so'rovlarini ham sanaydi
+    'books.querybudget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,7 +80,7 @@ ROOT_URLCONF = 'library_system.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -98,9 +102,29 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # yozuvchilar xato bermay, qulf bo'shashini kutadi (books.services)
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # parallel testlarda haqiqiy qulflar bo'lishi uchun faylda
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# DB_NAME berilsa Postgres; qidiruv pg_trgm GIN indekslaridan foydalanadi (books.search)
+if os.getenv('DB_NAME'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('DB_NAME'),
+        'USER': os.getenv('DB_USER'),
+        'PASSWORD': os.getenv('DB_PASSWORD'),
+        'HOST': os.getenv('DB_HOST', 'localhost'),
+        'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_MAX_AGE': 60,
+    }
+    INSTALLED_APPS.append('django.contrib.postgres')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -140,6 +164,47 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# SQL so'rovlar hisobi (books.querybudget): QUERY_LOG=1 har so'rov uchun
+# JSON qator yozadi; STRICT rejimda chegaradan oshish xato beradi: barcha
+# testlarda yoqiq (manage.py test)
+QUERY_LOG = os.getenv('QUERY_LOG') == '1'
+QUERY_BUDGET_STRICT = 'test' in sys.argv[1:2]
+QUERY_BUDGETS = {
+    # o'zimiz bezay olmaydigan admin sahifalari
+    'admin:books_book_changelist': 10,
+    'admin:books_category_changelist': 6,
+    'admin:books_borrowrecord_changelist': 8,
+    'admin:books_incomingbooks_changelist': 9,
+}
+
+# Kechikish jarimasi (so'm / kun) va eslatmalar yuboriladigan joy
+# (books.notifications): SMS shlyuzi ulanguncha konsol yoki fayl
+OVERDUE_FINE_PER_DAY = 1000
+NOTIFICATION_BACKEND = os.getenv('NOTIFICATION_BACKEND', 'books.notifications.ConsoleBackend')
+NOTIFICATION_FILE_PATH = os.getenv('NOTIFICATION_FILE_PATH', str(BASE_DIR / 'notifications.jsonl'))
+
+# Qidiruv indeksi fayli (manage.py build_search_index); bo'lmasa har jarayon
+# indeksni birinchi qidiruvda xotirada quradi
+SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH')
+
+# Qabul qilingan yangi kitoblarning inventar raqami: INV-00000001, ...
+# (books.receiving, ketma-ketlik shu ko'rinishdagi eng katta raqamdan davom etadi)
+INVENTORY_NUMBER_PREFIX = os.getenv('INVENTORY_NUMBER_PREFIX', 'INV-')
+
+# Shuncha kun oldin qaytarilgan olish yozuvlari arxiv jadvaliga ko'chiriladi
+# (manage.py archive_borrows, books.archive)
+BORROW_ARCHIVE_AFTER_DAYS = int(os.getenv('BORROW_ARCHIVE_AFTER_DAYS', 180))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {
+        'books.queries': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'books.archive': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 